@@ -0,0 +1,249 @@
+"""
+API HTTP do TARS, independente da interface Streamlit.
+
+Expõe o carregamento de fontes, perguntas (com streaming via SSE) e o gerenciamento
+de sessões, usando os mesmos módulos core/ e carregadores da interface web. As sessões
+ficam no banco SQLite, então várias instâncias podem atender às mesmas conversas.
+
+Execução:
+    uvicorn api:app --host 0.0.0.0 --port 8000
+"""
+
+import json
+import math
+import uuid
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from config.settings import (
+    APP_NAME, APP_VERSION, APP_DESCRIPTION, API_HISTORY_LIMIT, HISTORY_PAGE_SIZE, WARM_SOURCES, MAX_TOKENS
+)
+from core import storage
+from core.artifacts import agenda_artefatos, resposta_pronta
+from core.blob_store import guarda_uploads, libera
+from core.llm import generate_response, stream_response
+from core.rate_limit import LimiteExcedido, controle
+from core.retry import ErroLLM, MENSAGENS_ERRO
+from core.prefetch import aquece_fontes, obtem_fonte
+from utils.loaders.document import tem_erro
+from utils.loaders.registry import carrega, tipo_fonte
+
+@asynccontextmanager
+async def lifespan(app):
+    """Inicia, em segundo plano, o carregamento das fontes da lista de aquecimento."""
+    aquece_fontes(WARM_SOURCES)
+    yield
+
+app = FastAPI(title=APP_NAME, version=APP_VERSION, description=APP_DESCRIPTION, lifespan=lifespan)
+
+@app.exception_handler(LimiteExcedido)
+async def limite_excedido(request, erro):
+    """Responde com 429 quando uma chamada ao modelo não é admitida pelos limites de uso."""
+    cabecalhos = {'Retry-After': str(math.ceil(erro.tentar_em))} if erro.tentar_em else None
+    return JSONResponse(status_code=429, content={'detail': str(erro)}, headers=cabecalhos)
+
+@app.exception_handler(ErroLLM)
+async def erro_llm(request, erro):
+    """Responde com 503 (ou 504, se o prazo acabou) quando o modelo falha após as novas tentativas."""
+    print(f"Erro ao gerar resposta: {str(erro)}")
+    status = 504 if erro.tipo == 'prazo' else 503
+    return JSONResponse(status_code=status, content={'detail': MENSAGENS_ERRO[erro.tipo], 'tipo': erro.tipo})
+
+class FonteRequest(BaseModel):
+    """Corpo da requisição para carregar uma fonte a partir de uma URL."""
+    tipo: str  # 'site' ou 'youtube'
+    url: str
+    rastrear: bool = False
+    max_profundidade: Optional[int] = None
+    max_paginas: Optional[int] = None
+
+class PerguntaRequest(BaseModel):
+    """Corpo da requisição para fazer uma pergunta."""
+    pergunta: str
+    stream: bool = True
+
+def _valida_sessao(session_id):
+    """Valida o formato do ID da sessão e retorna-o normalizado."""
+    try:
+        return str(uuid.UUID(session_id))
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Sessão não encontrada.")
+
+async def _garante_sessao_existente(session_id):
+    """Retorna o ID normalizado da sessão, com erro 404 se ela não existir."""
+    session_id = _valida_sessao(session_id)
+    if not await run_in_threadpool(storage.conversa_existe, session_id):
+        raise HTTPException(status_code=404, detail="Sessão não encontrada.")
+    return session_id
+
+async def _registra_documento(session_id, documento_info):
+    """Salva o documento carregado na sessão ou retorna erro 422 se o carregamento falhou."""
+    if tem_erro(documento_info):
+        raise HTTPException(status_code=422, detail=documento_info.get('conteudo', 'Erro ao carregar a fonte.'))
+    referencia = await run_in_threadpool(storage.salvar_documento, session_id, documento_info)
+    await run_in_threadpool(agenda_artefatos, referencia)
+    return referencia
+
+async def _contexto_pergunta(session_id, pergunta):
+    """
+    Salva a pergunta e carrega o histórico e o documento da sessão para a chamada ao modelo.
+
+    Returns:
+        Tupla (ID da pergunta salva, histórico, documento); se a pergunta não for
+        respondida, deve ser removida com storage.remover_mensagem
+    """
+    def carregar():
+        pergunta_id = storage.salvar_mensagem(session_id, 'user', pergunta)
+        historico = storage.carregar_mensagens(session_id, limite=API_HISTORY_LIMIT)
+        documento_info = storage.carregar_referencia_documento(session_id) or ""
+        if documento_info:
+            documento_info['conteudo'] = storage.obter_conteudo(documento_info)
+        return pergunta_id, historico, documento_info
+    return await run_in_threadpool(carregar)
+
+def _evento_sse(evento, dados):
+    """Formata um evento no padrão Server-Sent Events."""
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+@app.post("/sessions", status_code=201)
+async def criar_sessao():
+    """Cria uma nova sessão de conversa."""
+    session_id = str(uuid.uuid4())
+    await run_in_threadpool(storage.garantir_conversa, session_id)
+    return {'session_id': session_id}
+
+@app.get("/sessions/{session_id}")
+async def obter_sessao(session_id: str, antes_de: Optional[int] = None, limite: int = HISTORY_PAGE_SIZE):
+    """Retorna o documento atual e uma página do histórico de mensagens da sessão."""
+    session_id = await _garante_sessao_existente(session_id)
+
+    def carregar():
+        mensagens = storage.carregar_mensagens(session_id, limite=limite, antes_de=antes_de)
+        return {
+            'session_id': session_id,
+            'documento': storage.carregar_referencia_documento(session_id),
+            'mensagens': mensagens,
+            'mensagens_anteriores': storage.existem_mensagens_anteriores(
+                session_id, mensagens[0]['id'] if mensagens else None
+            )
+        }
+    return await run_in_threadpool(carregar)
+
+@app.delete("/sessions/{session_id}/messages", status_code=204)
+async def limpar_conversa(session_id: str):
+    """Remove o histórico de mensagens da sessão e libera os arquivos enviados por ela."""
+    session_id = await _garante_sessao_existente(session_id)
+    await run_in_threadpool(storage.limpar_mensagens, session_id)
+    await run_in_threadpool(libera, session_id)
+
+@app.post("/sessions/{session_id}/sources")
+async def carregar_fonte(session_id: str, fonte: FonteRequest):
+    """Carrega um site (opcionalmente rastreando páginas vinculadas) ou vídeo, playlist ou canal do YouTube."""
+    session_id = await _garante_sessao_existente(session_id)
+
+    if fonte.tipo == 'site' and fonte.rastrear:
+        opcoes = {
+            chave: valor for chave, valor in
+            (('max_profundidade', fonte.max_profundidade), ('max_paginas', fonte.max_paginas))
+            if valor is not None
+        }
+        documento_info = await run_in_threadpool(obtem_fonte, 'site_completo', fonte.url, revalidar=True, **opcoes)
+    elif fonte.tipo == 'site':
+        documento_info = await run_in_threadpool(obtem_fonte, 'site', fonte.url, revalidar=True)
+    elif fonte.tipo == 'youtube':
+        documento_info = await run_in_threadpool(obtem_fonte, tipo_fonte(fonte.url), fonte.url)
+    else:
+        raise HTTPException(status_code=400, detail="Tipo de fonte inválido. Use 'site' ou 'youtube'.")
+
+    return {'documento': await _registra_documento(session_id, documento_info)}
+
+@app.post("/sessions/{session_id}/sources/pdf")
+async def carregar_pdfs(session_id: str, arquivos: List[UploadFile] = File(...)):
+    """Processa um ou mais PDFs enviados como multipart/form-data."""
+    session_id = await _garante_sessao_existente(session_id)
+    blobs = await run_in_threadpool(guarda_uploads, arquivos, session_id)
+    documento_info = await run_in_threadpool(carrega, blobs, 'pdf')
+    return {'documento': await _registra_documento(session_id, documento_info)}
+
+@app.post("/sessions/{session_id}/sources/imagem")
+async def carregar_imagem(session_id: str, arquivo: UploadFile = File(...)):
+    """Analisa uma imagem enviada como multipart/form-data."""
+    session_id = await _garante_sessao_existente(session_id)
+    imagem, = await run_in_threadpool(guarda_uploads, [arquivo], session_id)
+    documento_info = await run_in_threadpool(lambda: carrega(imagem, 'imagem', sessao=session_id))
+    return {'documento': await _registra_documento(session_id, documento_info)}
+
+@app.post("/sessions/{session_id}/ask")
+async def perguntar(session_id: str, requisicao: PerguntaRequest):
+    """
+    Faz uma pergunta sobre a fonte carregada na sessão.
+
+    Com stream=true (padrão), a resposta é enviada como Server-Sent Events: eventos
+    'delta' com trechos do texto, seguidos de 'fim' (ou 'erro'), precedidos de 'fila'
+    se a pergunta precisar aguardar pelos limites de uso. A resposta final inclui o
+    uso de tokens por componente do prompt. Sem streaming, perguntas não admitidas
+    pelos limites de uso recebem 429.
+    """
+    session_id = await _garante_sessao_existente(session_id)
+    if not requisicao.pergunta.strip():
+        raise HTTPException(status_code=400, detail="A pergunta não pode ser vazia.")
+
+    pergunta_id, historico, documento_info = await _contexto_pergunta(session_id, requisicao.pergunta)
+
+    uso = {}
+
+    # Pedidos comuns (resumo, glossário, questionário...) usam o material de estudo salvo
+    pronta = await run_in_threadpool(resposta_pronta, requisicao.pergunta, documento_info)
+    if pronta is not None:
+        mensagem_id = await run_in_threadpool(storage.salvar_mensagem, session_id, 'assistant', pronta)
+        if not requisicao.stream:
+            return {'id': mensagem_id, 'resposta': pronta, 'uso_tokens': None}
+
+        async def evento_unico():
+            yield _evento_sse('delta', {'texto': pronta})
+            yield _evento_sse('fim', {'id': mensagem_id, 'uso_tokens': None})
+        return StreamingResponse(evento_unico(), media_type="text/event-stream", headers={'Cache-Control': 'no-cache'})
+
+    if not requisicao.stream:
+        try:
+            resposta = await run_in_threadpool(
+                generate_response, historico, documento_info, uso.update, sessao=session_id
+            )
+        except Exception:
+            # Pergunta recusada (429) ou sem resposta: não fica no histórico da sessão
+            await run_in_threadpool(storage.remover_mensagem, pergunta_id)
+            raise
+        mensagem_id = await run_in_threadpool(storage.salvar_mensagem, session_id, 'assistant', resposta)
+        return {'id': mensagem_id, 'resposta': resposta, 'uso_tokens': uso or None}
+
+    async def eventos():
+        partes = []
+        # Avisa o cliente se a pergunta deve aguardar na fila dos limites de uso
+        espera = controle.previsao(session_id, MAX_TOKENS)
+        if espera:
+            yield _evento_sse('fila', {'segundos': math.ceil(espera)})
+        try:
+            async for texto in stream_response(historico, documento_info, on_usage=uso.update, sessao=session_id):
+                partes.append(texto)
+                yield _evento_sse('delta', {'texto': texto})
+        except ErroLLM as e:
+            # Nem o texto parcial já enviado nem a pergunta ficam no histórico
+            await run_in_threadpool(storage.remover_mensagem, pergunta_id)
+            print(f"Erro ao gerar resposta em streaming: {str(e)}")
+            yield _evento_sse('erro', {'detalhe': MENSAGENS_ERRO[e.tipo], 'tipo': e.tipo})
+            return
+        except Exception as e:
+            # Inclui LimiteExcedido: a pergunta não admitida não fica no histórico
+            await run_in_threadpool(storage.remover_mensagem, pergunta_id)
+            print(f"Erro ao gerar resposta em streaming: {str(e)}")
+            yield _evento_sse('erro', {'detalhe': str(e)})
+            return
+
+        resposta = ''.join(partes)
+        mensagem_id = await run_in_threadpool(storage.salvar_mensagem, session_id, 'assistant', resposta)
+        yield _evento_sse('fim', {'id': mensagem_id, 'uso_tokens': uso or None})
+
+    return StreamingResponse(eventos(), media_type="text/event-stream", headers={'Cache-Control': 'no-cache'})
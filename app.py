@@ -10,14 +10,19 @@ Desenvolvido para estudantes universirário
 
 import streamlit as st
 from config.settings import APP_NAME, APP_ICON
-from core.session import initialize_session, clear_conversation, add_message
+from core.session import initialize_session, clear_conversation, add_message, remove_last_message, load_older_messages
+from core.artifacts import resposta_pronta
 from core.llm import generate_response
+from core.rate_limit import LimiteExcedido
+from core.retry import ErroLLM, MENSAGENS_ERRO
 from ui.components import (
     load_css, header, chat_message, sidebar_header, 
     source_selector, source_info_panel, clear_conversation_button,
-    timestamp_display, footer
+    timestamp_display, token_usage_panel, queue_notice, footer
 )
-from ui.pages.sources import render_source_interface
+from ui.pages.sources import render_source_interface, aquece_fontes_iniciais
+from ui.pages.batch import render_batch_panel
+from ui.pages.study import render_study_panel
 
 # Configuração da página Streamlit
 st.set_page_config(
@@ -34,6 +39,9 @@ load_css()
 # Inicializa o estado da sessão
 initialize_session()
 
+# Inicia o carregamento das fontes da lista de aquecimento (uma vez por processo)
+aquece_fontes_iniciais()
+
 # Exibe o cabeçalho principal
 header()
 
@@ -46,6 +54,12 @@ fonte = source_selector()
 # Renderiza interface para a fonte selecionada
 render_source_interface(fonte)
 
+# Painel do material de estudo (resumo, roteiro, glossário e questionário) da fonte
+render_study_panel()
+
+# Painel de perguntas em lote sobre a fonte carregada
+render_batch_panel()
+
 # Botão para limpar a conversa
 if clear_conversation_button():
     clear_conversation()
@@ -62,6 +76,12 @@ if st.session_state.documento:
 # Separador visual entre informações da fonte e o chat
 st.markdown("---")
 
+# Permite carregar páginas anteriores do histórico salvo (conversas retomadas)
+if st.session_state.mensagens_anteriores:
+    if st.button("Carregar mensagens anteriores", use_container_width=True):
+        load_older_messages()
+        st.rerun()
+
 # Exibe o histórico de mensagens
 for mensagem in st.session_state.mensagens:
     avatar = "👤" if mensagem["role"] == "user" else "🤖"
@@ -77,21 +97,49 @@ if prompt:
     chat_message("user", prompt, "👤")
     
     # Obtém resposta do modelo com o contexto atual
+    aviso_fila = st.empty()
     with st.spinner("TARS está processando sua pergunta..."):
         try:
-            # Gera a resposta do modelo
-            resposta = generate_response(st.session_state.mensagens, st.session_state.documento)
+            # Pedidos comuns (resumo, glossário, questionário...) usam o material de estudo salvo;
+            # os demais geram a resposta do modelo (aguardando na fila se os limites forem atingidos)
+            resposta = resposta_pronta(prompt, st.session_state.documento)
+            if resposta is not None:
+                # Sem chamada ao modelo: o painel não deve mostrar o uso da pergunta anterior
+                st.session_state.uso_tokens = None
+            else:
+                resposta = generate_response(
+                    st.session_state.mensagens,
+                    st.session_state.documento,
+                    on_usage=lambda uso: st.session_state.update(uso_tokens=uso),
+                    indice=st.session_state.indice,
+                    sessao=st.session_state.session_id,
+                    on_espera=queue_notice(aviso_fila)
+                )
+            aviso_fila.empty()
             
             # Exibe a resposta
             chat_message("assistant", resposta, "🤖")
             
             # Adiciona a resposta ao histórico
             add_message("assistant", resposta)
+        except LimiteExcedido as e:
+            # A pergunta não admitida sai do histórico, para não ser reenviada na próxima
+            remove_last_message()
+            aviso_fila.warning(str(e))
+        except ErroLLM as e:
+            # O erro é apenas exibido: nem ele nem a pergunta entram no histórico enviado ao modelo
+            remove_last_message()
+            aviso_fila.empty()
+            st.error(MENSAGENS_ERRO[e.tipo])
+            print(f"Erro ao gerar resposta: {str(e)}")
         except Exception as e:
-            error_msg = f"Desculpe, ocorreu um erro ao processar sua pergunta: {str(e)}"
-            st.error(error_msg)
-            chat_message("assistant", error_msg, "🤖")
-            add_message("assistant", error_msg)
+            remove_last_message()
+            aviso_fila.empty()
+            st.error(f"Desculpe, ocorreu um erro ao processar sua pergunta: {str(e)}")
+
+# Exibe o uso de tokens da última pergunta
+if st.session_state.get('uso_tokens'):
+    token_usage_panel(st.session_state.uso_tokens)
 
 # Exibe o rodapé
 footer()
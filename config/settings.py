@@ -31,9 +31,129 @@ ASSETS_DIR = os.path.join(ROOT_DIR, "assets")
 CSS_DIR = os.path.join(ASSETS_DIR, "css")
 IMG_DIR = os.path.join(ASSETS_DIR, "img")
 DOCUMENTS_DIR = os.path.join(ROOT_DIR, "documentos")
+DATA_DIR = os.getenv('TARS_DATA_DIR', os.path.join(ROOT_DIR, "dados"))
+
+# Configurações de persistência
+DATABASE_PATH = os.path.join(DATA_DIR, "tars.db")  # Banco SQLite com conversas e documentos
+CACHE_PATH = os.path.join(DATA_DIR, "cache.db")  # Cache compartilhado entre processos (backend 'sqlite')
+EMBEDDINGS_DIR = os.path.join(DATA_DIR, "embeddings")  # Matrizes de embeddings (np.memmap)
+HISTORY_PAGE_SIZE = 20  # Mensagens carregadas por página ao retomar uma conversa
+
+# Limites de uso da API da Anthropic (por processo), por minuto
+RATE_LIMIT_GLOBAL_RPM = int(os.getenv('TARS_RATE_LIMIT_RPM', '50'))  # Requisições de todas as sessões
+RATE_LIMIT_GLOBAL_TPM = int(os.getenv('TARS_RATE_LIMIT_TPM', '400000'))  # Tokens (entrada e saída) de todas as sessões
+RATE_LIMIT_SESSION_RPM = 10  # Requisições de uma mesma sessão
+RATE_LIMIT_SESSION_TPM = 200000  # Tokens de uma mesma sessão
+RATE_LIMIT_MAX_WAIT = 60  # Tempo máximo em segundos que uma chamada aguarda na fila
+RATE_LIMIT_MAX_QUEUE = 3  # Chamadas de uma mesma sessão aguardando na fila ao mesmo tempo
+
+# Novas tentativas em falhas transitórias da API (sobrecarga, limite de requisições, rede)
+LLM_MAX_RETRIES = 4  # Novas tentativas por chamada
+LLM_BACKOFF_BASE = 1.0  # Espera máxima em segundos antes da primeira nova tentativa (dobra a cada tentativa)
+LLM_BACKOFF_MAX = 20.0  # Teto em segundos da espera entre tentativas
+LLM_DEADLINE = 120  # Prazo total em segundos de uma resposta, incluindo fila e novas tentativas
+LLM_MAX_CONTINUATIONS = 2  # Vezes que uma resposta interrompida é continuada do texto parcial
+
+# Configurações do material de estudo (resumo, roteiro, glossário e questionário) por documento
+STUDY_ARTIFACTS_ENABLED = os.getenv('TARS_STUDY_ARTIFACTS', '').lower() in ('1', 'true', 'sim')  # Gera ao carregar a fonte
+STUDY_ARTIFACTS_WORKERS = 1  # Documentos processados simultaneamente em segundo plano
+
+# Configurações de perguntas em lote
+BATCH_MAX_PARALLEL = 4  # Chamadas simultâneas quando a Message Batches API não é usada
+
+# Configurações da API HTTP (api.py)
+API_HISTORY_LIMIT = 50  # Mensagens mais recentes enviadas ao modelo em cada pergunta
 
 # Configuração de cache
 CACHE_TTL = 3600  # Tempo de vida do cache em segundos (1 hora)
+HTTP_CACHE_TTL = 7 * 24 * 3600  # Tempo de vida dos validadores HTTP (ETag/Last-Modified) em segundos
+
+# Configurações do cache compartilhado entre réplicas do servidor
+CACHE_BACKEND = os.getenv('TARS_CACHE_BACKEND', 'sqlite')  # 'memoria', 'sqlite' ou 'redis'
+REDIS_URL = os.getenv('TARS_REDIS_URL', 'redis://localhost:6379/0')  # Usado pelo backend 'redis'
+LEASE_TTL = 600  # Validade em segundos do lease de quem está carregando uma fonte
+LEASE_WAIT = 900  # Tempo máximo em segundos aguardando o carregamento feito por outro processo
+LEASE_POLL_INTERVAL = 0.5  # Intervalo em segundos entre as verificações durante a espera
+
+# Configurações de carregamento antecipado (prefetch)
+PREFETCH_DEBOUNCE = 0.6  # Espera em segundos após a URL ser informada antes de carregar
+PREFETCH_WORKERS = 2  # Carregamentos antecipados simultâneos
+WARM_SOURCES = [url.strip() for url in os.getenv('TARS_WARM_SOURCES', '').split(',') if url.strip()]  # Fontes carregadas ao iniciar
+
+# Configurações de requisições HTTP
+HTTP_TIMEOUT = 15  # Tempo limite das requisições em segundos
+
+# Configurações do modo de rastreamento de sites (crawl)
+CRAWL_MAX_DEPTH = 2  # Profundidade máxima de links a partir da página inicial
+CRAWL_MAX_PAGES = 30  # Número máximo de páginas carregadas por rastreamento
+CRAWL_CONCURRENCY = 5  # Requisições simultâneas durante o rastreamento
+
+# Configurações de playlists e canais do YouTube
+YOUTUBE_PLAYLIST_MAX_VIDEOS = 50  # Número máximo de vídeos carregados por playlist
+YOUTUBE_CONCURRENCY = 16  # Transcrições buscadas simultaneamente
+
+# Transcrição local (faster-whisper + yt-dlp) de vídeos sem legendas
+LOCAL_TRANSCRIPTION_ENABLED = os.getenv('TARS_LOCAL_TRANSCRIPTION', '').lower() in ('1', 'true', 'sim')  # Requer os pacotes opcionais
+WHISPER_MODEL = os.getenv('TARS_WHISPER_MODEL', 'small')  # Modelo do faster-whisper ('tiny', 'base', 'small'...)
+WHISPER_COMPUTE_TYPE = 'int8'  # Quantização usada na CPU
+TRANSCRIPTION_SEGMENT_SECONDS = 300  # Duração dos trechos de áudio transcritos em paralelo
+TRANSCRIPTION_OVERLAP_SECONDS = 2  # Sobreposição entre trechos, para não cortar palavras na emenda
+TRANSCRIPTION_WORKERS = max(1, (os.cpu_count() or 2) // 2)  # Trechos transcritos simultaneamente
+TRANSCRIPTION_MAX_DURATION = 3 * 3600  # Vídeos mais longos (em segundos) não são transcritos localmente
+TRANSCRIPTION_CACHE_TTL = 30 * 24 * 3600  # Tempo de vida das transcrições locais no cache (30 dias)
+TRANSCRIPTION_LEASE_TTL = 2 * 3600  # Validade do lease de quem está transcrevendo um vídeo
+
+# Análise de imagens grandes por regiões (Vision API)
+IMAGE_TILING_ENABLED = os.getenv('TARS_IMAGE_TILING', '1').lower() in ('1', 'true', 'sim')  # Analisa imagens grandes por regiões
+IMAGE_TILING_MIN_PIXELS = 2_000_000  # Imagens (ou quadros) com mais pixels que isso são divididas em regiões
+IMAGE_TILE_MAX_SIDE = 1568  # Lado máximo de uma região (acima disso, a API reduz a imagem)
+IMAGE_TILE_MAX_PIXELS = 1_150_000  # Pixels máximos de uma região (acima disso, a API reduz a imagem)
+IMAGE_TILE_OVERLAP = 100  # Sobreposição em pixels entre regiões vizinhas
+IMAGE_MAX_TILES = 12  # Regiões por quadro; quadros maiores são reduzidos até caber
+IMAGE_MAX_FRAMES = 4  # Quadros analisados em imagens com vários quadros (TIFF, GIF)
+IMAGE_WORKERS = 3  # Chamadas simultâneas à API por imagem (limitadas por RATE_LIMIT_MAX_QUEUE)
+
+# Configurações do armazenamento comprimido de documentos (compartilhado entre sessões)
+DOCUMENT_STORE_MAX_INACTIVE_BYTES = 256 * 1024 * 1024  # Limite para textos sem referência
+COMPRESSION_LEVEL = 6  # Nível de compressão (zstd ou zlib)
+
+# Configurações de upload de arquivos
+UPLOAD_SPILL_THRESHOLD = 32 * 1024 * 1024  # Streams maiores que 32 MB são gravados em disco
+BLOB_DIR = os.path.join(DATA_DIR, "blobs")  # Arquivos enviados, guardados uma única vez pelo hash do conteúdo
+BLOB_TTL = 7 * 24 * 3600  # Sessões sem atividade há mais tempo (7 dias) deixam de manter os arquivos enviados
+PARSED_CACHE_TTL = 7 * 24 * 3600  # Tempo de vida no cache compartilhado do texto extraído de cada arquivo (7 dias)
+
+# Configurações do índice de chunks
+CHUNK_SIZE = 1500  # Tamanho aproximado de cada chunk em caracteres
+CHUNK_OVERLAP = 200  # Sobreposição entre chunks consecutivos em caracteres
+
+# Configurações de deduplicação de trechos quase idênticos
+DEDUP_SIMILARITY_THRESHOLD = 0.7  # Similaridade (Jaccard estimada) a partir da qual trechos são duplicados
+DEDUP_MIN_WORDS = 15  # Trechos com menos palavras nunca são considerados duplicados
+
+# Configurações do índice vetorial (embeddings locais)
+EMBEDDING_DIM = 512  # Dimensões dos embeddings gerados por hashing
+EMBEDDING_QUANTIZE = False  # Guarda os vetores em int8 (4x menos espaço) em vez de float32
+IVF_MIN_VECTORS = 20000  # A partir deste número de vetores, a busca usa partições IVF
+IVF_NPROBE = 8  # Partições IVF examinadas em cada busca
+
+# Configurações da recuperação híbrida (BM25 + vetores)
+RETRIEVAL_TOP_K = 12  # Chunks enviados ao modelo quando o documento excede o orçamento
+RETRIEVAL_CANDIDATES = 50  # Resultados de cada busca considerados antes da fusão
+RRF_K = 60  # Constante da fusão de rankings recíprocos
+BM25_K1 = 1.5  # Saturação da frequência dos termos no BM25
+BM25_B = 0.75  # Normalização pelo tamanho do trecho no BM25
+MAX_INDICES_EM_CACHE = 8  # Índices de documentos mantidos em memória (API e lotes)
+
+# Configurações de compressão do contexto
+CONTEXT_TOKEN_BUDGET = 12000  # Tokens do documento incluídos no prompt do sistema
+COMPRESSION_MMR_LAMBDA = 0.7  # Peso da relevância frente à diversidade na seleção de frases
+
+# Configurações do orçamento da janela de contexto
+CONTEXT_WINDOW = 200000  # Tamanho da janela de contexto do modelo em tokens
+CONTEXT_SAFETY_MARGIN = 2000  # Margem reservada para compensar erros da contagem aproximada
+HISTORY_TOKEN_BUDGET = 8000  # Tokens máximos do histórico de mensagens enviado ao modelo
+USE_API_TOKEN_COUNT = os.getenv('TARS_USE_API_TOKEN_COUNT', '').lower() in ('1', 'true', 'sim')  # Contagem exata pela API
 
 # Mensagens do sistema
 SYSTEM_MESSAGE_TEMPLATE = """
@@ -51,6 +171,8 @@ Instruções adicionais:
 - Se as informações não forem suficientes para responder, informe que você não tem dados suficientes sobre o assunto.
 - Mantenha suas respostas concisas e diretas ao ponto.
 - Quando citar informações do documento, indique a fonte.
+- Em documentos PDF, cite o arquivo e a página indicados pelos marcadores [Página N] ou pelas referências dos trechos (por exemplo, apostila.pdf, p. 12).
+- Em transcrições de vídeos, cite o minuto como aparece no texto (por exemplo, [12:34] ou, em playlists, [V3 12:34] para o vídeo 3).
 - Você é um assistente projetado para auxiliar estudantes em seus estudos, então use exemplos e analogias técnicas quando apropriado.
 - Se perguntar quem te criou, responda que foi desenvolvido pelo Daniel J Machado com auxílio do Claude AI da Anthropic.
 """
@@ -0,0 +1,234 @@
+"""
+Módulo de material de estudo gerado por documento: resumo, roteiro, glossário e questionário.
+
+Os materiais são gerados em segundo plano quando uma fonte é carregada (se
+STUDY_ARTIFACTS_ENABLED) ou sob demanda, e ficam salvos no banco pelo hash do
+documento. Pedidos comuns no chat ("faça um resumo", "quiz") são respondidos
+diretamente com o material salvo, sem nova chamada ao modelo.
+"""
+
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import STUDY_ARTIFACTS_ENABLED, STUDY_ARTIFACTS_WORKERS, CONTEXT_TOKEN_BUDGET
+from core.compression import normaliza
+from core.index import dividir_em_chunks
+from core.rate_limit import admite
+from core.retry import cria_mensagem
+from core.shared_cache import exclusivo
+from core.storage import salvar_artefato, carregar_artefatos, obter_conteudo
+from core.tokens import contar_tokens
+
+# Materiais gerados para cada documento: título exibido e instrução enviada ao modelo
+ARTEFATOS = {
+    'resumo': {
+        'titulo': 'Resumo',
+        'instrucao': "Faça um resumo completo do conteúdo, em alguns parágrafos, destacando as ideias principais."
+    },
+    'roteiro': {
+        'titulo': 'Roteiro de estudo',
+        'instrucao': "Monte um roteiro de estudo do conteúdo: os tópicos e subtópicos em tópicos hierárquicos, na ordem em que aparecem."
+    },
+    'glossario': {
+        'titulo': 'Glossário',
+        'instrucao': "Liste os principais conceitos e termos técnicos do conteúdo, em ordem alfabética, com uma definição curta de cada um."
+    },
+    'questionario': {
+        'titulo': 'Questionário',
+        'instrucao': "Crie um questionário de revisão com 10 perguntas de múltipla escolha sobre o conteúdo, com o gabarito comentado ao final."
+    },
+}
+
+# Pedidos do chat atendidos com o material salvo (comparados sem acentos e pontuação)
+_CORTESIA = r'(?:por favor )?(?:(?:voce )?(?:pode|poderia) )?(?:me )?'
+_VERBO = (
+    r'(?:faca|faz|fazer|gere|gerar|crie|criar|de|da|dar|escreva|escrever|mostre|mostrar|liste|listar|'
+    r'monte|montar|quero|preciso de|quais sao) '
+)
+_ARTIGO = r'(?:me )?(?:(?:um|uma|o|a|os|as) )?'
+_OBJETO = (
+    r' (?:d?[oa]s?|deste|desta|desse|dessa|sobre o|sobre a) '
+    r'(?:documento|conteudo|texto|material|videos?|site|pdfs?|aula|arquivos?|fonte|playlist)'
+)
+_FIM = r'(?: por favor)?'
+
+# Para cada material: pedidos inequívocos, reconhecidos mesmo sozinhos ("resumo"), e
+# palavras genéricas ("estrutura", "conceitos"), reconhecidas apenas com um verbo
+# ("liste os conceitos") ou com o objeto ("conceitos do documento"); sozinhas, seguem
+# para o modelo, com o contexto da conversa
+_PEDIDOS = {
+    'resumo': (r'resumo(?: geral)?|resuma(?: tudo)?', None),
+    'roteiro': (r'roteiro(?: de estudos?)?|topicos principais|principais topicos', r'topicos|estrutura|sumario'),
+    'glossario': (
+        r'glossario|principais (?:conceitos|termos)|(?:conceitos|termos) (?:chave|principais|importantes|tecnicos)',
+        r'conceitos|termos'
+    ),
+    'questionario': (
+        r'quiz|questionario|(?:perguntas|questoes) de (?:revisao|estudo)|simulado|teste de conhecimentos?',
+        r'exercicios'
+    ),
+}
+
+def _padrao_pedido(inequivocos, genericos):
+    """Monta a expressão regular de um tipo de pedido (ver _PEDIDOS)."""
+    alternativas = [_CORTESIA + f'(?:{_VERBO})?' + _ARTIGO + f'(?:{inequivocos})' + f'(?:{_OBJETO})?' + _FIM]
+    if genericos:
+        alternativas.append(_CORTESIA + _VERBO + _ARTIGO + f'(?:{genericos})' + f'(?:{_OBJETO})?' + _FIM)
+        alternativas.append(_CORTESIA + _ARTIGO + f'(?:{genericos})' + _OBJETO + _FIM)
+    return re.compile('|'.join(f'(?:{alternativa})' for alternativa in alternativas))
+
+_PADROES_PEDIDOS = {tipo: _padrao_pedido(*padroes) for tipo, padroes in _PEDIDOS.items()}
+
+_executor = ThreadPoolExecutor(max_workers=STUDY_ARTIFACTS_WORKERS, thread_name_prefix='artefatos')
+_trava = threading.Lock()
+_em_processamento = set()  # hashes de documentos com materiais sendo gerados
+
+def amostra_documento(documento, orcamento_tokens=CONTEXT_TOKEN_BUDGET):
+    """
+    Seleciona chunks distribuídos uniformemente pelo documento, dentro do orçamento.
+
+    Os materiais de estudo tratam do documento inteiro, então, quando ele não cabe
+    no prompt, o conteúdo enviado é uma amostra espaçada de todo o documento (e não
+    os trechos recuperados para a instrução, que se concentrariam em poucas partes).
+
+    Args:
+        documento: Texto completo do documento
+        orcamento_tokens: Número máximo de tokens da amostra
+
+    Returns:
+        Lista de chunks na ordem do documento, ou None se o documento já couber inteiro
+    """
+    if contar_tokens(documento) <= orcamento_tokens:
+        return None
+    chunks = dividir_em_chunks(documento, sobreposicao=0)
+    tokens = [contar_tokens(chunk) for chunk in chunks]
+    quantidade = max(1, len(chunks) * orcamento_tokens // sum(tokens))
+    while True:
+        posicoes = sorted({i * len(chunks) // quantidade for i in range(quantidade)})
+        if quantidade == 1 or sum(tokens[i] for i in posicoes) <= orcamento_tokens:
+            return [chunks[i] for i in posicoes]
+        quantidade -= 1
+
+def gera_artefato(documento_info, tipo):
+    """
+    Gera um material de estudo do documento com uma chamada ao modelo.
+
+    O documento é enviado inteiro quando cabe no orçamento; caso contrário, é usada
+    uma amostra uniforme dos seus chunks (ver amostra_documento).
+
+    Args:
+        documento_info: Informações do documento (com 'conteudo' ou 'documento_hash')
+        tipo: Tipo do material (chave de ARTEFATOS)
+
+    Returns:
+        String com o material gerado
+    """
+    from core.llm import plan_request, tokens_reservados
+
+    trechos = amostra_documento(obter_conteudo(documento_info))
+    parametros, uso = plan_request(
+        [{'role': 'user', 'content': ARTEFATOS[tipo]['instrucao']}], documento_info, trechos=trechos
+    )
+    # Geração em segundo plano: sujeita apenas aos limites globais
+    reserva = admite(None, tokens_reservados(uso))
+    response = cria_mensagem(parametros)
+    reserva.ajusta(response.usage.input_tokens + response.usage.output_tokens)
+    return response.content[0].text
+
+def _processa(documento_info):
+    """Gera e salva os materiais ainda inexistentes de um documento."""
+    documento_hash = documento_info['documento_hash']
+    try:
+        for tipo in ARTEFATOS:
+            # Apenas uma réplica gera cada material; as demais encontram-no já salvo
+            with exclusivo(f"artefato:{documento_hash}:{tipo}"):
+                if tipo in carregar_artefatos(documento_hash):
+                    continue
+                try:
+                    salvar_artefato(documento_hash, tipo, gera_artefato(documento_info, tipo))
+                    print(f"Material de estudo gerado: {tipo} ({documento_hash[:12]})")
+                except Exception as e:
+                    print(f"Erro ao gerar o material de estudo '{tipo}': {str(e)}")
+    finally:
+        with _trava:
+            _em_processamento.discard(documento_hash)
+
+def agenda_artefatos(documento_info, forcar=False):
+    """
+    Agenda a geração dos materiais de estudo de um documento em segundo plano.
+
+    Args:
+        documento_info: Referência ao documento salvo (com 'documento_hash')
+        forcar: Se True, gera mesmo com STUDY_ARTIFACTS_ENABLED desativado
+
+    Returns:
+        True se a geração foi agendada (ou já estava em andamento), False caso contrário
+    """
+    if not (STUDY_ARTIFACTS_ENABLED or forcar):
+        return False
+    if not isinstance(documento_info, dict) or not documento_info.get('documento_hash'):
+        return False
+
+    documento_hash = documento_info['documento_hash']
+    with _trava:
+        if documento_hash in _em_processamento:
+            return True
+        if len(carregar_artefatos(documento_hash)) == len(ARTEFATOS):
+            return False
+        _em_processamento.add(documento_hash)
+    _executor.submit(_processa, dict(documento_info))
+    return True
+
+def em_processamento(documento_info):
+    """Indica se os materiais do documento estão sendo gerados neste processo."""
+    return isinstance(documento_info, dict) and documento_info.get('documento_hash') in _em_processamento
+
+def artefatos_documento(documento_info):
+    """
+    Retorna os materiais de estudo já gerados para um documento.
+
+    Args:
+        documento_info: Referência ao documento salvo (com 'documento_hash')
+
+    Returns:
+        Dicionário {tipo: conteúdo}, na ordem de ARTEFATOS
+    """
+    if not isinstance(documento_info, dict) or not documento_info.get('documento_hash'):
+        return {}
+    salvos = carregar_artefatos(documento_info['documento_hash'])
+    return {tipo: salvos[tipo] for tipo in ARTEFATOS if tipo in salvos}
+
+def tipo_pedido(pergunta):
+    """
+    Identifica se a pergunta é um pedido comum atendido por um material de estudo.
+
+    Apenas pedidos genéricos são reconhecidos ("faça um resumo", "quiz do vídeo");
+    pedidos específicos ("resuma a seção 3") seguem para o modelo.
+
+    Args:
+        pergunta: Texto da pergunta
+
+    Returns:
+        Tipo do material (chave de ARTEFATOS) ou None
+    """
+    texto = ' '.join(re.sub(r'[^\w\s]', ' ', normaliza(pergunta or '')).split())
+    for tipo, padrao in _PADROES_PEDIDOS.items():
+        if padrao.fullmatch(texto):
+            return tipo
+    return None
+
+def resposta_pronta(pergunta, documento_info):
+    """
+    Retorna o material de estudo salvo que responde à pergunta, se houver.
+
+    Args:
+        pergunta: Texto da pergunta
+        documento_info: Documento atual da sessão
+
+    Returns:
+        String com a resposta ou None se a pergunta deve ser enviada ao modelo
+    """
+    tipo = tipo_pedido(pergunta)
+    if tipo is None:
+        return None
+    return artefatos_documento(documento_info).get(tipo)
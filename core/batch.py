@@ -0,0 +1,188 @@
+"""
+Módulo para responder listas de perguntas em lote sobre a fonte carregada.
+Usa a Message Batches API da Anthropic (assíncrona e mais barata) ou, como
+alternativa, chamadas paralelas com número limitado de requisições simultâneas.
+"""
+
+import hashlib
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config.settings import BATCH_MAX_PARALLEL, MAX_TOKENS, RATE_LIMIT_MAX_QUEUE
+from core.clients import get_client
+from core.llm import build_request
+from core.rate_limit import admite
+from core.retry import cria_mensagem
+from core.shared_cache import obtem_ou_calcula
+from core.storage import obter_conteudo
+from core.tokens import contar_tokens
+
+def le_perguntas(texto=None, arquivo_csv=None):
+    """
+    Lê a lista de perguntas de um texto (uma por linha) ou de um arquivo CSV.
+
+    No CSV, usa a coluna 'pergunta' se existir, ou a primeira coluna.
+
+    Args:
+        texto: Texto com uma pergunta por linha
+        arquivo_csv: Arquivo CSV (caminho ou objeto de arquivo)
+
+    Returns:
+        Lista de strings com as perguntas, sem linhas vazias
+    """
+    perguntas = []
+    if arquivo_csv is not None:
+        import pandas as pd
+        tabela = pd.read_csv(arquivo_csv)
+        coluna = 'pergunta' if 'pergunta' in tabela.columns else tabela.columns[0]
+        perguntas.extend(str(valor) for valor in tabela[coluna].dropna())
+    if texto:
+        perguntas.extend(texto.splitlines())
+    return [pergunta.strip() for pergunta in perguntas if pergunta.strip()]
+
+def _prepara_documento(documento_info):
+    """Resolve o conteúdo do documento uma única vez para todas as perguntas do lote."""
+    if isinstance(documento_info, dict) and 'conteudo' not in documento_info:
+        return dict(documento_info, conteudo=obter_conteudo(documento_info))
+    return documento_info
+
+def _parametros_pergunta(pergunta, documento_info):
+    """Monta os parâmetros da chamada para uma pergunta, com cache do prompt do sistema."""
+    parametros = build_request([{'role': 'user', 'content': pergunta}], documento_info)
+    # O prompt do sistema (com o documento) é igual em todas as perguntas do lote
+    parametros['system'] = [{
+        'type': 'text',
+        'text': parametros['system'],
+        'cache_control': {'type': 'ephemeral'}
+    }]
+    return parametros
+
+def envia_lote(perguntas, documento_info, sessao=None):
+    """
+    Envia as perguntas para processamento pela Message Batches API.
+
+    Args:
+        perguntas: Lista de perguntas
+        documento_info: Informações do documento para contexto
+        sessao: ID da sessão, usado nos limites de uso por sessão
+
+    Returns:
+        String com o ID do lote criado
+    """
+    documento_info = _prepara_documento(documento_info)
+    # Os tokens do lote contam em limites próprios da Batches API; aqui só a requisição
+    admite(sessao, 0)
+    lote = get_client().messages.batches.create(requests=[
+        {'custom_id': f'pergunta-{posicao}', 'params': _parametros_pergunta(pergunta, documento_info)}
+        for posicao, pergunta in enumerate(perguntas)
+    ])
+    print(f"Lote enviado: {lote.id} ({len(perguntas)} perguntas)")
+    return lote.id
+
+def consulta_lote(lote_id, sessao=None):
+    """
+    Consulta o andamento de um lote.
+
+    Args:
+        lote_id: ID do lote
+        sessao: ID da sessão, usado nos limites de uso por sessão
+
+    Returns:
+        Dicionário com 'concluido' (bool), 'processadas' e 'total'
+    """
+    admite(sessao, 0)
+    lote = get_client().messages.batches.retrieve(lote_id)
+    contagem = lote.request_counts
+    processadas = contagem.succeeded + contagem.errored + contagem.canceled + contagem.expired
+    return {
+        'concluido': lote.processing_status == 'ended',
+        'processadas': processadas,
+        'total': processadas + contagem.processing
+    }
+
+def resultados_lote(lote_id, perguntas, sessao=None):
+    """
+    Obtém as respostas de um lote concluído.
+
+    Args:
+        lote_id: ID do lote
+        perguntas: Lista de perguntas na mesma ordem em que foram enviadas
+        sessao: ID da sessão, usado nos limites de uso por sessão
+
+    Returns:
+        Lista de dicionários com 'pergunta', 'resposta' e 'status', na ordem das perguntas
+    """
+    resultados = [{'pergunta': pergunta, 'resposta': '', 'status': 'sem resultado'} for pergunta in perguntas]
+    admite(sessao, 0)
+    for item in get_client().messages.batches.results(lote_id):
+        posicao = int(item.custom_id.split('-')[-1])
+        if item.result.type == 'succeeded':
+            resultados[posicao]['resposta'] = item.result.message.content[0].text
+            resultados[posicao]['status'] = 'ok'
+        else:
+            resultados[posicao]['status'] = item.result.type
+    return resultados
+
+def executa_paralelo(perguntas, documento_info, max_paralelo=BATCH_MAX_PARALLEL, on_progress=None, sessao=None):
+    """
+    Responde as perguntas com chamadas diretas ao modelo, limitando as simultâneas.
+
+    As chamadas passam pelo controle de admissão da sessão, como as perguntas do
+    chat; por isso, no máximo RATE_LIMIT_MAX_QUEUE delas aguardam ao mesmo tempo.
+
+    Args:
+        perguntas: Lista de perguntas
+        documento_info: Informações do documento para contexto
+        max_paralelo: Número máximo de chamadas simultâneas
+        on_progress: Função opcional chamada com (processadas, total) a cada resposta
+        sessao: ID da sessão, usado nos limites de uso por sessão
+
+    Returns:
+        Lista de dicionários com 'pergunta', 'resposta' e 'status', na ordem das perguntas
+    """
+    documento_info = _prepara_documento(documento_info)
+    resultados = [{'pergunta': pergunta, 'resposta': '', 'status': ''} for pergunta in perguntas]
+
+    def responde(pergunta):
+        # Respostas ficam no cache compartilhado: repetir o lote (nesta ou em outra
+        # réplica) não chama o modelo de novo para as mesmas perguntas e documento
+        parametros = _parametros_pergunta(pergunta, documento_info)
+        chave = hashlib.sha256(json.dumps(parametros, sort_keys=True).encode('utf-8')).hexdigest()
+
+        def chama():
+            tokens = contar_tokens(parametros['system'][0]['text']) + contar_tokens(pergunta) + MAX_TOKENS
+            reserva = admite(sessao, tokens)
+            response = cria_mensagem(parametros)
+            reserva.ajusta(response.usage.input_tokens + response.usage.output_tokens)
+            return response.content[0].text
+        return obtem_ou_calcula(f"resposta:{chave}", chama)
+
+    with ThreadPoolExecutor(max_workers=min(max_paralelo, RATE_LIMIT_MAX_QUEUE)) as executor:
+        futuros = {executor.submit(responde, pergunta): posicao for posicao, pergunta in enumerate(perguntas)}
+        for processadas, futuro in enumerate(as_completed(futuros), start=1):
+            posicao = futuros[futuro]
+            try:
+                resultados[posicao]['resposta'] = futuro.result()
+                resultados[posicao]['status'] = 'ok'
+            except Exception as e:
+                print(f"Erro ao responder a pergunta {posicao + 1}: {str(e)}")
+                resultados[posicao]['status'] = f'erro: {str(e)}'
+            if on_progress:
+                on_progress(processadas, len(perguntas))
+
+    return resultados
+
+def exporta_csv(resultados):
+    """
+    Exporta os resultados de um lote para CSV.
+
+    Args:
+        resultados: Lista de dicionários com 'pergunta', 'resposta' e 'status'
+
+    Returns:
+        Bytes do arquivo CSV (UTF-8 com BOM, para abrir corretamente no Excel)
+    """
+    import pandas as pd
+    buffer = io.StringIO()
+    pd.DataFrame(resultados, columns=['pergunta', 'resposta', 'status']).to_csv(buffer, index=False)
+    return buffer.getvalue().encode('utf-8-sig')
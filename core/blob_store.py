@@ -0,0 +1,212 @@
+"""
+Módulo do armazenamento dos arquivos enviados, endereçados pelo hash do conteúdo.
+
+O hash de cada upload é calculado durante a leitura. Arquivos menores que
+UPLOAD_SPILL_THRESHOLD continuam em memória, como nos carregadores; apenas os maiores
+são gravados, uma única vez, em BLOB_DIR, mesmo que enviados por várias sessões. Cada
+sessão registra no banco (tabela blob_referencias) os arquivos gravados que usa; o
+arquivo é apagado quando a última referência é liberada, e as referências de sessões
+sem atividade há mais de BLOB_TTL segundos (por exemplo, abas do Streamlit
+abandonadas, que nunca chamam libera) expiram. O texto extraído é reaproveitado pelo
+hash (ver utils.loaders.pdf_loader), então o processamento também acontece uma vez
+por arquivo.
+"""
+
+import os
+import hashlib
+import tempfile
+from datetime import datetime, timedelta
+from config.settings import BLOB_DIR, BLOB_TTL, UPLOAD_SPILL_THRESHOLD
+from core import storage
+from utils.loaders.buffers import TAMANHO_BLOCO, obtem_buffer, hash_buffer, nome_arquivo
+
+class Blob:
+    """
+    Arquivo guardado no armazenamento.
+
+    Attributes:
+        hash: Hash SHA-256 do conteúdo
+        caminho: Caminho do arquivo em BLOB_DIR (None se o conteúdo estiver em memória)
+        dados: Conteúdo em memória dos arquivos pequenos (None se estiver em disco)
+        name: Nome original do arquivo enviado (usado pelos carregadores)
+    """
+
+    __slots__ = ('hash', 'caminho', 'dados', 'name')
+
+    def __init__(self, chave, nome, dados=None):
+        self.hash = chave
+        self.caminho = caminho_blob(chave) if dados is None else None
+        self.dados = dados
+        self.name = nome
+
+    def read(self):
+        """Lê o conteúdo completo do arquivo."""
+        if self.dados is not None:
+            return bytes(self.dados)
+        with open(self.caminho, 'rb') as f:
+            return f.read()
+
+    def __repr__(self):
+        return f"Blob({self.name!r}, {self.hash[:12]})"
+
+def caminho_blob(chave):
+    """
+    Retorna o caminho do arquivo com o hash informado (em subpastas pelos 2 primeiros caracteres).
+
+    Args:
+        chave: Hash SHA-256 do conteúdo
+
+    Returns:
+        Caminho do arquivo em BLOB_DIR
+    """
+    return os.path.join(BLOB_DIR, chave[:2], chave)
+
+def _temporario(diretorio):
+    """Cria um arquivo temporário para gravação em BLOB_DIR (mesmo sistema de arquivos dos destinos)."""
+    os.makedirs(diretorio, exist_ok=True)
+    descritor, caminho = tempfile.mkstemp(dir=diretorio, suffix='.tmp')
+    return os.fdopen(descritor, 'wb'), caminho
+
+def _copia_com_hash(stream, limite=UPLOAD_SPILL_THRESHOLD):
+    """
+    Lê um stream em blocos calculando o hash durante a leitura.
+
+    O conteúdo fica em memória enquanto for menor que o limite; acima dele, é copiado
+    para um arquivo temporário em BLOB_DIR.
+
+    Returns:
+        Tupla (caminho do temporário ou None, conteúdo em memória ou None, hash SHA-256)
+    """
+    sha256 = hashlib.sha256()
+    memoria = bytearray()
+    destino = caminho = None
+    try:
+        for bloco in iter(lambda: stream.read(TAMANHO_BLOCO), b''):
+            sha256.update(bloco)
+            if destino is None and len(memoria) + len(bloco) < limite:
+                memoria += bloco
+                continue
+            if destino is None:
+                destino, caminho = _temporario(BLOB_DIR)
+                destino.write(memoria)
+                memoria = None
+            destino.write(bloco)
+    except BaseException:
+        if destino is not None:
+            destino.close()
+            os.remove(caminho)
+        raise
+    if destino is not None:
+        destino.close()
+    return caminho, memoria, sha256.hexdigest()
+
+def _move(temporario, chave):
+    """Move o arquivo temporário para o caminho do hash (ou o descarta se o conteúdo já estiver lá)."""
+    destino = caminho_blob(chave)
+    if os.path.exists(destino):
+        os.remove(temporario)
+        return
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    os.replace(temporario, destino)
+
+def guarda(arquivo, session_id):
+    """
+    Guarda um arquivo enviado e registra a referência da sessão a ele.
+
+    Arquivos em memória têm o hash calculado diretamente sobre o buffer; streams são
+    lidos em blocos enquanto o hash é calculado. Arquivos menores que
+    UPLOAD_SPILL_THRESHOLD ficam em memória e não são registrados; os maiores são
+    gravados em BLOB_DIR (se o conteúdo já estiver guardado, nada é mantido em disco
+    além dele) e a referência da sessão é registrada.
+
+    Args:
+        arquivo: Arquivo em memória (bytes, memoryview, UploadedFile do Streamlit) ou
+                 stream com método read() (inclusive UploadFile, pelo atributo 'file')
+        session_id: ID da sessão que usa o arquivo
+
+    Returns:
+        Blob com o hash, o conteúdo (em memória ou em disco) e o nome original do arquivo
+    """
+    nome = nome_arquivo(arquivo)
+    buffer = obtem_buffer(arquivo)
+    if buffer is not None:
+        chave = hash_buffer(buffer)
+        temporario = None
+    else:
+        temporario, buffer, chave = _copia_com_hash(getattr(arquivo, 'file', arquivo))
+    if temporario is None and len(buffer) < UPLOAD_SPILL_THRESHOLD:
+        return Blob(chave, nome, dados=buffer)
+
+    try:
+        # A referência é registrada antes de conferir o arquivo: se outra sessão o
+        # apagou nesse meio tempo (ver libera), ele é gravado de novo
+        storage.referenciar_blob(chave, session_id)
+        if temporario is None and not os.path.exists(caminho_blob(chave)):
+            destino, temporario = _temporario(os.path.dirname(caminho_blob(chave)))
+            with destino:
+                destino.write(buffer)
+        if temporario is not None:
+            _move(temporario, chave)
+    finally:
+        if temporario is not None and os.path.exists(temporario):
+            os.remove(temporario)
+    return Blob(chave, nome)
+
+def guarda_uploads(arquivos, session_id):
+    """
+    Guarda os arquivos enviados por uma sessão, liberando os que ela usava antes.
+
+    Aproveita para expirar as referências de sessões inativas (ver expira).
+
+    Args:
+        arquivos: Lista de arquivos enviados (ver guarda)
+        session_id: ID da sessão
+
+    Returns:
+        Lista de Blobs, na ordem dos arquivos
+    """
+    blobs = [guarda(arquivo, session_id) for arquivo in arquivos]
+    libera(session_id, manter=[blob.hash for blob in blobs if blob.caminho])
+    expira()
+    return blobs
+
+def _remove(chave):
+    try:
+        os.remove(caminho_blob(chave))
+    except FileNotFoundError:
+        pass
+
+def libera(session_id, manter=()):
+    """
+    Libera as referências de uma sessão, apagando os arquivos que ficaram sem referências.
+
+    Args:
+        session_id: ID da sessão
+        manter: Hashes cujas referências devem ser mantidas
+
+    Returns:
+        Número de arquivos apagados
+    """
+    removidos = storage.liberar_blobs(session_id, _remove, manter)
+    if removidos:
+        print(f"{len(removidos)} arquivo(s) sem referências removido(s) do armazenamento")
+    return len(removidos)
+
+def expira(idade=BLOB_TTL):
+    """
+    Libera as referências das sessões sem atividade recente, apagando os arquivos órfãos.
+
+    Sessões do Streamlit encerradas sem limpar a conversa nunca liberam os seus
+    arquivos; a atividade é medida pela última atualização da conversa no banco.
+
+    Args:
+        idade: Tempo em segundos sem atividade a partir do qual a sessão é liberada
+
+    Returns:
+        Número de arquivos apagados
+    """
+    limite = (datetime.now() - timedelta(seconds=idade)).isoformat()
+    removidos = storage.expirar_blobs(limite, _remove)
+    if removidos:
+        print(f"{len(removidos)} arquivo(s) de sessões inativas removido(s) do armazenamento")
+    return len(removidos)
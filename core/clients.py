@@ -0,0 +1,33 @@
+"""
+Módulo que centraliza a criação dos clientes de API usados pela aplicação.
+Os clientes são criados uma única vez por processo, no primeiro uso, e
+compartilhados por todas as sessões (o cliente da Anthropic é thread-safe).
+"""
+
+from functools import lru_cache
+from config.settings import ANTHROPIC_API_KEY
+
+@lru_cache(maxsize=None)
+def get_client():
+    """
+    Retorna o cliente síncrono da Anthropic, criando-o no primeiro uso.
+
+    Returns:
+        Instância compartilhada de anthropic.Anthropic
+    """
+    # Importação tardia: o SDK só é carregado quando uma chamada ao modelo é feita
+    from anthropic import Anthropic
+    return Anthropic(api_key=ANTHROPIC_API_KEY)
+
+@lru_cache(maxsize=None)
+def get_async_client():
+    """
+    Retorna o cliente assíncrono da Anthropic, criando-o no primeiro uso.
+
+    Usado pela API HTTP, que atende várias sessões no mesmo loop de eventos.
+
+    Returns:
+        Instância compartilhada de anthropic.AsyncAnthropic
+    """
+    from anthropic import AsyncAnthropic
+    return AsyncAnthropic(api_key=ANTHROPIC_API_KEY)
@@ -0,0 +1,193 @@
+"""
+Módulo de compressão do contexto com base na pergunta do usuário.
+Seleciona, dentro de um orçamento de tokens, as frases dos trechos do documento
+mais relevantes para a pergunta, evitando frases redundantes entre trechos.
+"""
+
+import math
+import re
+import unicodedata
+from config.settings import CONTEXT_TOKEN_BUDGET, COMPRESSION_MMR_LAMBDA
+from core.tokens import contar_tokens
+
+# Palavras muito frequentes em português e inglês, ignoradas no cálculo de relevância
+STOPWORDS = frozenset("""
+a o as os um uma uns umas de do da dos das em no na nos nas por pelo pela pelos pelas
+para com sem sob sobre entre ate desde e ou mas que se nao sim como quando onde qual
+quais quem porque pois ja mais menos muito muita muitos muitas seu sua seus suas
+ele ela eles elas isso isto esse essa este esta aquele aquela ser estar ter haver
+foi era sao esta estao tem ha fazer faz pode podem deve devem the of and or to in on
+for with by is are was were be been this that these those it its from at as an
+what which who how why when where does do did can could should would about into
+""".split())
+
+_PADRAO_SENTENCA = re.compile(r'(?<=[.!?])\s+|\n+')
+_PADRAO_PALAVRA = re.compile(r'\w+', re.UNICODE)
+# Referência de arquivo e páginas que abre os trechos recuperados (ver core.retrieval)
+_PADRAO_REFERENCIA = re.compile(r'^\[(?:[^\]\n]+, )?p\. \d+(?:-\d+)?\]$')
+
+def normaliza(texto):
+    """Converte para minúsculas e remove acentos, para comparação de termos."""
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(caractere for caractere in texto if not unicodedata.combining(caractere))
+
+def termos(texto):
+    """
+    Extrai os termos relevantes de um texto (sem acentos, stopwords e palavras curtas).
+
+    Args:
+        texto: Texto a ser processado
+
+    Returns:
+        Lista de termos na ordem em que aparecem
+    """
+    return [
+        palavra for palavra in _PADRAO_PALAVRA.findall(normaliza(texto))
+        if len(palavra) > 2 and palavra not in STOPWORDS
+    ]
+
+def divide_sentencas(texto):
+    """Divide um texto em frases, considerando pontuação final e quebras de linha."""
+    return [sentenca.strip() for sentenca in _PADRAO_SENTENCA.split(texto) if sentenca.strip()]
+
+def _separa_referencia(trecho):
+    """Separa a linha de referência (ex.: '[apostila.pdf, p. 3]') do início do trecho, se houver."""
+    primeira, _, resto = trecho.lstrip().partition('\n')
+    if _PADRAO_REFERENCIA.match(primeira.strip()):
+        return primeira.strip(), resto
+    return None, trecho
+
+def _unidades(texto):
+    """
+    Divide o texto de um trecho nas unidades de seleção: frases e linhas de tabela.
+
+    Linhas de tabelas markdown não são divididas em frases e são marcadas como tabela,
+    já que linhas iguais em tabelas diferentes não são redundantes.
+    """
+    unidades = []
+    for linha in texto.split('\n'):
+        linha = linha.strip()
+        if linha.startswith('|'):
+            unidades.append((linha, True))
+        elif linha:
+            unidades.extend((sentenca, False) for sentenca in divide_sentencas(linha))
+    return unidades
+
+def _similaridade(termos_a, termos_b):
+    """Similaridade de Jaccard entre dois conjuntos de termos."""
+    if not termos_a or not termos_b:
+        return 0.0
+    return len(termos_a & termos_b) / len(termos_a | termos_b)
+
+def comprime_contexto(pergunta, trechos, orcamento_tokens=CONTEXT_TOKEN_BUDGET, lambda_mmr=COMPRESSION_MMR_LAMBDA):
+    """
+    Reduz os trechos às frases mais relevantes para a pergunta, dentro do orçamento.
+
+    A relevância de cada frase é a soma dos pesos IDF dos termos da pergunta que ela
+    contém, normalizada pelo tamanho da frase. As frases são escolhidas por MMR
+    (Maximal Marginal Relevance), penalizando frases parecidas com as já escolhidas,
+    e frases repetidas entre trechos (por exemplo, na sobreposição de chunks) são
+    consideradas uma única vez. A referência de arquivo e páginas que abre um trecho
+    não participa da seleção: ela é mantida antes das frases escolhidas do trecho.
+    Linhas de tabela nunca são divididas nem descartadas como repetidas. O resultado
+    é determinístico.
+
+    Args:
+        pergunta: Pergunta do usuário
+        trechos: Lista de strings com os trechos candidatos, na ordem do documento
+        orcamento_tokens: Número máximo (estimado) de tokens do contexto resultante
+        lambda_mmr: Peso da relevância em relação à diversidade (entre 0 e 1)
+
+    Returns:
+        String com as frases selecionadas, na ordem original, com '[...]' entre
+        partes não contíguas
+    """
+    # Frases únicas, na ordem em que aparecem nos trechos
+    sentencas = []
+    referencias = []
+    vistas = set()
+    for trecho in trechos:
+        referencia, texto = _separa_referencia(trecho)
+        referencias.append(referencia)
+        for sentenca, tabela in _unidades(texto):
+            chave = normaliza(sentenca)
+            if not tabela and chave in vistas:
+                continue
+            vistas.add(chave)
+            sentencas.append({
+                'posicao': len(sentencas),
+                'trecho': len(referencias) - 1,
+                'texto': sentenca,
+                'termos': set(termos(sentenca)),
+                'tokens': contar_tokens(sentenca)
+            })
+
+    if not sentencas:
+        return ""
+
+    # As referências são mantidas fora da seleção, então o seu espaço é reservado antes
+    orcamento_tokens -= sum(contar_tokens(referencia) for referencia in referencias if referencia)
+
+    # Pesos IDF dos termos da pergunta, calculados sobre as frases candidatas
+    termos_pergunta = set(termos(pergunta or ""))
+    frequencia = {termo: sum(1 for s in sentencas if termo in s['termos']) for termo in termos_pergunta}
+    idf = {
+        termo: math.log(1 + len(sentencas) / frequencia[termo])
+        for termo in termos_pergunta if frequencia[termo]
+    }
+
+    for sentenca in sentencas:
+        peso = sum(idf.get(termo, 0.0) for termo in sentenca['termos'] & termos_pergunta)
+        sentenca['relevancia'] = peso / math.sqrt(len(sentenca['termos']) + 1)
+
+    selecionadas = []
+    usados = 0
+    candidatas = [
+        s for s in sentencas if s['relevancia'] > 0 and s['tokens'] <= orcamento_tokens
+    ] if idf else []
+
+    # Seleção por MMR até esgotar o orçamento ou as frases relevantes. A redundância
+    # de cada candidata (maior similaridade com as já escolhidas) é atualizada apenas
+    # com a última frase escolhida, e as frases que não cabem mais no orçamento
+    # restante são descartadas na mesma passada: a seleção termina assim que nenhuma
+    # candidata couber.
+    redundancia = {s['posicao']: 0.0 for s in candidatas}
+    while candidatas:
+        melhor = max(candidatas, key=lambda s: (
+            lambda_mmr * s['relevancia'] - (1 - lambda_mmr) * redundancia[s['posicao']], -s['posicao']
+        ))
+        selecionadas.append(melhor)
+        usados += melhor['tokens']
+        restante = orcamento_tokens - usados
+
+        proximas = []
+        for sentenca in candidatas:
+            if sentenca is melhor or sentenca['tokens'] > restante:
+                continue
+            similaridade = _similaridade(sentenca['termos'], melhor['termos'])
+            if similaridade > redundancia[sentenca['posicao']]:
+                redundancia[sentenca['posicao']] = similaridade
+            proximas.append(sentenca)
+        candidatas = proximas
+
+    # Completa o orçamento com as frases iniciais do documento (contexto geral)
+    escolhidas = {s['posicao'] for s in selecionadas}
+    for sentenca in sentencas:
+        if usados >= orcamento_tokens:
+            break
+        if sentenca['posicao'] not in escolhidas and usados + sentenca['tokens'] <= orcamento_tokens:
+            escolhidas.add(sentenca['posicao'])
+            usados += sentenca['tokens']
+
+    partes = []
+    anterior = None
+    for posicao in sorted(escolhidas):
+        sentenca = sentencas[posicao]
+        novo_trecho = anterior is None or sentenca['trecho'] != sentencas[anterior]['trecho']
+        if anterior is not None and posicao != anterior + 1:
+            partes.append('[...]')
+        if novo_trecho and referencias[sentenca['trecho']]:
+            partes.append(referencias[sentenca['trecho']])
+        partes.append(sentenca['texto'])
+        anterior = posicao
+    return '\n'.join(partes)
@@ -0,0 +1,222 @@
+"""
+Módulo de detecção de trechos quase idênticos (deduplicação semântica leve).
+Usa assinaturas MinHash sobre shingles de palavras e LSH (locality-sensitive hashing)
+para encontrar, sem comparar todos os pares, trechos repetidos entre arquivos e
+versões de um mesmo material, como slides e a apostila gerada a partir deles.
+"""
+
+import hashlib
+import re
+from array import array
+from config.settings import DEDUP_SIMILARITY_THRESHOLD, DEDUP_MIN_WORDS
+from core.compression import normaliza
+from core.tokens import contar_tokens
+
+NUM_BINS = 64  # Tamanho da assinatura MinHash
+LSH_BANDAS = 16  # Bandas do LSH (NUM_BINS / LSH_BANDAS valores por banda)
+TAMANHO_SHINGLE = 3  # Palavras por shingle
+
+_LINHAS_BANDA = NUM_BINS // LSH_BANDAS
+_VAZIO = (1 << 64) - 1
+_PADRAO_PALAVRA = re.compile(r'\w+', re.UNICODE)
+
+def _hash64(texto):
+    """Hash determinístico de 64 bits (o hash() do Python muda a cada execução)."""
+    return int.from_bytes(hashlib.blake2b(texto.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def assinatura(texto):
+    """
+    Calcula a assinatura MinHash de um texto.
+
+    Usa "one permutation hashing": cada shingle é espalhado com um único hash em um
+    dos NUM_BINS compartimentos, e cada compartimento guarda o menor valor recebido.
+    O resultado aproxima o MinHash tradicional com custo linear no tamanho do texto.
+
+    Args:
+        texto: Texto do trecho
+
+    Returns:
+        Tupla (assinatura em array('Q'), número de palavras), ou (None, número de
+        palavras) se o trecho for curto demais para ser comparado com segurança
+    """
+    palavras = _PADRAO_PALAVRA.findall(normaliza(texto))
+    if len(palavras) < DEDUP_MIN_WORDS:
+        return None, len(palavras)
+
+    valores = array('Q', [_VAZIO]) * NUM_BINS
+    for inicio in range(len(palavras) - TAMANHO_SHINGLE + 1):
+        h = _hash64(' '.join(palavras[inicio:inicio + TAMANHO_SHINGLE]))
+        compartimento, valor = h % NUM_BINS, h // NUM_BINS
+        if valor < valores[compartimento]:
+            valores[compartimento] = valor
+    return valores, len(palavras)
+
+def similaridade(assinatura_a, assinatura_b):
+    """
+    Estima a similaridade de Jaccard entre os shingles de dois trechos.
+
+    Args:
+        assinatura_a: Assinatura MinHash do primeiro trecho
+        assinatura_b: Assinatura MinHash do segundo trecho
+
+    Returns:
+        Valor entre 0 e 1
+    """
+    iguais = validos = 0
+    for a, b in zip(assinatura_a, assinatura_b):
+        if a == _VAZIO and b == _VAZIO:
+            continue
+        validos += 1
+        if a == b:
+            iguais += 1
+    return iguais / validos if validos else 0.0
+
+class IndiceLSH:
+    """
+    Índice LSH de assinaturas MinHash para encontrar trechos parecidos.
+
+    Cada assinatura é dividida em bandas; trechos que coincidem em pelo menos uma
+    banda são candidatos, e a similaridade é confirmada com a assinatura completa.
+    """
+
+    def __init__(self):
+        self._assinaturas = {}
+        self._bandas = {}
+
+    def __len__(self):
+        return len(self._assinaturas)
+
+    def _chaves(self, valores):
+        for banda in range(LSH_BANDAS):
+            trecho = valores[banda * _LINHAS_BANDA:(banda + 1) * _LINHAS_BANDA]
+            if any(valor != _VAZIO for valor in trecho):
+                yield banda, trecho.tobytes()
+
+    def adicionar(self, chave, valores):
+        """Adiciona a assinatura de um trecho identificado por chave."""
+        self._assinaturas[chave] = valores
+        for chave_banda in self._chaves(valores):
+            self._bandas.setdefault(chave_banda, set()).add(chave)
+
+    def remover(self, chave):
+        """Remove um trecho do índice, se existir."""
+        valores = self._assinaturas.pop(chave, None)
+        if valores is None:
+            return
+        for chave_banda in self._chaves(valores):
+            chaves = self._bandas.get(chave_banda)
+            if chaves:
+                chaves.discard(chave)
+                if not chaves:
+                    del self._bandas[chave_banda]
+
+    def similar(self, valores, limiar=DEDUP_SIMILARITY_THRESHOLD, aceitar=None):
+        """
+        Procura um trecho indexado parecido com a assinatura informada.
+
+        Args:
+            valores: Assinatura MinHash do trecho procurado
+            limiar: Similaridade mínima para considerar os trechos duplicados
+            aceitar: Função opcional que recebe a chave de um candidato e indica se ele
+                     pode ser considerado (por exemplo, para ignorar trechos em remoção)
+
+        Returns:
+            Chave do primeiro trecho com similaridade acima do limiar, ou None
+        """
+        vistos = set()
+        for chave_banda in self._chaves(valores):
+            for chave in self._bandas.get(chave_banda, ()):
+                if chave in vistos or (aceitar and not aceitar(chave)):
+                    continue
+                vistos.add(chave)
+                if similaridade(valores, self._assinaturas[chave]) >= limiar:
+                    return chave
+        return None
+
+    def limpar(self):
+        """Remove todas as assinaturas do índice."""
+        self._assinaturas = {}
+        self._bandas = {}
+
+def relatorio_vazio():
+    """Relatório de deduplicação sem nenhum trecho removido."""
+    return {'trechos_removidos': 0, 'bytes_removidos': 0, 'tokens_removidos': 0}
+
+def registra_remocao(relatorio, trecho):
+    """Acrescenta um trecho removido ao relatório de deduplicação."""
+    relatorio['trechos_removidos'] += 1
+    relatorio['bytes_removidos'] += len(trecho.encode('utf-8'))
+    relatorio['tokens_removidos'] += contar_tokens(trecho)
+
+def deduplica_texto(texto, limiar=DEDUP_SIMILARITY_THRESHOLD, indice=None, relatorio=None):
+    """
+    Remove de um texto os trechos quase idênticos a trechos anteriores.
+
+    O texto é dividido em trechos sem sobreposição (nas quebras naturais) e cada trecho
+    parecido com um já mantido é retirado; o restante do texto fica inalterado.
+    Trechos curtos (títulos, cabeçalhos de arquivo) são sempre mantidos.
+
+    Para deduplicar várias partes entre si sem tocar no que é inserido entre elas
+    (marcadores de página, cabeçalhos de arquivo), cada parte pode ser deduplicada
+    separadamente com o mesmo índice e o mesmo relatório.
+
+    Args:
+        texto: Texto a ser deduplicado (por exemplo, vários PDFs concatenados)
+        limiar: Similaridade mínima para considerar dois trechos duplicados
+        indice: IndiceLSH opcional com os trechos já mantidos de partes anteriores
+        relatorio: Relatório opcional a ser acumulado (ver relatorio_vazio)
+
+    Returns:
+        Tupla (texto deduplicado, relatório com 'trechos_removidos', 'bytes_removidos'
+        e 'tokens_removidos')
+    """
+    from core.index import dividir_em_chunks
+
+    if relatorio is None:
+        relatorio = relatorio_vazio()
+    if not texto:
+        return texto, relatorio
+
+    if indice is None:
+        indice = IndiceLSH()
+    removidos = relatorio['trechos_removidos']
+    partes = []
+    posicao = 0
+    for trecho in dividir_em_chunks(texto, sobreposicao=0):
+        inicio = texto.find(trecho, posicao)
+        if inicio == -1:
+            continue
+        fim = inicio + len(trecho)
+
+        valores, _ = assinatura(trecho)
+        if valores is not None and indice.similar(valores, limiar) is not None:
+            # Mantém o texto entre os trechos e descarta apenas o trecho repetido
+            partes.append(texto[posicao:inicio])
+            registra_remocao(relatorio, trecho)
+        else:
+            partes.append(texto[posicao:fim])
+            if valores is not None:
+                indice.adicionar(len(indice), valores)
+        posicao = fim
+    partes.append(texto[posicao:])
+
+    if relatorio['trechos_removidos'] == removidos:
+        return texto, relatorio
+    return ''.join(partes), relatorio
+
+def mensagem_deduplicacao(relatorio):
+    """
+    Formata o resumo de uma deduplicação para exibição.
+
+    Args:
+        relatorio: Relatório retornado por deduplica_texto
+
+    Returns:
+        String com os trechos, bytes e tokens economizados, ou None se nada foi removido
+    """
+    if not relatorio or not relatorio.get('trechos_removidos'):
+        return None
+    return (
+        f"{relatorio['trechos_removidos']} trecho(s) repetido(s) ignorado(s) "
+        f"({relatorio['bytes_removidos'] / 1024:.1f} KB, ~{relatorio['tokens_removidos']} tokens)."
+    )
@@ -0,0 +1,154 @@
+"""
+Módulo com o armazenamento comprimido de textos compartilhado entre sessões.
+Textos idênticos (mesmo hash de conteúdo) são guardados uma única vez, comprimidos
+com zstd (se o pacote zstandard estiver instalado) ou zlib.
+"""
+
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from config.settings import DOCUMENT_STORE_MAX_INACTIVE_BYTES, COMPRESSION_LEVEL
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+def hash_texto(texto):
+    """
+    Calcula o hash SHA-256 de um texto.
+
+    Args:
+        texto: Texto a ser processado
+
+    Returns:
+        String hexadecimal com o hash do texto
+    """
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+def _comprimir(dados):
+    if zstandard is not None:
+        return b'Z' + zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress(dados)
+    return b'z' + zlib.compress(dados, COMPRESSION_LEVEL)
+
+def _descomprimir(dados):
+    # O primeiro byte indica o algoritmo usado, permitindo ler dados de ambos
+    if dados[:1] == b'Z':
+        return zstandard.ZstdDecompressor().decompress(dados[1:])
+    return zlib.decompress(dados[1:])
+
+class DocumentStore:
+    """
+    Armazenamento de textos comprimidos endereçados pelo hash do conteúdo.
+
+    Textos referenciados (por exemplo, chunks de um índice de sessão) ficam em memória
+    enquanto houver referências. Textos sem referência funcionam como cache: são
+    mantidos até o limite de bytes e descartados do menos recente para o mais recente.
+    """
+
+    def __init__(self, max_bytes_inativos=DOCUMENT_STORE_MAX_INACTIVE_BYTES):
+        self.max_bytes_inativos = max_bytes_inativos
+        self._entradas = {}  # hash -> [dados comprimidos, tamanho original, referências]
+        self._inativos = OrderedDict()  # hashes sem referência, do menos para o mais recente
+        self._bytes_inativos = 0
+        self._lock = threading.Lock()
+
+    def adicionar(self, texto, referenciar=True):
+        """
+        Adiciona um texto ao armazenamento, reaproveitando-o se já existir.
+
+        Args:
+            texto: Texto a ser armazenado
+            referenciar: Se True, incrementa o contador de referências (o texto só é
+                         descartado após liberar()). Se False, o texto fica como cache.
+
+        Returns:
+            String com o hash do texto
+        """
+        chave = hash_texto(texto)
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                dados = texto.encode('utf-8')
+                entrada = [_comprimir(dados), len(dados), 0]
+                self._entradas[chave] = entrada
+                if not referenciar:
+                    self._marca_inativo(chave)
+
+            if referenciar:
+                if entrada[2] == 0:
+                    self._desmarca_inativo(chave)
+                entrada[2] += 1
+            elif chave in self._inativos:
+                self._inativos.move_to_end(chave)
+
+            self._descarta_excedente()
+        return chave
+
+    def obter(self, chave):
+        """
+        Obtém um texto descomprimido pelo hash.
+
+        Args:
+            chave: Hash do texto
+
+        Returns:
+            String com o texto ou None se ele não estiver armazenado
+        """
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            if chave in self._inativos:
+                self._inativos.move_to_end(chave)
+            dados = entrada[0]
+        return _descomprimir(dados).decode('utf-8')
+
+    def liberar(self, chave):
+        """
+        Remove uma referência a um texto. Sem referências, ele passa a ser cache.
+
+        Args:
+            chave: Hash do texto
+        """
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None or entrada[2] == 0:
+                return
+            entrada[2] -= 1
+            if entrada[2] == 0:
+                self._marca_inativo(chave)
+                self._descarta_excedente()
+
+    def estatisticas(self):
+        """
+        Retorna estatísticas de uso de memória do armazenamento.
+
+        Returns:
+            Dicionário com quantidade de textos, bytes originais e bytes comprimidos
+        """
+        with self._lock:
+            return {
+                'textos': len(self._entradas),
+                'bytes_originais': sum(entrada[1] for entrada in self._entradas.values()),
+                'bytes_comprimidos': sum(len(entrada[0]) for entrada in self._entradas.values()),
+                'algoritmo': 'zstd' if zstandard is not None else 'zlib'
+            }
+
+    def _marca_inativo(self, chave):
+        self._inativos[chave] = None
+        self._bytes_inativos += len(self._entradas[chave][0])
+
+    def _desmarca_inativo(self, chave):
+        if chave in self._inativos:
+            del self._inativos[chave]
+            self._bytes_inativos -= len(self._entradas[chave][0])
+
+    def _descarta_excedente(self):
+        while self._bytes_inativos > self.max_bytes_inativos and self._inativos:
+            chave, _ = self._inativos.popitem(last=False)
+            self._bytes_inativos -= len(self._entradas.pop(chave)[0])
+
+# Instância compartilhada por todas as sessões do processo
+document_store = DocumentStore()
@@ -0,0 +1,354 @@
+"""
+Módulo de embeddings locais e busca vetorial sobre os chunks indexados.
+
+Os vetores são gerados localmente por hashing de termos e n-gramas de caracteres
+(sem chamadas externas), guardados como uma matriz NumPy contígua (float32 ou int8
+quantizada) e persistidos em disco com np.memmap, identificados pelo hash do texto
+da fonte. Reabrir uma fonte já indexada apenas mapeia o arquivo em memória, e as
+páginas são compartilhadas entre processos pelo cache do sistema operacional.
+"""
+
+import json
+import math
+import os
+import threading
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from config.settings import (
+    EMBEDDINGS_DIR, EMBEDDING_DIM, EMBEDDING_QUANTIZE, IVF_MIN_VECTORS, IVF_NPROBE
+)
+from core.compression import termos
+from core.shared_cache import exclusivo
+
+PESO_NGRAMA = 0.5  # Peso dos n-gramas de caracteres em relação às palavras
+TAMANHO_NGRAMA = 4
+BLOCO_BUSCA = 65536  # Linhas processadas por vez na busca (limita a memória com int8)
+ITERACOES_KMEANS = 10
+
+# Travas dos arquivos de cada matriz (por chave), entre threads do mesmo processo:
+# os temporários usam o PID no nome, então duas threads não podem gravar a mesma matriz
+_travas_arquivos = {}  # chave -> [trava, número de threads usando a trava]
+_trava_travas = threading.Lock()
+
+@contextmanager
+def _trava_arquivo(chave):
+    """Trava os arquivos da matriz de uma fonte, sem bloquear as matrizes das demais."""
+    with _trava_travas:
+        entrada = _travas_arquivos.setdefault(chave, [threading.Lock(), 0])
+        entrada[1] += 1
+    try:
+        with entrada[0]:
+            yield
+    finally:
+        with _trava_travas:
+            entrada[1] -= 1
+            if not entrada[1]:
+                del _travas_arquivos[chave]
+
+def _caracteristicas(texto):
+    """Conta as palavras e os n-gramas de caracteres (ponderados) de um texto."""
+    contagem = Counter()
+    for termo in termos(texto):
+        contagem['p:' + termo] += 1
+        if len(termo) > TAMANHO_NGRAMA + 1:
+            for inicio in range(len(termo) - TAMANHO_NGRAMA + 1):
+                contagem['c:' + termo[inicio:inicio + TAMANHO_NGRAMA]] += PESO_NGRAMA
+    return contagem
+
+def gera_embeddings(textos, dimensao=EMBEDDING_DIM):
+    """
+    Gera os embeddings locais de uma lista de textos.
+
+    Cada palavra e n-grama de caracteres é projetado em uma das `dimensao` posições por
+    hashing (com sinal), com peso sublinear da frequência. Os n-gramas aproximam
+    variações da mesma palavra (plural, conjugação). Os vetores são normalizados.
+
+    Args:
+        textos: Lista de textos
+        dimensao: Número de dimensões dos vetores
+
+    Returns:
+        Matriz NumPy float32 de formato (len(textos), dimensao)
+    """
+    import numpy as np
+
+    posicoes = []
+    valores = []
+    for linha, texto in enumerate(textos):
+        base = linha * dimensao
+        for caracteristica, frequencia in _caracteristicas(texto).items():
+            h = zlib.crc32(caracteristica.encode('utf-8'))
+            peso = 1.0 + math.log(frequencia) if frequencia >= 1 else frequencia
+            posicoes.append(base + h % dimensao)
+            valores.append(peso if h & 0x80000000 else -peso)
+
+    matriz = np.bincount(
+        np.asarray(posicoes, dtype=np.int64),
+        weights=np.asarray(valores, dtype=np.float64),
+        minlength=len(textos) * dimensao
+    ).astype(np.float32).reshape(len(textos), dimensao)
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    matriz /= np.maximum(normas, 1e-12)
+    return matriz
+
+def _quantiza(matriz):
+    """Quantiza vetores normalizados em int8, com uma escala por linha."""
+    import numpy as np
+    maximos = np.maximum(np.abs(matriz).max(axis=1), 1e-12)
+    escalas = (maximos / 127.0).astype(np.float32)
+    return np.round(matriz / escalas[:, None]).astype(np.int8), escalas
+
+def _kmeans(matriz, num_listas):
+    """K-means esférico determinístico; retorna os centróides normalizados."""
+    import numpy as np
+    gerador = np.random.default_rng(0)
+    centroides = matriz[gerador.choice(len(matriz), num_listas, replace=False)].astype(np.float32)
+    for _ in range(ITERACOES_KMEANS):
+        grupos = _mais_proximos(matriz, centroides)
+        somas = np.zeros_like(centroides)
+        np.add.at(somas, grupos, matriz)
+        normas = np.linalg.norm(somas, axis=1, keepdims=True)
+        vazios = normas[:, 0] == 0
+        somas[~vazios] /= normas[~vazios]
+        somas[vazios] = centroides[vazios]
+        centroides = somas
+    return centroides
+
+def _mais_proximos(matriz, centroides):
+    """Retorna, para cada linha, o índice do centróide mais similar (em blocos)."""
+    import numpy as np
+    grupos = np.empty(len(matriz), dtype=np.int32)
+    for inicio in range(0, len(matriz), BLOCO_BUSCA):
+        bloco = np.asarray(matriz[inicio:inicio + BLOCO_BUSCA], dtype=np.float32)
+        grupos[inicio:inicio + BLOCO_BUSCA] = np.argmax(bloco @ centroides.T, axis=1)
+    return grupos
+
+class MatrizEmbeddings:
+    """
+    Matriz de embeddings dos chunks de uma fonte, mapeada do disco com np.memmap.
+
+    Com muitos vetores (IVF_MIN_VECTORS ou mais), as linhas são agrupadas em listas
+    IVF contíguas, e a busca compara a consulta apenas com as listas mais próximas.
+    """
+
+    def __init__(self, chave, hashes, vetores, escalas=None, centroides=None, limites=None):
+        self.chave = chave
+        self.hashes = hashes
+        self.vetores = vetores
+        self.escalas = escalas
+        self.centroides = centroides
+        self.limites = limites
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def _similaridades(self, consultas, inicio, fim):
+        """Similaridade de cosseno entre as consultas e as linhas [inicio, fim)."""
+        import numpy as np
+        scores = np.empty((len(consultas), fim - inicio), dtype=np.float32)
+        for bloco in range(inicio, fim, BLOCO_BUSCA):
+            limite = min(bloco + BLOCO_BUSCA, fim)
+            vetores = np.asarray(self.vetores[bloco:limite], dtype=np.float32)
+            parcial = consultas @ vetores.T
+            if self.escalas is not None:
+                parcial *= self.escalas[bloco:limite]
+            scores[:, bloco - inicio:limite - inicio] = parcial
+        return scores
+
+    def busca(self, consultas, k, nprobe=IVF_NPROBE):
+        """
+        Busca os k vetores mais similares a cada consulta.
+
+        Args:
+            consultas: Matriz float32 (m, dimensao) com as consultas normalizadas
+            k: Número de resultados por consulta
+            nprobe: Número de listas IVF examinadas (se a matriz tiver IVF)
+
+        Returns:
+            Lista (uma por consulta) de listas de tuplas (hash do chunk, similaridade)
+        """
+        import numpy as np
+        if not len(self):
+            return [[] for _ in consultas]
+
+        if self.centroides is None:
+            intervalos = [[(0, len(self))] for _ in consultas]
+        else:
+            proximas = np.argsort(-(consultas @ self.centroides.T), axis=1)[:, :nprobe]
+            intervalos = [
+                [(int(self.limites[lista]), int(self.limites[lista + 1])) for lista in listas]
+                for listas in proximas
+            ]
+
+        resultados = []
+        for consulta, faixas in zip(consultas, intervalos):
+            linhas = np.concatenate([np.arange(inicio, fim) for inicio, fim in faixas])
+            scores = np.concatenate([
+                self._similaridades(consulta[None, :], inicio, fim)[0] for inicio, fim in faixas
+            ])
+            melhores = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+            melhores = melhores[np.argsort(-scores[melhores], kind='stable')]
+            resultados.append([(self.hashes[linhas[i]], float(scores[i])) for i in melhores])
+        return resultados
+
+def _caminhos(chave):
+    """Caminhos dos arquivos de uma matriz persistida."""
+    base = os.path.join(EMBEDDINGS_DIR, chave)
+    return base + '.json', base + '.vetores', base + '.escalas', base + '.centroides'
+
+def _abre(chave):
+    """Abre uma matriz persistida em disco, ou retorna None se não existir."""
+    import numpy as np
+    meta_path, vetores_path, escalas_path, centroides_path = _caminhos(chave)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as arquivo:
+        meta = json.load(arquivo)
+    if meta['dimensao'] != EMBEDDING_DIM:
+        return None
+
+    total = len(meta['hashes'])
+    if not total:
+        return MatrizEmbeddings(chave, [], None)
+    vetores = np.memmap(vetores_path, dtype=meta['dtype'], mode='r', shape=(total, meta['dimensao']))
+    escalas = np.memmap(escalas_path, dtype=np.float32, mode='r', shape=(total,)) if meta['dtype'] == 'int8' else None
+    centroides = limites = None
+    if meta.get('limites'):
+        centroides = np.memmap(
+            centroides_path, dtype=np.float32, mode='r', shape=(len(meta['limites']) - 1, meta['dimensao'])
+        )
+        limites = meta['limites']
+    return MatrizEmbeddings(chave, meta['hashes'], vetores, escalas, centroides, limites)
+
+def _grava_memmap(caminho, matriz):
+    """Grava um array em um arquivo temporário via memmap e o move para o destino."""
+    import numpy as np
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    mapa = np.memmap(temporario, dtype=matriz.dtype, mode='w+', shape=matriz.shape)
+    mapa[:] = matriz
+    mapa.flush()
+    del mapa
+    os.replace(temporario, caminho)
+
+def _persiste(chave, hashes, matriz):
+    """Calcula o IVF (se necessário), quantiza e grava a matriz em disco."""
+    import numpy as np
+    meta_path, vetores_path, escalas_path, centroides_path = _caminhos(chave)
+    os.makedirs(EMBEDDINGS_DIR, exist_ok=True)
+
+    limites = None
+    if len(matriz) >= IVF_MIN_VECTORS:
+        num_listas = int(math.sqrt(len(matriz)))
+        centroides = _kmeans(matriz, num_listas)
+        grupos = _mais_proximos(matriz, centroides)
+        ordem = np.argsort(grupos, kind='stable')
+        matriz = matriz[ordem]
+        hashes = [hashes[i] for i in ordem]
+        limites = np.searchsorted(grupos[ordem], np.arange(num_listas + 1)).tolist()
+        _grava_memmap(centroides_path, centroides)
+
+    if EMBEDDING_QUANTIZE:
+        vetores, escalas = _quantiza(matriz)
+        _grava_memmap(escalas_path, escalas)
+    else:
+        vetores = matriz
+    if len(vetores):
+        _grava_memmap(vetores_path, vetores)
+
+    # O arquivo de metadados é gravado por último: sua presença indica matriz completa
+    temporario = f"{meta_path}.{os.getpid()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump({
+            'dimensao': EMBEDDING_DIM,
+            'dtype': str(vetores.dtype),
+            'hashes': hashes,
+            'limites': limites
+        }, arquivo)
+    os.replace(temporario, meta_path)
+
+def obtem_matriz(chave, textos, hashes):
+    """
+    Abre a matriz de embeddings de uma fonte, gerando-a e persistindo-a se necessário.
+
+    Args:
+        chave: Hash do texto da fonte (identifica a matriz em disco)
+        textos: Textos dos chunks da fonte, usados apenas se a matriz não existir
+        hashes: Hashes dos chunks, na mesma ordem dos textos
+
+    Returns:
+        MatrizEmbeddings mapeada do disco
+    """
+    with _trava_arquivo(chave):
+        matriz = _abre(chave)
+    if matriz is not None:
+        return matriz
+
+    # Apenas um processo gera a matriz; os demais aguardam e a abrem do disco. Os
+    # embeddings são gerados fora da trava, que só protege a gravação dos arquivos
+    with exclusivo(f"embeddings:{chave}"):
+        with _trava_arquivo(chave):
+            matriz = _abre(chave)
+        if matriz is None:
+            vetores = gera_embeddings(textos)
+            with _trava_arquivo(chave):
+                matriz = _abre(chave)
+                if matriz is None:
+                    _persiste(chave, list(hashes), vetores)
+                    matriz = _abre(chave)
+    return matriz
+
+class IndiceVetorial:
+    """
+    Conjunto das matrizes de embeddings das fontes carregadas em uma sessão.
+    """
+
+    def __init__(self):
+        self._matrizes = {}
+
+    def __len__(self):
+        return sum(len(matriz) for matriz in self._matrizes.values())
+
+    def definir_fonte(self, fonte, chave, textos, hashes):
+        """
+        Associa uma fonte à matriz de embeddings do seu texto atual.
+
+        Args:
+            fonte: Identificador da fonte
+            chave: Hash do texto da fonte
+            textos: Textos dos chunks da fonte
+            hashes: Hashes dos chunks, na mesma ordem dos textos
+        """
+        atual = self._matrizes.get(fonte)
+        if atual is not None and atual.chave == chave:
+            return
+        self._matrizes[fonte] = obtem_matriz(chave, textos, hashes)
+
+    def remover_fonte(self, fonte):
+        """Desassocia uma fonte (o arquivo em disco é mantido para recarregamentos)."""
+        self._matrizes.pop(fonte, None)
+
+    def limpar(self):
+        """Remove todas as fontes."""
+        self._matrizes = {}
+
+    def busca(self, consultas, k):
+        """
+        Busca, em todas as fontes, os k chunks mais similares a cada consulta.
+
+        Args:
+            consultas: Lista de textos de consulta (perguntas)
+            k: Número de resultados por consulta
+
+        Returns:
+            Lista (uma por consulta) de listas de tuplas (fonte, hash do chunk, similaridade),
+            da mais para a menos similar
+        """
+        if not consultas:
+            return []
+        vetores = gera_embeddings(consultas)
+        resultados = [[] for _ in consultas]
+        for fonte, matriz in self._matrizes.items():
+            for posicao, encontrados in enumerate(matriz.busca(vetores, k)):
+                resultados[posicao].extend((fonte, hash_chunk, score) for hash_chunk, score in encontrados)
+        return [sorted(lista, key=lambda item: -item[2])[:k] for lista in resultados]
@@ -0,0 +1,338 @@
+"""
+Módulo para indexação do conteúdo carregado em chunks.
+Mantém os trechos de cada fonte da sessão para buscas e montagem de contexto.
+"""
+
+import re
+from bisect import bisect_right
+from config.settings import CHUNK_SIZE, CHUNK_OVERLAP
+from core.dedup import IndiceLSH, assinatura, relatorio_vazio, registra_remocao
+from core.document_store import document_store, hash_texto
+from core.embeddings import IndiceVetorial
+from core.retrieval import IndiceBM25
+
+# Marcadores de página e de arquivo inseridos pelo carregador de PDFs
+_PADRAO_PAGINA = re.compile(r'^\[Página (\d+)\]$', re.MULTILINE)
+_PADRAO_ARQUIVO = re.compile(r'^--- (.+) ---$', re.MULTILINE)
+
+def dividir_em_chunks(texto, tamanho=CHUNK_SIZE, sobreposicao=CHUNK_OVERLAP):
+    """
+    Divide um texto em chunks de tamanho aproximado, preferindo quebras naturais.
+
+    Args:
+        texto: Texto a ser dividido
+        tamanho: Tamanho máximo de cada chunk em caracteres
+        sobreposicao: Quantidade de caracteres repetidos entre chunks consecutivos
+
+    Returns:
+        Lista de strings com os chunks do texto
+    """
+    texto = texto.strip() if texto else ""
+    if not texto:
+        return []
+
+    chunks = []
+    inicio = 0
+    while inicio < len(texto):
+        fim = min(inicio + tamanho, len(texto))
+
+        # Procura uma quebra de parágrafo, linha ou frase para não cortar no meio
+        if fim < len(texto):
+            for separador in ('\n\n', '\n', '. ', ' '):
+                posicao = texto.rfind(separador, inicio + tamanho // 2, fim)
+                if posicao != -1:
+                    fim = posicao + len(separador)
+                    break
+
+        chunk = texto[inicio:fim].strip()
+        if chunk:
+            chunks.append(chunk)
+
+        if fim >= len(texto):
+            break
+        inicio = max(fim - sobreposicao, inicio + 1)
+
+    return chunks
+
+def referencias_paginas(texto, trechos):
+    """
+    Localiza o arquivo e as páginas de cada trecho em textos com marcadores '[Página N]'.
+
+    Args:
+        texto: Texto completo da fonte
+        trechos: Trechos do texto, na ordem (como retornados por dividir_em_chunks)
+
+    Returns:
+        Lista com um dicionário por trecho, com 'paginas' (primeira e última página) e
+        'arquivo' quando conhecidos, ou vazio se o texto não tiver marcadores de página
+    """
+    marcadores = [(m.start(), int(m.group(1))) for m in _PADRAO_PAGINA.finditer(texto or "")]
+    if not marcadores:
+        return [{} for _ in trechos]
+    posicoes = [posicao for posicao, _ in marcadores]
+    arquivos = [(m.start(), m.group(1)) for m in _PADRAO_ARQUIVO.finditer(texto)]
+    posicoes_arquivos = [posicao for posicao, _ in arquivos]
+
+    referencias = []
+    cursor = 0
+    for trecho in trechos:
+        inicio = texto.find(trecho, cursor)
+        if inicio == -1:
+            referencias.append({})
+            continue
+        cursor = inicio + 1
+        primeira = bisect_right(posicoes, inicio) - 1
+        ultima = bisect_right(posicoes, inicio + len(trecho) - 1) - 1
+
+        # Trecho iniciado no cabeçalho de um arquivo (antes da sua primeira página)
+        arquivo = bisect_right(posicoes_arquivos, inicio) - 1
+        if primeira < 0 or (arquivo >= 0 and posicoes_arquivos[arquivo] > posicoes[primeira]):
+            primeira += 1
+        if primeira > ultima:
+            referencias.append({})
+            continue
+
+        # Trecho que avança para o arquivo seguinte: as páginas são as do primeiro
+        arquivo = bisect_right(posicoes_arquivos, posicoes[primeira]) - 1
+        if arquivo + 1 < len(arquivos) and posicoes_arquivos[arquivo + 1] < posicoes[ultima]:
+            ultima = bisect_right(posicoes, posicoes_arquivos[arquivo + 1]) - 1
+
+        referencia = {'paginas': (marcadores[primeira][1], marcadores[ultima][1])}
+        if arquivo >= 0:
+            referencia['arquivo'] = arquivos[arquivo][1]
+        referencias.append(referencia)
+    return referencias
+
+class ChunkIndex:
+    """
+    Índice em memória dos chunks de todas as fontes carregadas na sessão.
+
+    Cada chunk é um dicionário com as chaves 'id', 'fonte', 'hash' e 'metadados'. O texto
+    fica comprimido no document_store (compartilhado entre sessões) e é obtido com texto().
+    Em fontes com marcadores de página (PDFs), os metadados trazem 'paginas' e 'arquivo'.
+
+    Chunks quase idênticos a outros já indexados (em qualquer fonte) não são adicionados;
+    o total economizado fica em self.deduplicacao. Os chunks também são indexados em
+    self.bm25 (busca por termos) e os embeddings de cada fonte ficam em self.vetores,
+    mapeados do disco, para a busca por similaridade.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self._proximo_id = 0
+        self._hash_fontes = {}
+        self._lsh = IndiceLSH()
+        self.deduplicacao = relatorio_vazio()
+        self.bm25 = IndiceBM25()
+        self.vetores = IndiceVetorial()
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def __del__(self):
+        # Libera as referências aos textos quando a sessão é descartada
+        try:
+            for chunk in self.chunks:
+                document_store.liberar(chunk['hash'])
+        except Exception:
+            pass
+
+    def texto(self, chunk):
+        """
+        Retorna o texto descomprimido de um chunk.
+
+        Args:
+            chunk: Dicionário do chunk
+
+        Returns:
+            String com o texto do chunk
+        """
+        return document_store.obter(chunk['hash']) or ""
+
+    def adicionar(self, fonte, texto, metadados=None):
+        """
+        Divide um texto em chunks e os adiciona ao índice.
+
+        Args:
+            fonte: Identificador da fonte (URL, nome do arquivo, etc)
+            texto: Conteúdo a ser indexado
+            metadados: Dicionário opcional com informações extras de cada chunk
+
+        Returns:
+            Lista com os chunks adicionados (sem os quase idênticos a chunks existentes)
+        """
+        trechos = dividir_em_chunks(texto)
+        referencias = referencias_paginas(texto, trechos)
+        novos = []
+        for posicao, trecho in enumerate(trechos):
+            chunk = self._novo_chunk(fonte, trecho, posicao, {**(metadados or {}), **referencias[posicao]})
+            if chunk:
+                novos.append(chunk)
+        self.chunks.extend(novos)
+        self._hash_fontes[fonte] = hash_texto(texto or "")
+        self._atualiza_vetores(fonte, trechos)
+        return novos
+
+    def atualizar_fonte(self, fonte, texto, metadados=None):
+        """
+        Atualiza os chunks de uma fonte reindexando apenas os trechos que mudaram.
+
+        Chunks com o mesmo hash de conteúdo são mantidos (com o mesmo id), chunks novos
+        são adicionados e chunks que deixaram de existir são removidos. Chunks novos quase
+        idênticos a chunks de outras fontes (ou a outros trechos desta) são ignorados.
+
+        Args:
+            fonte: Identificador da fonte
+            texto: Novo conteúdo da fonte
+            metadados: Dicionário opcional com informações extras de cada chunk
+
+        Returns:
+            Dicionário com a quantidade de chunks 'mantidos', 'adicionados', 'removidos'
+            e 'duplicados' (ignorados por serem quase idênticos a outros)
+        """
+        existentes = [chunk for chunk in self.chunks if chunk['fonte'] == fonte]
+
+        # Conteúdo idêntico ao já indexado: nada a fazer
+        if existentes and self._hash_fontes.get(fonte) == hash_texto(texto or ""):
+            return {'mantidos': len(existentes), 'adicionados': 0, 'removidos': 0, 'duplicados': 0}
+
+        # Os chunks antigos desta fonte não contam como originais na deduplicação,
+        # pois podem estar sendo substituídos por uma versão ligeiramente diferente
+        comparaveis = {chunk['id'] for chunk in self.chunks if chunk['fonte'] != fonte}
+
+        por_hash = {}
+        for chunk in existentes:
+            por_hash.setdefault(chunk['hash'], []).append(chunk)
+
+        atualizados = []
+        adicionados = 0
+        duplicados = 0
+        trechos = dividir_em_chunks(texto)
+        referencias = referencias_paginas(texto, trechos)
+        for posicao, trecho in enumerate(trechos):
+            metadados_trecho = {**(metadados or {}), **referencias[posicao]}
+            reaproveitaveis = por_hash.get(hash_texto(trecho))
+            if reaproveitaveis:
+                chunk = reaproveitaveis.pop(0)
+                chunk['metadados'] = dict(metadados_trecho, posicao=posicao)
+            else:
+                chunk = self._novo_chunk(fonte, trecho, posicao, metadados_trecho, comparaveis.__contains__)
+                if not chunk:
+                    duplicados += 1
+                    continue
+                adicionados += 1
+            comparaveis.add(chunk['id'])
+            atualizados.append(chunk)
+
+        removidos = len(existentes) - (len(atualizados) - adicionados)
+        for restantes in por_hash.values():
+            for chunk in restantes:
+                self._descartar(chunk)
+        self.chunks = [chunk for chunk in self.chunks if chunk['fonte'] != fonte] + atualizados
+        self._hash_fontes[fonte] = hash_texto(texto or "")
+        self._atualiza_vetores(fonte, trechos)
+
+        return {
+            'mantidos': len(atualizados) - adicionados,
+            'adicionados': adicionados,
+            'removidos': removidos,
+            'duplicados': duplicados
+        }
+
+    def remover_fonte(self, fonte):
+        """Remove todos os chunks de uma fonte do índice."""
+        for chunk in self.chunks:
+            if chunk['fonte'] == fonte:
+                self._descartar(chunk)
+        self.chunks = [chunk for chunk in self.chunks if chunk['fonte'] != fonte]
+        self._hash_fontes.pop(fonte, None)
+        self.vetores.remover_fonte(fonte)
+
+    def manter_fontes(self, fontes):
+        """Remove do índice todas as fontes que não estão na lista informada."""
+        fontes = set(fontes)
+        for fonte in self.fontes():
+            if fonte not in fontes:
+                self.remover_fonte(fonte)
+
+    def fontes(self):
+        """Retorna a lista de fontes indexadas, na ordem de inserção."""
+        return list(dict.fromkeys(chunk['fonte'] for chunk in self.chunks))
+
+    def limpar(self):
+        """Remove todos os chunks do índice."""
+        for chunk in self.chunks:
+            document_store.liberar(chunk['hash'])
+        self.chunks = []
+        self._hash_fontes = {}
+        self._lsh.limpar()
+        self.deduplicacao = relatorio_vazio()
+        self.bm25.limpar()
+        self.vetores.limpar()
+
+    def busca_vetorial(self, pergunta, k):
+        """
+        Busca os chunks mais similares à pergunta pelos embeddings locais.
+
+        Args:
+            pergunta: Texto da pergunta
+            k: Número máximo de chunks retornados
+
+        Returns:
+            Lista de tuplas (chunk, similaridade), da mais para a menos similar
+        """
+        por_chave = {(chunk['fonte'], chunk['hash']): chunk for chunk in self.chunks}
+        try:
+            # Busca mais candidatos que o necessário: trechos deduplicados não estão no índice
+            encontrados = self.vetores.busca([pergunta], 2 * k)[0]
+        except Exception as e:
+            print(f"Aviso: Busca vetorial indisponível: {str(e)}")
+            return []
+
+        resultados = []
+        for fonte, hash_chunk, score in encontrados:
+            chunk = por_chave.pop((fonte, hash_chunk), None)
+            if chunk:
+                resultados.append((chunk, score))
+        return resultados[:k]
+
+    def _atualiza_vetores(self, fonte, trechos):
+        """Associa a fonte à matriz de embeddings do seu texto (gerada só na primeira vez)."""
+        try:
+            self.vetores.definir_fonte(
+                fonte, self._hash_fontes[fonte], trechos, [hash_texto(trecho) for trecho in trechos]
+            )
+        except Exception as e:
+            # Sem embeddings, a fonte continua disponível para as demais formas de busca
+            print(f"Aviso: Não foi possível gerar os embeddings de {fonte}: {str(e)}")
+            self.vetores.remover_fonte(fonte)
+
+    def _descartar(self, chunk):
+        """Libera o texto de um chunk removido e o retira dos índices LSH e BM25."""
+        document_store.liberar(chunk['hash'])
+        self._lsh.remover(chunk['id'])
+        self.bm25.remover(chunk['id'])
+
+    def _novo_chunk(self, fonte, trecho, posicao, metadados, aceitar=None):
+        """
+        Cria um chunk com um novo id, guardando seu texto no document_store.
+
+        Retorna None (e registra a economia) se o trecho for quase idêntico a um chunk
+        já indexado; aceitar filtra quais chunks existentes podem ser considerados.
+        """
+        valores, _ = assinatura(trecho)
+        if valores is not None and self._lsh.similar(valores, aceitar=aceitar) is not None:
+            registra_remocao(self.deduplicacao, trecho)
+            return None
+
+        chunk = {
+            'id': self._proximo_id,
+            'fonte': fonte,
+            'hash': document_store.adicionar(trecho),
+            'metadados': dict(metadados or {}, posicao=posicao)
+        }
+        self._proximo_id += 1
+        if valores is not None:
+            self._lsh.adicionar(chunk['id'], valores)
+        self.bm25.adicionar(chunk['id'], trecho)
+        return chunk
@@ -3,44 +3,36 @@ Módulo responsável pela interação com o modelo de linguagem Claude da Anthro
 Fornece interfaces para gerar respostas com base no contexto fornecido.
 """
 
-from anthropic import Anthropic
-from config.settings import ANTHROPIC_API_KEY, MODEL, MAX_TOKENS, TEMPERATURE, SYSTEM_MESSAGE_TEMPLATE
+import asyncio
+from config.settings import MODEL, MAX_TOKENS, TEMPERATURE, SYSTEM_MESSAGE_TEMPLATE, CONTEXT_TOKEN_BUDGET
+from core.compression import comprime_contexto
+from core.index import dividir_em_chunks
+from core.rate_limit import admite
+from core.retrieval import recupera_trechos, indice_documento
+from core.retry import Prazo, transmite_mensagem, transmite_mensagem_async
+from core.storage import obter_conteudo
+from core.tokens import (
+    contar_tokens, contar_tokens_api, contagem_api_habilitada, ajusta_historico,
+    orcamento_documento, limite_entrada, relatorio_uso
+)
 
-# Inicializa o cliente Anthropic
-client = Anthropic(api_key=ANTHROPIC_API_KEY)
+def _dados_documento(documento_info):
+    """Extrai o conteúdo, o tipo, a URL e o título das informações do documento."""
+    if isinstance(documento_info, dict):
+        return (
+            obter_conteudo(documento_info),
+            documento_info.get('tipo', 'Chat'),
+            documento_info.get('url', ''),
+            documento_info.get('titulo', '')
+        )
+    if isinstance(documento_info, str) and documento_info:
+        return documento_info, "Texto", "", ""
+    return "", "Chat", "", ""
 
-def format_system_prompt(documento_info):
-    """
-    Formata o prompt do sistema com base nas informações do documento.
-    
-    Args:
-        documento_info: Dicionário ou string contendo as informações do documento
-        
-    Returns:
-        String formatada com o prompt do sistema
-    """
-    # Valores padrão
-    documento = ""
-    fonte_tipo = "Chat"
-    fonte_url = ""
-    fonte_titulo = ""
-    
-    # Extrai informações do documento
-    if documento_info:
-        if isinstance(documento_info, dict):
-            documento = documento_info.get('conteudo', '')
-            fonte_tipo = documento_info.get('tipo', 'Chat')
-            fonte_url = documento_info.get('url', '')
-            fonte_titulo = documento_info.get('titulo', '')
-        elif isinstance(documento_info, str):
-            documento = documento_info
-            fonte_tipo = "Texto"
-    
-    # Formata campos opcionais
+def _monta_prompt(documento, fonte_tipo, fonte_url, fonte_titulo):
+    """Preenche o template do prompt do sistema."""
     fonte_url_formatada = f"URL: {fonte_url}" if fonte_url else ""
     fonte_titulo_formatada = f"Título: {fonte_titulo}" if fonte_titulo else ""
-    
-    # Formata o prompt final
     return SYSTEM_MESSAGE_TEMPLATE.format(
         fonte_tipo=fonte_tipo,
         fonte_url_formatada=fonte_url_formatada,
@@ -48,6 +40,41 @@ def format_system_prompt(documento_info):
         documento=documento
     )
 
+def _ajusta_documento(documento, pergunta, trechos, orcamento_tokens):
+    """Comprime o documento (ou os trechos) para caber no orçamento, priorizando a pergunta."""
+    if trechos is not None:
+        # Trechos que já cabem no orçamento são usados sem alteração
+        unidos = "\n\n".join(trechos)
+        if contar_tokens(unidos) <= orcamento_tokens:
+            return unidos
+        return comprime_contexto(pergunta, trechos, orcamento_tokens)
+    if contar_tokens(documento) > orcamento_tokens:
+        return comprime_contexto(pergunta, dividir_em_chunks(documento), orcamento_tokens)
+    return documento
+
+def format_system_prompt(documento_info, pergunta=None, trechos=None, orcamento_tokens=CONTEXT_TOKEN_BUDGET):
+    """
+    Formata o prompt do sistema com base nas informações do documento.
+    
+    Quando o documento (ou os trechos recuperados) excede o orçamento de tokens,
+    o conteúdo é comprimido para as frases mais relevantes à pergunta.
+    
+    Args:
+        documento_info: Dicionário ou string contendo as informações do documento.
+                        O dicionário pode trazer o 'conteudo' ou apenas a referência
+                        'documento_hash' de um documento salvo no banco.
+        pergunta: Pergunta atual do usuário (opcional)
+        trechos: Lista opcional de trechos já selecionados do documento; se informada,
+                 substitui o conteúdo completo
+        orcamento_tokens: Número máximo de tokens do documento no prompt
+        
+    Returns:
+        String formatada com o prompt do sistema
+    """
+    documento, fonte_tipo, fonte_url, fonte_titulo = _dados_documento(documento_info)
+    documento = _ajusta_documento(documento, pergunta, trechos, orcamento_tokens)
+    return _monta_prompt(documento, fonte_tipo, fonte_url, fonte_titulo)
+
 def format_messages(historico):
     """
     Converte o histórico de mensagens para o formato esperado pela API da Anthropic.
@@ -69,39 +96,176 @@ def format_messages(historico):
             if item.get("role") != "system":
                 messages.append({"role": item["role"], "content": item["content"]})
     
+    # A API exige que a conversa comece com uma mensagem do usuário, o que pode não
+    # ocorrer quando apenas a última página de uma conversa retomada está carregada
+    while messages and messages[0]["role"] != "user":
+        messages.pop(0)
+    
     return messages
 
-def generate_response(historico, documento_info):
+def last_question(messages):
+    """Retorna o texto da última mensagem do usuário, ou None se não houver."""
+    for mensagem in reversed(messages):
+        if mensagem["role"] == "user" and isinstance(mensagem["content"], str):
+            return mensagem["content"]
+    return None
+
+def plan_request(historico, documento_info, trechos=None, indice=None):
     """
-    Gera uma resposta usando o modelo LLM com base no histórico de conversas e no documento.
+    Monta os parâmetros da chamada distribuindo a janela de contexto entre os componentes.
+    
+    O histórico é limitado às mensagens mais recentes que cabem no seu orçamento, e o
+    documento recebe o espaço restante da janela (até CONTEXT_TOKEN_BUDGET), descontados
+    o prompt do sistema, o histórico e a resposta. Se o documento não couber, apenas os
+    chunks recuperados para a pergunta (busca híbrida BM25 + vetores) são enviados. Se a
+    contagem pela API estiver habilitada, o total é conferido e o documento é reduzido
+    caso ainda exceda o limite.
     
     Args:
         historico: Histórico de mensagens (lista de tuplas ou dicionários)
         documento_info: Informações do documento para contexto
+        trechos: Lista opcional de trechos do documento selecionados para a pergunta
+        indice: ChunkIndex opcional com as fontes da sessão; se ausente ou vazio (por
+                exemplo, na API ou ao retomar uma conversa), um índice do documento é
+                montado e reaproveitado entre perguntas
         
     Returns:
-        String contendo a resposta gerada pelo modelo
+        Tupla (parâmetros para client.messages.create/stream, relatório de uso de tokens)
     """
-    try:
-        # Formata o prompt do sistema
-        system_prompt = format_system_prompt(documento_info)
+    messages, tokens_historico = ajusta_historico(format_messages(historico))
+    pergunta = last_question(messages)
+    
+    documento, fonte_tipo, fonte_url, fonte_titulo = _dados_documento(documento_info)
+    tokens_sistema = contar_tokens(_monta_prompt("", fonte_tipo, fonte_url, fonte_titulo))
+    orcamento = orcamento_documento(tokens_sistema, tokens_historico)
+    
+    if trechos is None and pergunta and contar_tokens(documento) > orcamento:
+        if indice is None or not len(indice):
+            indice = indice_documento(documento_info)
+        if indice is not None:
+            trechos = recupera_trechos(indice, pergunta) or None
+    
+    contexto = _ajusta_documento(documento, pergunta, trechos, orcamento)
+    system = _monta_prompt(contexto, fonte_tipo, fonte_url, fonte_titulo)
+    
+    tokens_api = None
+    if contagem_api_habilitada():
+        try:
+            tokens_api = contar_tokens_api(system, messages)
+            excesso = tokens_api - limite_entrada()
+            if excesso > 0:
+                contexto = _ajusta_documento(documento, pergunta, trechos, max(0, orcamento - excesso))
+                system = _monta_prompt(contexto, fonte_tipo, fonte_url, fonte_titulo)
+                tokens_api = contar_tokens_api(system, messages)
+        except Exception as e:
+            print(f"Erro ao contar tokens pela API: {str(e)}")
+    
+    parametros = {
+        'model': MODEL,
+        'max_tokens': MAX_TOKENS,
+        'temperature': TEMPERATURE,
+        'system': system,
+        'messages': messages
+    }
+    return parametros, relatorio_uso(tokens_sistema, contar_tokens(contexto), tokens_historico, tokens_api)
+
+def build_request(historico, documento_info, trechos=None):
+    """
+    Monta os parâmetros da chamada à API da Anthropic.
+    
+    Args:
+        historico: Histórico de mensagens (lista de tuplas ou dicionários)
+        documento_info: Informações do documento para contexto
+        trechos: Lista opcional de trechos do documento selecionados para a pergunta
         
-        # Prepara as mensagens para a API
-        messages = format_messages(historico)
+    Returns:
+        Dicionário com os argumentos para client.messages.create/stream
+    """
+    return plan_request(historico, documento_info, trechos)[0]
+
+def _registra_uso(uso, entrada, saida):
+    """Acrescenta ao relatório de uso os tokens efetivamente cobrados pela API."""
+    uso['entrada_real'] = entrada
+    uso['resposta'] = saida
+    return uso
+
+def tokens_reservados(uso):
+    """Tokens reservados no controle de admissão: entrada estimada e resposta máxima."""
+    return (uso.get('total_api') or uso['total_estimado']) + MAX_TOKENS
+
+async def stream_response(historico, documento_info, on_usage=None, indice=None, sessao=None, on_espera=None,
+                          prazo=None):
+    """
+    Gera uma resposta em streaming usando o cliente assíncrono da Anthropic.
+    
+    Falhas transitórias são repetidas dentro do prazo; se a conexão cair no meio da
+    resposta, a geração continua do texto já enviado, sem repeti-lo.
+    
+    Args:
+        historico: Histórico de mensagens (lista de tuplas ou dicionários)
+        documento_info: Informações do documento para contexto
+        on_usage: Função opcional chamada com o relatório de uso de tokens ao final
+        indice: ChunkIndex opcional usado para recuperar os trechos relevantes
+        sessao: ID da sessão, usado nos limites de uso por sessão
+        on_espera: Função opcional chamada com (posição, segundos) enquanto a pergunta aguarda na fila
+        prazo: Prazo total da resposta, incluindo a fila (padrão: LLM_DEADLINE)
         
-        # Chama a API da Anthropic
-        response = client.messages.create(
-            model=MODEL,
-            max_tokens=MAX_TOKENS,
-            temperature=TEMPERATURE,
-            system=system_prompt,
-            messages=messages
-        )
+    Yields:
+        Trechos de texto da resposta à medida que são gerados
         
-        # Retorna o texto da resposta
-        return response.content[0].text
+    Raises:
+        LimiteExcedido: Se a pergunta não puder ser admitida pelos limites de uso
+        ErroLLM: Se a resposta não puder ser gerada (com o texto parcial já enviado)
+    """
+    prazo = prazo or Prazo()
+    # A recuperação, a compressão e a contagem de tokens rodam fora do event loop
+    parametros, uso = await asyncio.to_thread(plan_request, historico, documento_info, indice=indice)
+    reserva = await asyncio.to_thread(admite, sessao, tokens_reservados(uso), on_espera, prazo.restante())
+    
+    def registra(entrada, saida):
+        reserva.ajusta(entrada + saida)
+        if on_usage:
+            on_usage(_registra_uso(uso, entrada, saida))
+    
+    async for texto in transmite_mensagem_async(parametros, prazo, on_uso=registra):
+        yield texto
+
+def generate_response(historico, documento_info, on_usage=None, indice=None, sessao=None, on_espera=None,
+                      prazo=None):
+    """
+    Gera uma resposta usando o modelo LLM com base no histórico de conversas e no documento.
+    
+    Falhas transitórias (sobrecarga, limite de requisições, rede) são repetidas dentro
+    do prazo, continuando do texto parcial quando a resposta é interrompida.
+    
+    Args:
+        historico: Histórico de mensagens (lista de tuplas ou dicionários)
+        documento_info: Informações do documento para contexto
+        on_usage: Função opcional chamada com o relatório de uso de tokens por componente
+        indice: ChunkIndex opcional usado para recuperar os trechos relevantes
+        sessao: ID da sessão, usado nos limites de uso por sessão
+        on_espera: Função opcional chamada com (posição, segundos) enquanto a pergunta aguarda na fila
+        prazo: Prazo total da resposta, incluindo a fila (padrão: LLM_DEADLINE)
+        
+    Returns:
+        String contendo a resposta gerada pelo modelo
+        
+    Raises:
+        LimiteExcedido: Se a pergunta não puder ser admitida pelos limites de uso
+        ErroLLM: Se a resposta não puder ser gerada
+    """
+    prazo = prazo or Prazo()
+    
+    # Distribui o orçamento de tokens, monta a requisição e aguarda a vez na fila de admissão
+    parametros, uso = plan_request(historico, documento_info, indice=indice)
+    reserva = admite(sessao, tokens_reservados(uso), on_espera, prazo.restante())
+    
+    def registra(entrada, saida):
+        reserva.ajusta(entrada + saida)
+        if on_usage:
+            on_usage(_registra_uso(uso, entrada, saida))
     
-    except Exception as e:
-        error_msg = str(e)
-        print(f"Erro ao gerar resposta: {error_msg}")
-        return f"Desculpe, ocorreu um erro ao processar sua pergunta. Detalhes: {error_msg}"
\ No newline at end of file
+    # Chama a API da Anthropic e corrige a reserva com os tokens efetivamente usados
+    # (somados em todas as tentativas, inclusive as interrompidas e em caso de falha)
+    texto, _, _ = transmite_mensagem(parametros, prazo, on_uso=registra)
+    return texto
@@ -0,0 +1,180 @@
+"""
+Módulo de carregamento antecipado (prefetch) de fontes.
+
+Assim que uma URL válida é informada, o carregamento começa em segundo plano (após
+um pequeno intervalo, cancelado se a URL mudar); ao clicar no botão, o resultado já
+pronto é reaproveitado. Fontes da lista de aquecimento (WARM_SOURCES) são carregadas
+quando o servidor inicia. Os resultados ficam no cache compartilhado por CACHE_TTL
+segundos e também deixam prontos os embeddings do documento; com várias réplicas,
+apenas uma carrega cada fonte.
+"""
+
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import PREFETCH_DEBOUNCE, PREFETCH_WORKERS
+from core.shared_cache import get_cache, obtem_ou_calcula
+from utils.loaders.document import tem_erro
+from utils.loaders.registry import carrega, tipo_fonte
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='prefetch')
+_trava = threading.Lock()
+_em_andamento = {}  # chave -> Future (carregamentos deste processo)
+_agendados = {}  # slot -> threading.Timer
+
+def url_valida(url):
+    """Indica se o texto parece uma URL completa o suficiente para ser carregada."""
+    url = (url or '').strip()
+    if ' ' in url or '.' not in url:
+        return False
+    dominio = url.split('://', 1)[-1].split('/', 1)[0]
+    return '.' in dominio and not dominio.endswith('.') and len(dominio) > 3
+
+def _chave(tipo, url, opcoes):
+    """Chave da fonte no cache compartilhado."""
+    identificacao = json.dumps([tipo, url.strip(), sorted(opcoes.items())])
+    return 'fonte:' + hashlib.sha256(identificacao.encode('utf-8')).hexdigest()
+
+def _sem_erro(documento_info):
+    """Indica se o resultado de um carregador pode ser guardado no cache."""
+    return not tem_erro(documento_info)
+
+def _aquece_indice(documento_info):
+    """Gera (ou abre) os embeddings do documento, para que a indexação seja imediata."""
+    from core.embeddings import obtem_matriz
+    from core.index import dividir_em_chunks, hash_texto
+
+    conteudo = documento_info.get('conteudo', '')
+    trechos = dividir_em_chunks(conteudo)
+    if trechos:
+        obtem_matriz(hash_texto(conteudo), trechos, [hash_texto(trecho) for trecho in trechos])
+
+def _carrega(tipo, url, opcoes, callbacks=None, revalidar=False):
+    """
+    Obtém a fonte do cache compartilhado ou executa o seu carregador.
+
+    O carregador roda sob o lease da fonte: se outra réplica já a estiver carregando,
+    aguarda o resultado dela. Resultados sem erro são guardados no cache. Com
+    revalidar=True, o carregador sempre roda e o resultado substitui o do cache.
+    """
+    def executa():
+        documento_info = carrega(url, tipo, **opcoes, **(callbacks or {}))
+        if _sem_erro(documento_info):
+            try:
+                _aquece_indice(documento_info)
+            except Exception as e:
+                print(f"Aviso: Não foi possível preparar o índice de {url}: {str(e)}")
+        return documento_info
+
+    chave = _chave(tipo, url, opcoes)
+    if revalidar:
+        documento_info = executa()
+        if _sem_erro(documento_info):
+            get_cache().definir(chave, documento_info)
+        return documento_info
+    return obtem_ou_calcula(chave, executa, guardar=_sem_erro)
+
+def _inicia(tipo, url, opcoes):
+    """Inicia o carregamento em segundo plano, se a fonte não estiver em cache ou em andamento."""
+    chave = _chave(tipo, url, opcoes)
+    if get_cache().contem(chave):
+        return None
+    with _trava:
+        if chave in _em_andamento:
+            return _em_andamento.get(chave)
+        futuro = _executor.submit(_carrega, tipo, url, opcoes)
+        _em_andamento[chave] = futuro
+
+    def finaliza(_):
+        with _trava:
+            if _em_andamento.get(chave) is futuro:
+                del _em_andamento[chave]
+    futuro.add_done_callback(finaliza)
+    return futuro
+
+def agenda_prefetch(slot, tipo, url, **opcoes):
+    """
+    Agenda o carregamento antecipado de uma fonte.
+
+    O carregamento só começa após PREFETCH_DEBOUNCE segundos; um novo agendamento no
+    mesmo slot (por exemplo, o usuário corrigindo a URL) cancela o anterior.
+
+    Args:
+        slot: Identificador do campo de entrada (por exemplo, sessão + painel)
+        tipo: Tipo de fonte (chave de utils.loaders.registry.CARREGADORES)
+        url: URL da fonte
+        opcoes: Argumentos adicionais do carregador
+    """
+    cancela_prefetch(slot)
+    if not url_valida(url):
+        return
+    temporizador = threading.Timer(PREFETCH_DEBOUNCE, _inicia, args=(tipo, url.strip(), opcoes))
+    temporizador.daemon = True
+    with _trava:
+        _agendados[slot] = temporizador
+    temporizador.start()
+
+def cancela_prefetch(slot):
+    """
+    Cancela o carregamento antecipado agendado em um slot.
+
+    Um carregamento que ainda não começou é descartado; um que já está em execução
+    termina em segundo plano e seu resultado fica disponível no cache.
+    """
+    with _trava:
+        temporizador = _agendados.pop(slot, None)
+    if temporizador:
+        temporizador.cancel()
+
+def obtem_fonte(tipo, url, revalidar=False, **opcoes):
+    """
+    Carrega uma fonte, reaproveitando o resultado do prefetch quando disponível.
+
+    Args:
+        tipo: Tipo de fonte (chave de utils.loaders.registry.CARREGADORES)
+        url: URL da fonte
+        revalidar: Ignora o resultado em cache e carrega a fonte de novo (por exemplo,
+                   ao atualizar uma página, que o carregador revalida com um GET
+                   condicional); um prefetch em andamento ainda é reaproveitado
+        opcoes: Argumentos adicionais do carregador; callbacks de progresso (on_page,
+                on_chunk) só são chamados se a fonte for carregada agora
+
+    Returns:
+        Dicionário com informações e conteúdo da fonte (como o do carregador)
+    """
+    callbacks = {nome: valor for nome, valor in opcoes.items() if nome.startswith('on_')}
+    opcoes = {nome: valor for nome, valor in opcoes.items() if not nome.startswith('on_')}
+    url = (url or '').strip()
+    chave = _chave(tipo, url, opcoes)
+
+    resultado = None if revalidar else get_cache().obter(chave)
+    if resultado is not None:
+        return resultado
+    with _trava:
+        futuro = _em_andamento.get(chave)
+    if futuro is not None and not futuro.cancelled():
+        try:
+            return dict(futuro.result())
+        except Exception as e:
+            print(f"Aviso: O carregamento antecipado de {url} falhou: {str(e)}")
+    return dict(_carrega(tipo, url, opcoes, callbacks, revalidar))
+
+def aquece_fontes(urls):
+    """
+    Carrega em segundo plano as fontes da lista de aquecimento.
+
+    Args:
+        urls: Lista de URLs de sites, vídeos ou playlists
+
+    Returns:
+        Lista de Futures dos carregamentos iniciados
+    """
+    futuros = []
+    for url in urls:
+        if url_valida(url):
+            print(f"Aquecendo fonte: {url}")
+            futuro = _inicia(tipo_fonte(url), url.strip(), {})
+            if futuro is not None:
+                futuros.append(futuro)
+    return futuros
@@ -0,0 +1,276 @@
+"""
+Módulo de controle de admissão das chamadas à API da Anthropic.
+
+Cada chamada passa por baldes de fichas (token buckets) globais e da sessão que a
+originou, limitando requisições e tokens por minuto. Chamadas que não podem ser
+atendidas imediatamente aguardam em fila; as sessões são atendidas em rodízio, de
+modo que uma sessão com muitas perguntas pendentes não atrasa as demais além de
+uma rodada. Os limites valem por processo.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from config.settings import (
+    RATE_LIMIT_GLOBAL_RPM, RATE_LIMIT_GLOBAL_TPM, RATE_LIMIT_SESSION_RPM, RATE_LIMIT_SESSION_TPM,
+    RATE_LIMIT_MAX_WAIT, RATE_LIMIT_MAX_QUEUE
+)
+
+# Número de sessões inativas acima do qual os baldes cheios são descartados
+MAX_SESSOES_INATIVAS = 1000
+
+class LimiteExcedido(Exception):
+    """
+    A chamada não pôde ser admitida: fila da sessão cheia ou espera além do limite.
+
+    Attributes:
+        tentar_em: Segundos sugeridos antes de tentar novamente
+    """
+
+    def __init__(self, mensagem, tentar_em=None):
+        super().__init__(mensagem)
+        self.tentar_em = tentar_em
+
+class BaldeFichas:
+    """
+    Balde de fichas: acumula até `capacidade` fichas, repostas continuamente à taxa
+    de `capacidade` por minuto. O saldo pode ficar negativo quando o consumo real
+    supera o reservado, atrasando as próximas chamadas.
+    """
+
+    def __init__(self, por_minuto):
+        self.capacidade = float(por_minuto)
+        self.taxa = por_minuto / 60.0
+        self._saldo = self.capacidade
+        self._atualizado = time.monotonic()
+
+    def _repoe(self):
+        agora = time.monotonic()
+        self._saldo = min(self.capacidade, self._saldo + (agora - self._atualizado) * self.taxa)
+        self._atualizado = agora
+
+    def espera(self, quantidade):
+        """Segundos até haver `quantidade` fichas (limitada à capacidade); 0 se já houver."""
+        self._repoe()
+        falta = min(quantidade, self.capacidade) - self._saldo
+        return falta / self.taxa if falta > 0 else 0.0
+
+    def consome(self, quantidade):
+        """Retira fichas do balde (ou as devolve, se `quantidade` for negativa)."""
+        self._repoe()
+        self._saldo = min(self.capacidade, self._saldo - quantidade)
+
+    def cheio(self):
+        """Indica se o balde está com a capacidade total."""
+        self._repoe()
+        return self._saldo >= self.capacidade
+
+class Reserva:
+    """
+    Admissão concedida a uma chamada, com os tokens reservados para ela.
+    """
+
+    def __init__(self, controle, sessao, tokens):
+        self._controle = controle
+        self.sessao = sessao
+        self.tokens = tokens
+
+    def ajusta(self, tokens_reais):
+        """
+        Corrige a reserva com os tokens efetivamente usados pela chamada.
+
+        Args:
+            tokens_reais: Tokens de entrada e saída informados pela API
+        """
+        diferenca = tokens_reais - self.tokens
+        if diferenca:
+            self._controle._consome_tokens(self.sessao, diferenca)
+            self.tokens = tokens_reais
+
+class _Pedido:
+    __slots__ = ('sessao', 'tokens')
+
+    def __init__(self, sessao, tokens):
+        self.sessao = sessao
+        self.tokens = tokens
+
+class ControleAdmissao:
+    """
+    Fila de admissão com baldes de fichas globais e por sessão.
+
+    A cada liberação, a vez é da primeira sessão (na ordem de rodízio) cujo pedido
+    mais antigo cabe nos baldes da própria sessão; esse pedido aguarda apenas os
+    baldes globais. Sessões atendidas vão para o fim do rodízio.
+    """
+
+    def __init__(self, rpm=RATE_LIMIT_GLOBAL_RPM, tpm=RATE_LIMIT_GLOBAL_TPM,
+                 rpm_sessao=RATE_LIMIT_SESSION_RPM, tpm_sessao=RATE_LIMIT_SESSION_TPM,
+                 max_fila=RATE_LIMIT_MAX_QUEUE):
+        self._requisicoes = BaldeFichas(rpm)
+        self._tokens = BaldeFichas(tpm)
+        self._rpm_sessao = rpm_sessao
+        self._tpm_sessao = tpm_sessao
+        self._max_fila = max_fila
+        self._sessoes = {}  # sessão -> (balde de requisições, balde de tokens)
+        self._filas = OrderedDict()  # sessão -> fila de pedidos, na ordem do rodízio
+        self._condicao = threading.Condition()
+
+    def _baldes(self, sessao):
+        if sessao is None:
+            return ()
+        if sessao not in self._sessoes:
+            if len(self._sessoes) > MAX_SESSOES_INATIVAS:
+                for chave in [chave for chave, baldes in self._sessoes.items()
+                              if chave not in self._filas and all(balde.cheio() for balde in baldes)]:
+                    del self._sessoes[chave]
+            self._sessoes[sessao] = (BaldeFichas(self._rpm_sessao), BaldeFichas(self._tpm_sessao))
+        return self._sessoes[sessao]
+
+    def _espera_sessao(self, pedido):
+        baldes = self._baldes(pedido.sessao)
+        if not baldes:
+            return 0.0
+        return max(baldes[0].espera(1), baldes[1].espera(pedido.tokens))
+
+    def _consome_tokens(self, sessao, tokens):
+        with self._condicao:
+            self._tokens.consome(tokens)
+            for balde in self._baldes(sessao)[1:]:
+                balde.consome(tokens)
+            self._condicao.notify_all()
+
+    def _proximo(self):
+        """Retorna o pedido da vez e sua posição, ou (None, menor espera das sessões)."""
+        menor_espera = None
+        for fila in self._filas.values():
+            espera = self._espera_sessao(fila[0])
+            if espera == 0:
+                return fila[0], 0.0
+            menor_espera = espera if menor_espera is None else min(menor_espera, espera)
+        return None, menor_espera
+
+    def _tenta_admitir(self, pedido):
+        """Admite o pedido se for a sua vez e houver fichas; senão, retorna a espera estimada."""
+        proximo, espera = self._proximo()
+        if proximo is not pedido:
+            return max(espera or 0.0, self._espera_sessao(pedido), 0.05)
+
+        espera = max(self._requisicoes.espera(1), self._tokens.espera(pedido.tokens))
+        if espera:
+            return espera
+
+        self._requisicoes.consome(1)
+        self._tokens.consome(pedido.tokens)
+        for balde, quantidade in zip(self._baldes(pedido.sessao), (1, pedido.tokens)):
+            balde.consome(quantidade)
+        return 0.0
+
+    def _posicao(self, pedido):
+        """Posição aproximada do pedido: pedidos à frente na própria fila mais sessões à frente."""
+        sessoes = list(self._filas)
+        fila = self._filas[pedido.sessao]
+        return sessoes.index(pedido.sessao) + list(fila).index(pedido) + 1
+
+    def previsao(self, sessao, tokens):
+        """
+        Estima, sem reservar, quantos segundos uma nova chamada aguardaria.
+
+        Args:
+            sessao: ID da sessão (ou None para chamadas sem sessão)
+            tokens: Tokens estimados da chamada (entrada e resposta máxima)
+
+        Returns:
+            Segundos estimados de espera (0 se a chamada seria admitida de imediato)
+        """
+        with self._condicao:
+            pedido = _Pedido(sessao, tokens)
+            espera = max(self._espera_sessao(pedido), self._requisicoes.espera(1), self._tokens.espera(tokens))
+            if self._filas and not espera:
+                espera = 0.05 * sum(len(fila) for fila in self._filas.values())
+            return espera
+
+    def admite(self, sessao, tokens, on_espera=None, espera_max=RATE_LIMIT_MAX_WAIT):
+        """
+        Aguarda a vez de uma chamada à API e reserva as fichas necessárias.
+
+        Args:
+            sessao: ID da sessão (ou None para chamadas sem sessão, sujeitas só aos limites globais)
+            tokens: Tokens estimados da chamada (entrada e resposta máxima)
+            on_espera: Função opcional chamada com (posição na fila, segundos estimados)
+                       sempre que a estimativa de espera muda; deve retornar rapidamente
+            espera_max: Tempo máximo de espera em segundos
+
+        Returns:
+            Reserva, a ser ajustada com os tokens reais após a chamada
+
+        Raises:
+            LimiteExcedido: Se a sessão já tiver muitas chamadas na fila ou a espera
+                            ultrapassar espera_max
+        """
+        pedido = _Pedido(sessao, tokens)
+        limite = time.monotonic() + espera_max
+        aviso = None
+
+        with self._condicao:
+            fila = self._filas.setdefault(sessao, deque())
+            if len(fila) >= self._max_fila:
+                if not fila:
+                    del self._filas[sessao]
+                raise LimiteExcedido(
+                    "Há muitas perguntas suas aguardando na fila. Aguarde as respostas antes de enviar outras.",
+                    tentar_em=self._espera_sessao(pedido) or 1.0
+                )
+            fila.append(pedido)
+
+            try:
+                while True:
+                    espera = self._tenta_admitir(pedido)
+                    if not espera:
+                        return Reserva(self, sessao, tokens)
+
+                    restante = limite - time.monotonic()
+                    if espera > restante:
+                        raise LimiteExcedido(
+                            "O limite de uso do assistente foi atingido. Tente novamente em instantes.",
+                            tentar_em=espera
+                        )
+                    if on_espera:
+                        estimativa = (self._posicao(pedido), round(espera))
+                        if estimativa != aviso:
+                            # O aviso é feito fora da trava, para não bloquear as demais
+                            # chamadas; a admissão é reavaliada logo em seguida
+                            aviso = estimativa
+                            self._condicao.release()
+                            try:
+                                on_espera(*estimativa)
+                            finally:
+                                self._condicao.acquire()
+                            continue
+                    self._condicao.wait(min(espera, 1.0))
+            finally:
+                fila.remove(pedido)
+                if not fila:
+                    del self._filas[sessao]
+                elif fila is self._filas.get(sessao):
+                    self._filas.move_to_end(sessao)
+                self._condicao.notify_all()
+
+controle = ControleAdmissao()
+
+def admite(sessao, tokens, on_espera=None, espera_max=RATE_LIMIT_MAX_WAIT):
+    """
+    Aguarda a admissão de uma chamada à API no controle compartilhado pelo processo.
+
+    Args:
+        sessao: ID da sessão (ou None)
+        tokens: Tokens estimados da chamada (entrada e resposta máxima)
+        on_espera: Função opcional chamada com (posição na fila, segundos estimados)
+        espera_max: Tempo máximo de espera em segundos (limitado a RATE_LIMIT_MAX_WAIT)
+
+    Returns:
+        Reserva da chamada
+
+    Raises:
+        LimiteExcedido: Se a chamada não puder ser admitida
+    """
+    return controle.admite(sessao, tokens, on_espera, min(espera_max, RATE_LIMIT_MAX_WAIT))
@@ -0,0 +1,242 @@
+"""
+Módulo de recuperação híbrida dos trechos relevantes para uma pergunta.
+Combina um índice invertido BM25 (termos exatos, jargão) com a busca vetorial
+(paráfrases, variações de palavras) por fusão de rankings recíprocos (RRF) e
+reordena os melhores candidatos com uma pontuação local barata.
+"""
+
+import heapq
+import math
+import threading
+from collections import Counter, OrderedDict
+from config.settings import (
+    RETRIEVAL_TOP_K, RETRIEVAL_CANDIDATES, RRF_K, BM25_K1, BM25_B, MAX_INDICES_EM_CACHE
+)
+from core.compression import termos
+
+class IndiceBM25:
+    """
+    Índice invertido com pontuação BM25, atualizado incrementalmente.
+
+    Guarda, para cada termo, a frequência em cada trecho, e para cada trecho o seu
+    tamanho e os termos que contém (para que possa ser removido).
+    """
+
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}
+        self._tamanhos = {}
+        self._termos = {}
+        self._soma_tamanhos = 0
+
+    def __len__(self):
+        return len(self._tamanhos)
+
+    def adicionar(self, chave, texto):
+        """Indexa o texto de um trecho identificado por chave."""
+        contagem = Counter(termos(texto))
+        for termo, frequencia in contagem.items():
+            self._postings.setdefault(termo, {})[chave] = frequencia
+        tamanho = sum(contagem.values())
+        self._tamanhos[chave] = tamanho
+        self._termos[chave] = tuple(contagem)
+        self._soma_tamanhos += tamanho
+
+    def remover(self, chave):
+        """Remove um trecho do índice, se existir."""
+        if chave not in self._tamanhos:
+            return
+        for termo in self._termos.pop(chave):
+            postings = self._postings[termo]
+            del postings[chave]
+            if not postings:
+                del self._postings[termo]
+        self._soma_tamanhos -= self._tamanhos.pop(chave)
+
+    def limpar(self):
+        """Remove todos os trechos do índice."""
+        self._postings = {}
+        self._tamanhos = {}
+        self._termos = {}
+        self._soma_tamanhos = 0
+
+    def idf(self, termo):
+        """Peso IDF (BM25) de um termo; termos ausentes do índice valem 0."""
+        frequencia = len(self._postings.get(termo, ()))
+        if not frequencia:
+            return 0.0
+        return math.log(1 + (len(self._tamanhos) - frequencia + 0.5) / (frequencia + 0.5))
+
+    def busca(self, consulta, k):
+        """
+        Busca os trechos com maior pontuação BM25 para a consulta.
+
+        Args:
+            consulta: Texto da consulta
+            k: Número máximo de resultados
+
+        Returns:
+            Lista de tuplas (chave, pontuação), da maior para a menor
+        """
+        if not self._tamanhos:
+            return []
+        media = self._soma_tamanhos / len(self._tamanhos) or 1
+        pontuacoes = {}
+        for termo in set(termos(consulta)):
+            postings = self._postings.get(termo)
+            if not postings:
+                continue
+            idf = self.idf(termo)
+            for chave, frequencia in postings.items():
+                normalizacao = self.k1 * (1 - self.b + self.b * self._tamanhos[chave] / media)
+                pontuacoes[chave] = pontuacoes.get(chave, 0.0) + idf * frequencia * (self.k1 + 1) / (frequencia + normalizacao)
+        return heapq.nlargest(k, pontuacoes.items(), key=lambda item: item[1])
+
+def fusao_rrf(*rankings, k=RRF_K):
+    """
+    Combina rankings pela fusão de rankings recíprocos (Reciprocal Rank Fusion).
+
+    Args:
+        rankings: Listas de chaves, cada uma da mais para a menos relevante
+        k: Constante de suavização (valores maiores reduzem o peso das primeiras posições)
+
+    Returns:
+        Lista de tuplas (chave, pontuação RRF), da maior para a menor
+    """
+    pontuacoes = {}
+    for ranking in rankings:
+        for posicao, chave in enumerate(ranking, start=1):
+            pontuacoes[chave] = pontuacoes.get(chave, 0.0) + 1.0 / (k + posicao)
+    return sorted(pontuacoes.items(), key=lambda item: -item[1])
+
+def _reordena(indice, pergunta, candidatos):
+    """
+    Reordena os candidatos combinando a pontuação RRF com a cobertura dos termos da
+    pergunta (ponderada por IDF) e a presença de pares de termos consecutivos.
+    """
+    termos_pergunta = termos(pergunta)
+    pesos = {termo: indice.bm25.idf(termo) for termo in set(termos_pergunta)}
+    peso_total = sum(pesos.values()) or 1.0
+    bigramas_pergunta = set(zip(termos_pergunta, termos_pergunta[1:]))
+    maior_rrf = candidatos[0][1] if candidatos else 1.0
+
+    reordenados = []
+    for chunk, rrf in candidatos:
+        termos_chunk = termos(indice.texto(chunk))
+        presentes = set(termos_chunk)
+        cobertura = sum(peso for termo, peso in pesos.items() if termo in presentes) / peso_total
+        bigramas = (
+            len(bigramas_pergunta & set(zip(termos_chunk, termos_chunk[1:]))) / len(bigramas_pergunta)
+            if bigramas_pergunta else 0.0
+        )
+        reordenados.append((chunk, 0.5 * rrf / maior_rrf + 0.35 * cobertura + 0.15 * bigramas))
+    reordenados.sort(key=lambda item: -item[1])
+    return reordenados
+
+def busca_hibrida(indice, pergunta, k=RETRIEVAL_TOP_K, candidatos=RETRIEVAL_CANDIDATES):
+    """
+    Recupera os chunks mais relevantes para a pergunta combinando BM25 e busca vetorial.
+
+    Args:
+        indice: ChunkIndex com as fontes carregadas
+        pergunta: Pergunta do usuário
+        k: Número de chunks retornados
+        candidatos: Número de resultados considerados de cada busca antes da fusão
+
+    Returns:
+        Lista de chunks, da mais para a menos relevante
+    """
+    if not pergunta or not len(indice):
+        return []
+
+    por_id = {chunk['id']: chunk for chunk in indice.chunks}
+    lexicos = [chave for chave, _ in indice.bm25.busca(pergunta, candidatos)]
+    vetoriais = [chunk['id'] for chunk, _ in indice.busca_vetorial(pergunta, candidatos)]
+
+    fundidos = [(por_id[chave], pontuacao) for chave, pontuacao in fusao_rrf(lexicos, vetoriais) if chave in por_id]
+    return [chunk for chunk, _ in _reordena(indice, pergunta, fundidos[:3 * k])[:k]]
+
+def referencia_chunk(chunk):
+    """
+    Formata a referência de arquivo e páginas de um chunk, se conhecida.
+
+    Args:
+        chunk: Dicionário do chunk
+
+    Returns:
+        String como '[apostila.pdf, p. 3-4]', ou vazia se o chunk não tiver páginas
+    """
+    paginas = chunk['metadados'].get('paginas')
+    if not paginas:
+        return ''
+    intervalo = f"p. {paginas[0]}" if paginas[0] == paginas[1] else f"p. {paginas[0]}-{paginas[1]}"
+    arquivo = chunk['metadados'].get('arquivo')
+    return f"[{arquivo}, {intervalo}]" if arquivo else f"[{intervalo}]"
+
+def recupera_trechos(indice, pergunta, k=RETRIEVAL_TOP_K):
+    """
+    Retorna os textos dos chunks relevantes à pergunta, na ordem em que aparecem nas fontes.
+
+    Trechos de PDFs começam com a referência do arquivo e das páginas, para que a
+    resposta possa citá-las mesmo quando o marcador da página está fora do trecho.
+
+    Args:
+        indice: ChunkIndex com as fontes carregadas
+        pergunta: Pergunta do usuário
+        k: Número de chunks recuperados
+
+    Returns:
+        Lista de strings com os trechos (vazia se nada relevante for encontrado)
+    """
+    ordem_fontes = {fonte: posicao for posicao, fonte in enumerate(indice.fontes())}
+    chunks = busca_hibrida(indice, pergunta, k)
+    chunks.sort(key=lambda chunk: (ordem_fontes.get(chunk['fonte'], 0), chunk['metadados'].get('posicao', 0)))
+    trechos = []
+    for chunk in chunks:
+        referencia = referencia_chunk(chunk)
+        texto = indice.texto(chunk)
+        trechos.append(f"{referencia}\n{texto}" if referencia else texto)
+    return trechos
+
+# Índices montados para documentos salvos (API e lotes), reaproveitados entre perguntas
+_indices_por_documento = OrderedDict()
+_trava_indices = threading.Lock()
+
+def indice_documento(documento_info):
+    """
+    Retorna um índice de chunks do documento, montado uma única vez por hash do documento.
+
+    Usado onde não há um índice de sessão (API HTTP, perguntas em lote) ou para
+    reconstruí-lo ao retomar uma conversa.
+
+    Args:
+        documento_info: Dicionário do documento, com 'conteudo' ou 'documento_hash'
+
+    Returns:
+        ChunkIndex com o conteúdo do documento, ou None se não houver conteúdo
+    """
+    from core.index import ChunkIndex, hash_texto
+    from core.storage import obter_conteudo
+
+    if not isinstance(documento_info, dict):
+        return None
+    conteudo = obter_conteudo(documento_info)
+    if not conteudo:
+        return None
+    chave = documento_info.get('documento_hash') or hash_texto(conteudo)
+
+    with _trava_indices:
+        indice = _indices_por_documento.get(chave)
+        if indice is not None:
+            _indices_por_documento.move_to_end(chave)
+            return indice
+
+    indice = ChunkIndex()
+    indice.atualizar_fonte(documento_info.get('url') or documento_info.get('titulo', ''), conteudo)
+
+    with _trava_indices:
+        _indices_por_documento[chave] = indice
+        while len(_indices_por_documento) > MAX_INDICES_EM_CACHE:
+            _indices_por_documento.popitem(last=False)
+    return indice
@@ -0,0 +1,296 @@
+"""
+Módulo de chamadas resilientes à API da Anthropic.
+
+Classifica as falhas (sobrecarga, limite de requisições, rede), repete as que são
+transitórias com espera exponencial aleatória (jitter) dentro de um prazo total e,
+em respostas geradas em streaming, continua a partir do texto já recebido em vez de
+gerar tudo de novo. Falhas definitivas são levantadas como ErroLLM.
+"""
+
+import asyncio
+import random
+import time
+from config.settings import LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_DEADLINE, LLM_MAX_CONTINUATIONS
+from core.clients import get_client, get_async_client
+from core.tokens import contar_tokens
+
+# Mensagens exibidas ao usuário para cada tipo de falha
+MENSAGENS_ERRO = {
+    'sobrecarga': "O modelo está sobrecarregado no momento. Tente novamente em instantes.",
+    'limite': "O limite de requisições à API foi atingido. Tente novamente em instantes.",
+    'rede': "Não foi possível se comunicar com a API. Verifique a conexão e tente novamente.",
+    'prazo': "A resposta demorou mais que o esperado. Tente novamente.",
+    None: "Não foi possível gerar a resposta.",
+}
+
+class ErroLLM(Exception):
+    """
+    Falha definitiva em uma chamada ao modelo (após as novas tentativas).
+
+    Attributes:
+        tipo: 'sobrecarga', 'limite', 'rede', 'prazo' ou None (erro não transitório)
+        parcial: Texto já gerado antes da falha (em streaming), possivelmente vazio
+    """
+
+    def __init__(self, tipo, detalhe, parcial=''):
+        super().__init__(f"{MENSAGENS_ERRO[tipo]} Detalhes: {detalhe}")
+        self.tipo = tipo
+        self.parcial = parcial
+
+class Prazo:
+    """
+    Prazo total de uma operação, repassado às chamadas e esperas que ela faz.
+    """
+
+    def __init__(self, segundos=LLM_DEADLINE):
+        self.limite = time.monotonic() + segundos
+
+    def restante(self):
+        """Segundos até o fim do prazo (nunca negativo)."""
+        return max(0.0, self.limite - time.monotonic())
+
+    def expirou(self):
+        """Indica se o prazo acabou."""
+        return self.restante() <= 0
+
+def classifica_erro(erro):
+    """
+    Classifica uma exceção do SDK da Anthropic (ou da rede).
+
+    Args:
+        erro: Exceção levantada pela chamada
+
+    Returns:
+        'sobrecarga', 'limite' ou 'rede' para falhas transitórias, ou None
+    """
+    status = getattr(erro, 'status_code', None)
+    nome = type(erro).__name__
+    if status == 429 or nome == 'RateLimitError':
+        return 'limite'
+    if status in (500, 502, 503, 504, 529) or 'overloaded' in str(erro).lower():
+        return 'sobrecarga'
+    if nome in ('APIConnectionError', 'APITimeoutError', 'RemoteProtocolError', 'ReadError', 'ReadTimeout') \
+            or isinstance(erro, (ConnectionError, TimeoutError)):
+        return 'rede'
+    return None
+
+def _espera(tentativa, erro, prazo):
+    """
+    Calcula a espera antes da próxima tentativa (full jitter), respeitando o
+    cabeçalho retry-after e o prazo. Retorna None se não houver tempo para esperar.
+    """
+    espera = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** tentativa))
+    resposta = getattr(erro, 'response', None)
+    try:
+        espera = max(espera, float(resposta.headers.get('retry-after')))
+    except (AttributeError, TypeError, ValueError):
+        pass
+    return espera if espera < prazo.restante() else None
+
+def _cliente(prazo, assincrono=False):
+    """Cliente sem as novas tentativas do SDK (feitas aqui) e com o tempo limite do prazo."""
+    cliente = get_async_client() if assincrono else get_client()
+    return cliente.with_options(max_retries=0, timeout=max(prazo.restante(), 1.0))
+
+def _continuacao(parametros, parcial):
+    """Parâmetros para continuar uma resposta interrompida a partir do texto parcial."""
+    # A API não aceita a mensagem do assistente terminando em espaço
+    return dict(parametros, messages=list(parametros['messages']) + [
+        {'role': 'assistant', 'content': parcial.rstrip()}
+    ])
+
+def _falha(erro, tentativa, prazo, parcial=''):
+    """Decide se a chamada deve ser repetida; retorna a espera ou levanta ErroLLM."""
+    tipo = classifica_erro(erro)
+    if tipo is None:
+        raise ErroLLM(None, str(erro), parcial) from erro
+    if tentativa >= LLM_MAX_RETRIES:
+        raise ErroLLM(tipo, str(erro), parcial) from erro
+    espera = _espera(tentativa, erro, prazo)
+    if espera is None:
+        raise ErroLLM('prazo', str(erro), parcial) from erro
+    print(f"Aviso: Falha transitória na API ({tipo}), nova tentativa em {espera:.1f}s: {str(erro)}")
+    return espera
+
+def cria_mensagem(parametros, prazo=None):
+    """
+    Chama client.messages.create com novas tentativas em falhas transitórias.
+
+    Args:
+        parametros: Argumentos de messages.create
+        prazo: Prazo total da operação (padrão: LLM_DEADLINE a partir de agora)
+
+    Returns:
+        Mensagem retornada pela API
+
+    Raises:
+        ErroLLM: Se a chamada falhar definitivamente ou o prazo acabar
+    """
+    prazo = prazo or Prazo()
+    tentativa = 0
+    while True:
+        try:
+            return _cliente(prazo).messages.create(**parametros)
+        except Exception as e:
+            time.sleep(_falha(e, tentativa, prazo))
+            tentativa += 1
+
+class _Resultado:
+    """Texto e uso de tokens acumulados ao longo das tentativas e continuações."""
+
+    def __init__(self):
+        self.texto = ''
+        self.entrada = 0
+        self.saida = 0
+        self.continuacoes = 0
+        self._stream = None
+        self._texto_tentativa = ''
+
+    def inicia(self, stream):
+        """Registra o início de uma tentativa."""
+        self._stream = stream
+        self._texto_tentativa = ''
+
+    def acrescenta(self, texto):
+        self.texto += texto
+        self._texto_tentativa += texto
+
+    def registra_uso(self, usage):
+        self.entrada += usage.input_tokens
+        self.saida += usage.output_tokens
+        self._stream = None
+
+    def registra_interrompida(self):
+        """
+        Soma o uso de uma tentativa interrompida antes da mensagem final.
+
+        Os tokens já processados são cobrados mesmo assim: a entrada vem do início da
+        mensagem recebido no stream, e a saída é estimada pelo texto recebido se o
+        stream ainda não tiver informado a contagem.
+        """
+        if self._stream is None:
+            return
+        try:
+            usage = self._stream.current_message_snapshot.usage
+        except Exception:
+            usage = None
+        self.entrada += getattr(usage, 'input_tokens', 0) or 0
+        self.saida += max(getattr(usage, 'output_tokens', 0) or 0, contar_tokens(self._texto_tentativa))
+        self._stream = None
+
+    def parametros(self, parametros):
+        """Parâmetros da próxima tentativa: continuação se já houver texto recebido."""
+        return _continuacao(parametros, self.texto) if self.texto.strip() else parametros
+
+    def falha(self, erro, tentativa, prazo):
+        """
+        Trata a falha de uma tentativa; retorna a espera ou levanta ErroLLM.
+
+        O texto parcial já foi repassado a quem chamou, então a resposta não pode
+        recomeçar do zero: esgotadas as continuações, a falha é definitiva.
+        """
+        espera = _falha(erro, tentativa, prazo, self.texto)
+        if self.texto.strip():
+            self.continuacoes += 1
+            if self.continuacoes > LLM_MAX_CONTINUATIONS:
+                raise ErroLLM(classifica_erro(erro), str(erro), self.texto) from erro
+        return espera
+
+def _novo_trecho(resultado, texto, inicio):
+    """Ajusta o primeiro trecho de uma continuação (o espaço final já foi enviado)."""
+    if inicio and resultado.texto != resultado.texto.rstrip():
+        return texto.lstrip()
+    return texto
+
+def transmite_mensagem(parametros, prazo=None, on_texto=None, on_uso=None):
+    """
+    Gera uma resposta em streaming, continuando do texto parcial após falhas.
+
+    Se a conexão cair no meio da resposta, a nova tentativa envia o texto já
+    recebido como início da resposta do assistente, e o modelo continua dali.
+
+    Args:
+        parametros: Argumentos de messages.stream
+        prazo: Prazo total da operação (padrão: LLM_DEADLINE a partir de agora)
+        on_texto: Função opcional chamada com cada novo trecho de texto
+        on_uso: Função opcional chamada ao final, mesmo em caso de falha, com
+                (tokens de entrada, tokens de saída) somados em todas as tentativas
+
+    Returns:
+        Tupla (texto completo, tokens de entrada, tokens de saída), somando as tentativas
+
+    Raises:
+        ErroLLM: Se a chamada falhar definitivamente ou o prazo acabar
+    """
+    prazo = prazo or Prazo()
+    resultado = _Resultado()
+    tentativa = 0
+    try:
+        while True:
+            try:
+                with _cliente(prazo).messages.stream(**resultado.parametros(parametros)) as stream:
+                    resultado.inicia(stream)
+                    inicio = True
+                    for texto in stream.text_stream:
+                        texto = _novo_trecho(resultado, texto, inicio)
+                        inicio = False
+                        resultado.acrescenta(texto)
+                        if on_texto and texto:
+                            on_texto(texto)
+                    resultado.registra_uso(stream.get_final_message().usage)
+                return resultado.texto, resultado.entrada, resultado.saida
+            except ErroLLM:
+                raise
+            except Exception as e:
+                resultado.registra_interrompida()
+                time.sleep(resultado.falha(e, tentativa, prazo))
+                tentativa += 1
+    finally:
+        resultado.registra_interrompida()
+        if on_uso:
+            on_uso(resultado.entrada, resultado.saida)
+
+async def transmite_mensagem_async(parametros, prazo=None, on_uso=None):
+    """
+    Versão assíncrona de transmite_mensagem, que produz os trechos de texto.
+
+    Args:
+        parametros: Argumentos de messages.stream
+        prazo: Prazo total da operação (padrão: LLM_DEADLINE a partir de agora)
+        on_uso: Função opcional chamada ao final, mesmo em caso de falha ou de o
+                consumidor abandonar o stream, com (tokens de entrada, tokens de saída)
+                somados em todas as tentativas
+
+    Yields:
+        Trechos de texto da resposta (sem repetir o que já foi enviado)
+
+    Raises:
+        ErroLLM: Se a chamada falhar definitivamente ou o prazo acabar
+    """
+    prazo = prazo or Prazo()
+    resultado = _Resultado()
+    tentativa = 0
+    try:
+        while True:
+            try:
+                async with _cliente(prazo, assincrono=True).messages.stream(**resultado.parametros(parametros)) as stream:
+                    resultado.inicia(stream)
+                    inicio = True
+                    async for texto in stream.text_stream:
+                        texto = _novo_trecho(resultado, texto, inicio)
+                        inicio = False
+                        resultado.acrescenta(texto)
+                        if texto:
+                            yield texto
+                    resultado.registra_uso((await stream.get_final_message()).usage)
+                return
+            except ErroLLM:
+                raise
+            except Exception as e:
+                resultado.registra_interrompida()
+                await asyncio.sleep(resultado.falha(e, tentativa, prazo))
+                tentativa += 1
+    finally:
+        resultado.registra_interrompida()
+        if on_uso:
+            on_uso(resultado.entrada, resultado.saida)
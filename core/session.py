@@ -9,16 +9,50 @@ import tempfile
 import shutil
 import uuid
 from datetime import datetime
+from core.artifacts import agenda_artefatos
+from core.blob_store import libera
+from core.index import ChunkIndex
+from core.storage import (
+    garantir_conversa, salvar_mensagem, remover_mensagem, carregar_mensagens, existem_mensagens_anteriores,
+    limpar_mensagens, salvar_documento, limpar_documento, carregar_referencia_documento
+)
+from utils.loaders.document import tem_erro
+
+def _obtem_session_id():
+    """
+    Obtém o ID da sessão a partir da URL (parâmetro 'sessao') ou gera um novo.
+    Manter o ID na URL permite retomar a conversa após recarregar a página.
+    """
+    session_id = st.query_params.get('sessao')
+    try:
+        return str(uuid.UUID(session_id))
+    except (TypeError, ValueError):
+        session_id = str(uuid.uuid4())
+        st.query_params['sessao'] = session_id
+        return session_id
 
 def initialize_session():
     """
     Inicializa todos os estados necessários para a sessão do Streamlit.
     Chamado no início da aplicação para garantir que todos os estados estejam disponíveis.
     """
+    # ID de sessão único; se a conversa já existir no banco, retoma a última página de
+    # mensagens e a referência ao documento (o conteúdo só é carregado quando usado)
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = _obtem_session_id()
+        if garantir_conversa(st.session_state.session_id):
+            st.session_state.mensagens = carregar_mensagens(st.session_state.session_id)
+            st.session_state.documento = carregar_referencia_documento(st.session_state.session_id) or ""
+            _atualiza_mensagens_anteriores()
+    
     # Estado para histórico de mensagens
     if 'mensagens' not in st.session_state:
         st.session_state.mensagens = []
     
+    # Indica se existem mensagens mais antigas no banco, ainda não carregadas
+    if 'mensagens_anteriores' not in st.session_state:
+        st.session_state.mensagens_anteriores = False
+    
     # Estado para fonte de dados atual
     if 'fonte_dados' not in st.session_state:
         st.session_state.fonte_dados = None
@@ -27,9 +61,9 @@ def initialize_session():
     if 'documento' not in st.session_state:
         st.session_state.documento = ""
     
-    # ID de sessão único
-    if 'session_id' not in st.session_state:
-        st.session_state.session_id = str(uuid.uuid4())
+    # Índice de chunks das fontes carregadas
+    if 'indice' not in st.session_state:
+        st.session_state.indice = ChunkIndex()
     
     # Timestamp da última interação
     if 'last_interaction' not in st.session_state:
@@ -40,6 +74,25 @@ def initialize_session():
         st.session_state.temp_dir = tempfile.mkdtemp()
         print(f"Diretório temporário criado: {st.session_state.temp_dir}")
 
+def _atualiza_mensagens_anteriores():
+    """Atualiza o indicador de mensagens anteriores ainda não carregadas."""
+    mensagens = st.session_state.get('mensagens', [])
+    primeiro_id = mensagens[0].get('id') if mensagens else None
+    st.session_state.mensagens_anteriores = existem_mensagens_anteriores(
+        st.session_state.session_id, primeiro_id
+    )
+
+def load_older_messages():
+    """Carrega a página anterior do histórico de mensagens salvo no banco."""
+    mensagens = st.session_state.mensagens
+    primeiro_id = mensagens[0].get('id') if mensagens else None
+    if primeiro_id is None:
+        return
+    
+    anteriores = carregar_mensagens(st.session_state.session_id, antes_de=primeiro_id)
+    st.session_state.mensagens = anteriores + mensagens
+    _atualiza_mensagens_anteriores()
+
 def update_last_interaction():
     """Atualiza o timestamp da última interação."""
     st.session_state.last_interaction = datetime.now()
@@ -47,10 +100,13 @@ def update_last_interaction():
 def clear_conversation():
     """
     Limpa o histórico de conversas e reinicia o estado.
-    Também limpa os arquivos temporários, se houverem.
+    Também limpa os arquivos temporários, se houverem, e libera os arquivos enviados.
     """
     # Limpa o histórico de mensagens
     st.session_state.mensagens = []
+    st.session_state.mensagens_anteriores = False
+    limpar_mensagens(st.session_state.session_id)
+    libera(st.session_state.session_id)
     
     # Limpa e recria o diretório temporário
     if 'temp_dir' in st.session_state and os.path.exists(st.session_state.temp_dir):
@@ -84,9 +140,43 @@ def add_message(role, content):
         role: Papel do mensageiro ('user' ou 'assistant')
         content: Conteúdo da mensagem
     """
+    timestamp = datetime.now().isoformat()
+    mensagem_id = salvar_mensagem(st.session_state.session_id, role, content, timestamp)
     st.session_state.mensagens.append({
+        "id": mensagem_id,
         "role": role,
         "content": content,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": timestamp
     })
-    update_last_interaction()
\ No newline at end of file
+    update_last_interaction()
+
+def remove_last_message():
+    """
+    Remove a última mensagem do histórico (a pergunta que não pôde ser respondida).
+
+    Assim, perguntas recusadas pelos limites de uso ou que falharam não são reenviadas
+    ao modelo como parte do histórico nas próximas perguntas.
+    """
+    if st.session_state.mensagens:
+        mensagem = st.session_state.mensagens.pop()
+        remover_mensagem(mensagem["id"])
+
+def set_document(documento_info):
+    """
+    Define o documento atual da sessão.
+    
+    Documentos carregados com sucesso são salvos no banco e a sessão mantém apenas
+    uma referência (sem o conteúdo); se habilitado, o material de estudo do documento
+    começa a ser gerado em segundo plano. Documentos de erro (e o Chat Livre) ficam
+    apenas na sessão, e a conversa deixa de referenciar o documento anterior no banco.
+    
+    Args:
+        documento_info: Dicionário retornado por um dos carregadores
+    """
+    if (isinstance(documento_info, dict) and documento_info.get('conteudo')
+            and not tem_erro(documento_info)):
+        st.session_state.documento = salvar_documento(st.session_state.session_id, documento_info)
+        agenda_artefatos(st.session_state.documento)
+    else:
+        limpar_documento(st.session_state.session_id)
+        st.session_state.documento = documento_info
\ No newline at end of file
@@ -0,0 +1,296 @@
+"""
+Módulo de cache compartilhado entre processos (réplicas do servidor).
+
+Guarda resultados caros de obter (fontes carregadas, transcrições, validadores HTTP,
+respostas de lotes) em um backend configurável: memória do processo, um arquivo
+SQLite compartilhado ou um servidor Redis. Leases (travas com prazo de validade)
+garantem que apenas um processo carregue uma mesma fonte por vez; os demais
+aguardam e reaproveitam o resultado.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+from config.settings import (
+    CACHE_BACKEND, CACHE_PATH, REDIS_URL, CACHE_TTL, LEASE_TTL, LEASE_WAIT, LEASE_POLL_INTERVAL
+)
+
+class CacheMemoria:
+    """
+    Cache na memória do processo. Não é compartilhado entre réplicas, mas mantém a
+    mesma interface (e a mesma serialização) dos demais backends.
+    """
+
+    def __init__(self):
+        self._valores = {}  # chave -> (instante de expiração ou None, valor em JSON)
+        self._leases = {}  # chave -> (instante de expiração, token)
+        self._trava = threading.Lock()
+
+    def _valido(self, chave):
+        registro = self._valores.get(chave)
+        if registro and registro[0] is not None and registro[0] < time.time():
+            del self._valores[chave]
+            return None
+        return registro
+
+    def obter(self, chave):
+        """Retorna o valor guardado na chave, ou None se não existir ou tiver expirado."""
+        with self._trava:
+            registro = self._valido(chave)
+        return json.loads(registro[1]) if registro else None
+
+    def contem(self, chave):
+        """Indica se há um valor válido na chave, sem desserializá-lo."""
+        with self._trava:
+            return self._valido(chave) is not None
+
+    def definir(self, chave, valor, ttl=CACHE_TTL):
+        """Guarda um valor serializável em JSON por ttl segundos (sem expiração se ttl for None)."""
+        serializado = json.dumps(valor)
+        with self._trava:
+            self._valores[chave] = (time.time() + ttl if ttl else None, serializado)
+
+    def remover(self, chave):
+        """Remove o valor da chave, se existir."""
+        with self._trava:
+            self._valores.pop(chave, None)
+
+    def adquirir(self, chave, ttl=LEASE_TTL):
+        """Tenta obter o lease da chave por ttl segundos; retorna o token ou None se já estiver em uso."""
+        token = uuid.uuid4().hex
+        with self._trava:
+            lease = self._leases.get(chave)
+            if lease and lease[0] >= time.time():
+                return None
+            self._leases[chave] = (time.time() + ttl, token)
+        return token
+
+    def liberar(self, chave, token):
+        """Libera o lease da chave, se ainda pertencer ao token informado."""
+        with self._trava:
+            lease = self._leases.get(chave)
+            if lease and lease[1] == token:
+                del self._leases[chave]
+
+class CacheSQLite:
+    """
+    Cache em um arquivo SQLite compartilhado pelos processos da mesma máquina (ou de
+    um volume compartilhado). Cada thread usa sua própria conexão, como em core.storage.
+    """
+
+    ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS cache (
+        chave TEXT PRIMARY KEY,
+        valor TEXT NOT NULL,
+        expira_em REAL
+    );
+
+    CREATE TABLE IF NOT EXISTS leases (
+        chave TEXT PRIMARY KEY,
+        token TEXT NOT NULL,
+        expira_em REAL NOT NULL
+    );
+    """
+
+    # A cada quantas gravações os registros expirados são removidos
+    INTERVALO_LIMPEZA = 200
+
+    def __init__(self, caminho=CACHE_PATH):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._gravacoes = 0
+
+    def _conexao(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+            conn = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.ESQUEMA)
+            self._local.conn = conn
+        return conn
+
+    def obter(self, chave):
+        linha = self._conexao().execute(
+            "SELECT valor FROM cache WHERE chave = ? AND (expira_em IS NULL OR expira_em >= ?)",
+            (chave, time.time())
+        ).fetchone()
+        return json.loads(linha[0]) if linha else None
+
+    def contem(self, chave):
+        return self._conexao().execute(
+            "SELECT 1 FROM cache WHERE chave = ? AND (expira_em IS NULL OR expira_em >= ?)",
+            (chave, time.time())
+        ).fetchone() is not None
+
+    def definir(self, chave, valor, ttl=CACHE_TTL):
+        conn = self._conexao()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (chave, valor, expira_em) VALUES (?, ?, ?)",
+            (chave, json.dumps(valor), time.time() + ttl if ttl else None)
+        )
+        self._gravacoes += 1
+        if self._gravacoes % self.INTERVALO_LIMPEZA == 0:
+            conn.execute("DELETE FROM cache WHERE expira_em < ?", (time.time(),))
+
+    def remover(self, chave):
+        self._conexao().execute("DELETE FROM cache WHERE chave = ?", (chave,))
+
+    def adquirir(self, chave, ttl=LEASE_TTL):
+        token = uuid.uuid4().hex
+        agora = time.time()
+        conn = self._conexao()
+        # BEGIN IMMEDIATE obtém a trava de escrita do banco: a verificação e a
+        # inserção do lease são atômicas entre processos
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM leases WHERE chave = ? AND expira_em < ?", (chave, agora))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO leases (chave, token, expira_em) VALUES (?, ?, ?)",
+                (chave, token, agora + ttl)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return token if cursor.rowcount == 1 else None
+
+    def liberar(self, chave, token):
+        self._conexao().execute("DELETE FROM leases WHERE chave = ? AND token = ?", (chave, token))
+
+class CacheRedis:
+    """
+    Cache em um servidor Redis (ou compatível), compartilhado por réplicas em
+    máquinas diferentes. Requer o pacote redis.
+    """
+
+    # Remove o lease apenas se ele ainda pertencer a quem o adquiriu
+    _LIBERA = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url=REDIS_URL):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self._redis.ping()
+
+    def obter(self, chave):
+        valor = self._redis.get(chave)
+        return json.loads(valor) if valor is not None else None
+
+    def contem(self, chave):
+        return bool(self._redis.exists(chave))
+
+    def definir(self, chave, valor, ttl=CACHE_TTL):
+        self._redis.set(chave, json.dumps(valor), ex=int(ttl) if ttl else None)
+
+    def remover(self, chave):
+        self._redis.delete(chave)
+
+    def adquirir(self, chave, ttl=LEASE_TTL):
+        token = uuid.uuid4().hex
+        return token if self._redis.set(chave, token, nx=True, px=int(ttl * 1000)) else None
+
+    def liberar(self, chave, token):
+        self._redis.eval(self._LIBERA, 1, chave, token)
+
+BACKENDS = {
+    'memoria': CacheMemoria,
+    'sqlite': CacheSQLite,
+    'redis': CacheRedis,
+}
+
+@lru_cache(maxsize=None)
+def get_cache():
+    """
+    Retorna o cache compartilhado configurado em CACHE_BACKEND, criando-o no primeiro uso.
+
+    Se o backend não puder ser criado (por exemplo, o pacote redis não está
+    instalado), usa o cache em memória.
+
+    Returns:
+        Instância de CacheMemoria, CacheSQLite ou CacheRedis
+    """
+    try:
+        return BACKENDS[CACHE_BACKEND]()
+    except Exception as e:
+        print(f"Aviso: Cache '{CACHE_BACKEND}' indisponível, usando a memória do processo: {str(e)}")
+        return CacheMemoria()
+
+@contextmanager
+def exclusivo(chave, espera=LEASE_WAIT):
+    """
+    Executa um bloco com o lease da chave, aguardando se outro processo o detiver.
+
+    Se o lease não for obtido em `espera` segundos, o bloco é executado mesmo assim
+    (evita que uma réplica travada bloqueie as demais indefinidamente).
+
+    Args:
+        chave: Identificador do recurso (por exemplo, 'embeddings:<hash>')
+        espera: Tempo máximo de espera em segundos
+
+    Yields:
+        True se o lease foi obtido, False se a espera se esgotou
+    """
+    cache = get_cache()
+    chave = f"lease:{chave}"
+    limite = time.time() + espera
+    token = cache.adquirir(chave)
+    while token is None and time.time() < limite:
+        time.sleep(LEASE_POLL_INTERVAL)
+        token = cache.adquirir(chave)
+    try:
+        yield token is not None
+    finally:
+        if token is not None:
+            cache.liberar(chave, token)
+
+def obtem_ou_calcula(chave, calcula, ttl=CACHE_TTL, guardar=None, espera=LEASE_WAIT, ttl_lease=LEASE_TTL):
+    """
+    Retorna o valor em cache ou o calcula, garantindo um único cálculo entre processos.
+
+    Quem obtém o lease da chave calcula e grava o valor; os demais aguardam até que
+    ele apareça no cache. Se quem detinha o lease não gravou nada (por exemplo, o
+    carregamento falhou), o próximo a obtê-lo tenta novamente.
+
+    Args:
+        chave: Chave do valor no cache
+        calcula: Função sem argumentos que produz o valor (serializável em JSON)
+        ttl: Tempo de vida do valor em segundos
+        guardar: Função opcional que recebe o valor e indica se ele deve ser guardado
+        espera: Tempo máximo de espera pelo cálculo de outro processo, em segundos
+        ttl_lease: Validade do lease em segundos (deve cobrir a duração do cálculo)
+
+    Returns:
+        Valor do cache ou recém-calculado
+    """
+    cache = get_cache()
+    valor = cache.obter(chave)
+    if valor is not None:
+        return valor
+
+    limite = time.time() + espera
+    while True:
+        token = cache.adquirir(f"lease:{chave}", ttl_lease)
+        if token is not None:
+            try:
+                # Outro processo pode ter terminado entre a consulta e o lease
+                valor = cache.obter(chave)
+                if valor is None:
+                    valor = calcula()
+                    if valor is not None and (guardar is None or guardar(valor)):
+                        cache.definir(chave, valor, ttl)
+                return valor
+            finally:
+                cache.liberar(f"lease:{chave}", token)
+
+        time.sleep(LEASE_POLL_INTERVAL)
+        valor = cache.obter(chave)
+        if valor is not None:
+            return valor
+        if time.time() >= limite:
+            return calcula()
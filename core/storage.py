@@ -0,0 +1,398 @@
+"""
+Módulo de persistência local das conversas, mensagens e documentos em SQLite.
+Permite retomar sessões e manter fora da memória o conteúdo que não está em uso.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from config.settings import DATABASE_PATH, HISTORY_PAGE_SIZE
+from core.document_store import document_store, hash_texto
+
+_local = threading.local()
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS conversas (
+    session_id TEXT PRIMARY KEY,
+    documento_hash TEXT,
+    criada_em TEXT NOT NULL,
+    atualizada_em TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS mensagens (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_mensagens_sessao ON mensagens (session_id, id);
+
+CREATE TABLE IF NOT EXISTS documentos (
+    hash TEXT PRIMARY KEY,
+    tipo TEXT,
+    url TEXT,
+    titulo TEXT,
+    conteudo TEXT NOT NULL,
+    criado_em TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS artefatos (
+    documento_hash TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    conteudo TEXT NOT NULL,
+    criado_em TEXT NOT NULL,
+    PRIMARY KEY (documento_hash, tipo)
+);
+
+CREATE TABLE IF NOT EXISTS blob_referencias (
+    hash TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    PRIMARY KEY (hash, session_id)
+);
+"""
+
+def conexao():
+    """
+    Retorna a conexão SQLite da thread atual, criando-a se necessário.
+
+    O Streamlit executa cada sessão em uma thread própria, por isso cada thread
+    mantém sua conexão. O modo WAL permite leituras simultâneas à escrita.
+
+    Returns:
+        Objeto sqlite3.Connection
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
+        conn = sqlite3.connect(DATABASE_PATH, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(ESQUEMA)
+        _local.conn = conn
+    return conn
+
+def garantir_conversa(session_id):
+    """
+    Cria o registro da conversa se ele ainda não existir.
+
+    Args:
+        session_id: ID da sessão
+
+    Returns:
+        True se a conversa já existia, False se foi criada agora
+    """
+    conn = conexao()
+    agora = datetime.now().isoformat()
+    with conn:
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO conversas (session_id, criada_em, atualizada_em) VALUES (?, ?, ?)",
+            (session_id, agora, agora)
+        )
+    return cursor.rowcount == 0
+
+def conversa_existe(session_id):
+    """
+    Indica se a conversa existe, sem criá-la.
+
+    Args:
+        session_id: ID da sessão
+
+    Returns:
+        True se a conversa existe
+    """
+    conn = conexao()
+    return conn.execute("SELECT 1 FROM conversas WHERE session_id = ?", (session_id,)).fetchone() is not None
+
+def salvar_mensagem(session_id, role, content, timestamp=None):
+    """
+    Salva uma mensagem no histórico da conversa.
+
+    Args:
+        session_id: ID da sessão
+        role: Papel do mensageiro ('user' ou 'assistant')
+        content: Conteúdo da mensagem
+        timestamp: Data/hora da mensagem em formato ISO (agora, se None)
+
+    Returns:
+        ID da mensagem salva
+    """
+    conn = conexao()
+    timestamp = timestamp or datetime.now().isoformat()
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO mensagens (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+            (session_id, role, content, timestamp)
+        )
+        conn.execute(
+            "UPDATE conversas SET atualizada_em = ? WHERE session_id = ?",
+            (timestamp, session_id)
+        )
+    return cursor.lastrowid
+
+def carregar_mensagens(session_id, limite=HISTORY_PAGE_SIZE, antes_de=None):
+    """
+    Carrega uma página do histórico de mensagens, da mais antiga para a mais recente.
+
+    Args:
+        session_id: ID da sessão
+        limite: Quantidade máxima de mensagens da página
+        antes_de: ID de mensagem; se informado, carrega apenas mensagens anteriores a ela
+
+    Returns:
+        Lista de dicionários com 'id', 'role', 'content' e 'timestamp'
+    """
+    consulta = "SELECT id, role, content, timestamp FROM mensagens WHERE session_id = ?"
+    parametros = [session_id]
+    if antes_de is not None:
+        consulta += " AND id < ?"
+        parametros.append(antes_de)
+    consulta += " ORDER BY id DESC LIMIT ?"
+    parametros.append(limite)
+
+    linhas = conexao().execute(consulta, parametros).fetchall()
+    return [dict(linha) for linha in reversed(linhas)]
+
+def existem_mensagens_anteriores(session_id, antes_de):
+    """Indica se existem mensagens anteriores ao ID informado."""
+    if antes_de is None:
+        return False
+    linha = conexao().execute(
+        "SELECT 1 FROM mensagens WHERE session_id = ? AND id < ? LIMIT 1",
+        (session_id, antes_de)
+    ).fetchone()
+    return linha is not None
+
+def remover_mensagem(mensagem_id):
+    """Remove uma mensagem do histórico (por exemplo, uma pergunta que não pôde ser respondida)."""
+    conn = conexao()
+    with conn:
+        conn.execute("DELETE FROM mensagens WHERE id = ?", (mensagem_id,))
+
+def limpar_mensagens(session_id):
+    """Remove todas as mensagens de uma conversa."""
+    conn = conexao()
+    with conn:
+        conn.execute("DELETE FROM mensagens WHERE session_id = ?", (session_id,))
+
+def salvar_documento(session_id, documento_info):
+    """
+    Salva um documento processado e o associa à conversa.
+
+    O conteúdo é armazenado uma única vez por hash, mesmo que usado por várias sessões.
+
+    Args:
+        session_id: ID da sessão
+        documento_info: Dicionário com 'tipo', 'url', 'titulo' e 'conteudo'
+
+    Returns:
+        Dicionário de referência ao documento (sem o conteúdo), com a chave 'documento_hash'
+    """
+    conteudo = documento_info.get('conteudo', '')
+    documento_hash = hash_texto(conteudo)
+    conn = conexao()
+    with conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO documentos (hash, tipo, url, titulo, conteudo, criado_em) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (documento_hash, documento_info.get('tipo', ''), documento_info.get('url', ''),
+             documento_info.get('titulo', ''), conteudo, datetime.now().isoformat())
+        )
+        conn.execute(
+            "UPDATE conversas SET documento_hash = ? WHERE session_id = ?",
+            (documento_hash, session_id)
+        )
+    document_store.adicionar(conteudo, referenciar=False)
+    return referencia_documento(documento_info, documento_hash)
+
+def limpar_documento(session_id):
+    """Remove a associação entre a conversa e o seu documento (o conteúdo continua salvo por hash)."""
+    conn = conexao()
+    with conn:
+        conn.execute("UPDATE conversas SET documento_hash = NULL WHERE session_id = ?", (session_id,))
+
+def referencia_documento(documento_info, documento_hash):
+    """Monta o dicionário de referência a um documento, sem o conteúdo."""
+    referencia = {chave: valor for chave, valor in documento_info.items() if chave != 'conteudo'}
+    referencia['documento_hash'] = documento_hash
+    return referencia
+
+def carregar_referencia_documento(session_id):
+    """
+    Carrega a referência ao documento associado a uma conversa (sem o conteúdo).
+
+    Args:
+        session_id: ID da sessão
+
+    Returns:
+        Dicionário com 'tipo', 'url', 'titulo' e 'documento_hash' ou None
+    """
+    linha = conexao().execute(
+        "SELECT d.hash, d.tipo, d.url, d.titulo FROM conversas c "
+        "JOIN documentos d ON d.hash = c.documento_hash WHERE c.session_id = ?",
+        (session_id,)
+    ).fetchone()
+    if linha is None:
+        return None
+    return {
+        'tipo': linha['tipo'],
+        'url': linha['url'],
+        'titulo': linha['titulo'],
+        'documento_hash': linha['hash']
+    }
+
+def carregar_conteudo(documento_hash):
+    """
+    Carrega o conteúdo de um documento salvo.
+
+    O conteúdo é procurado primeiro no document_store (comprimido em memória e
+    compartilhado entre sessões) e só então no banco.
+
+    Args:
+        documento_hash: Hash do conteúdo do documento
+
+    Returns:
+        String com o conteúdo ou string vazia se o documento não existir
+    """
+    conteudo = document_store.obter(documento_hash)
+    if conteudo is not None:
+        return conteudo
+
+    linha = conexao().execute(
+        "SELECT conteudo FROM documentos WHERE hash = ?", (documento_hash,)
+    ).fetchone()
+    if linha is None:
+        return ""
+    document_store.adicionar(linha['conteudo'], referenciar=False)
+    return linha['conteudo']
+
+def referenciar_blob(blob_hash, session_id):
+    """Registra que a sessão usa o arquivo guardado com o hash informado (ver core.blob_store)."""
+    conn = conexao()
+    with conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO blob_referencias (hash, session_id) VALUES (?, ?)",
+            (blob_hash, session_id)
+        )
+
+def liberar_blobs(session_id, remover, manter=()):
+    """
+    Remove as referências de uma sessão aos arquivos guardados.
+
+    Os arquivos que ficam sem referências são removidos ainda dentro da transação
+    (que bloqueia a escrita no banco), para que nenhuma sessão passe a referenciar
+    um arquivo enquanto ele é apagado.
+
+    Args:
+        session_id: ID da sessão
+        remover: Função chamada com o hash de cada arquivo sem referências
+        manter: Hashes cujas referências devem ser mantidas
+
+    Returns:
+        Lista com os hashes dos arquivos removidos
+    """
+    conn = conexao()
+    manter = set(manter)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        liberadas = [
+            (linha['hash'], session_id) for linha in
+            conn.execute("SELECT hash FROM blob_referencias WHERE session_id = ?", (session_id,))
+            if linha['hash'] not in manter
+        ]
+        return _remove_referencias(conn, liberadas, remover)
+
+def expirar_blobs(antes_de, remover):
+    """
+    Remove as referências aos arquivos guardados das sessões sem atividade recente.
+
+    São consideradas inativas as sessões cuja conversa foi atualizada pela última vez
+    antes do limite, ou que não têm mais conversa. Como em liberar_blobs, os arquivos
+    sem referências são removidos dentro da transação.
+
+    Args:
+        antes_de: Data/hora limite em formato ISO
+        remover: Função chamada com o hash de cada arquivo sem referências
+
+    Returns:
+        Lista com os hashes dos arquivos removidos
+    """
+    conn = conexao()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        liberadas = [
+            (linha['hash'], linha['session_id']) for linha in conn.execute(
+                """
+                SELECT r.hash, r.session_id FROM blob_referencias r
+                LEFT JOIN conversas c ON c.session_id = r.session_id
+                WHERE c.session_id IS NULL OR c.atualizada_em < ?
+                """,
+                (antes_de,)
+            )
+        ]
+        return _remove_referencias(conn, liberadas, remover)
+
+def _remove_referencias(conn, referencias, remover):
+    """Apaga as referências (hash, session_id) e remove os arquivos que ficaram sem nenhuma."""
+    conn.executemany("DELETE FROM blob_referencias WHERE hash = ? AND session_id = ?", referencias)
+    removidos = [
+        blob_hash for blob_hash in dict.fromkeys(blob_hash for blob_hash, _ in referencias)
+        if conn.execute("SELECT 1 FROM blob_referencias WHERE hash = ? LIMIT 1", (blob_hash,)).fetchone() is None
+    ]
+    for blob_hash in removidos:
+        remover(blob_hash)
+    return removidos
+
+def salvar_artefato(documento_hash, tipo, conteudo):
+    """
+    Salva um material de estudo (resumo, glossário, etc.) gerado para um documento.
+
+    Args:
+        documento_hash: Hash do conteúdo do documento
+        tipo: Tipo do material (chave de core.artifacts.ARTEFATOS)
+        conteudo: Texto gerado
+    """
+    conn = conexao()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO artefatos (documento_hash, tipo, conteudo, criado_em) VALUES (?, ?, ?, ?)",
+            (documento_hash, tipo, conteudo, datetime.now().isoformat())
+        )
+
+def carregar_artefatos(documento_hash):
+    """
+    Carrega os materiais de estudo já gerados para um documento.
+
+    Args:
+        documento_hash: Hash do conteúdo do documento
+
+    Returns:
+        Dicionário {tipo: conteúdo} (vazio se nenhum material foi gerado)
+    """
+    linhas = conexao().execute(
+        "SELECT tipo, conteudo FROM artefatos WHERE documento_hash = ?", (documento_hash,)
+    ).fetchall()
+    return {linha['tipo']: linha['conteudo'] for linha in linhas}
+
+def obter_conteudo(documento_info):
+    """
+    Retorna o conteúdo de um documento, carregando-o do banco apenas quando necessário.
+
+    Args:
+        documento_info: Dicionário do documento (com 'conteudo' ou 'documento_hash') ou string
+
+    Returns:
+        String com o conteúdo do documento
+    """
+    if not documento_info:
+        return ""
+    if isinstance(documento_info, str):
+        return documento_info
+    if 'conteudo' in documento_info:
+        return documento_info.get('conteudo', '')
+    if documento_info.get('documento_hash'):
+        return carregar_conteudo(documento_info['documento_hash'])
+    return ""
@@ -0,0 +1,130 @@
+"""
+Módulo de contagem de tokens e distribuição do orçamento da janela de contexto.
+Estima o tamanho do prompt do sistema, do histórico e do documento antes de cada
+chamada, evitando requisições que falhariam por exceder o limite do modelo.
+"""
+
+import math
+import re
+from config.settings import (
+    MODEL, MAX_TOKENS, CONTEXT_WINDOW, CONTEXT_TOKEN_BUDGET, HISTORY_TOKEN_BUDGET,
+    CONTEXT_SAFETY_MARGIN, USE_API_TOKEN_COUNT
+)
+
+_PADRAO_TOKEN = re.compile(r'\w+|[^\w\s]', re.UNICODE)
+
+def contar_tokens(texto):
+    """
+    Estima localmente o número de tokens de um texto.
+
+    Cada pontuação conta como um token e cada palavra como um token a cada ~4
+    caracteres, aproximação próxima à do tokenizador do Claude para português e inglês.
+
+    Args:
+        texto: Texto a ser medido
+
+    Returns:
+        Número estimado de tokens
+    """
+    if not texto:
+        return 0
+    return sum(math.ceil(len(parte) / 4) for parte in _PADRAO_TOKEN.findall(texto))
+
+def contar_tokens_mensagens(messages):
+    """Estima os tokens de uma lista de mensagens, incluindo um pequeno custo por mensagem."""
+    total = 0
+    for mensagem in messages:
+        conteudo = mensagem['content']
+        total += 4 + (contar_tokens(conteudo) if isinstance(conteudo, str) else contar_tokens(str(conteudo)))
+    return total
+
+def contar_tokens_api(system, messages):
+    """
+    Conta os tokens de entrada exatos usando o endpoint de contagem da Anthropic.
+
+    Args:
+        system: Prompt do sistema
+        messages: Lista de mensagens no formato da API
+
+    Returns:
+        Número de tokens de entrada
+    """
+    from core.clients import get_client
+    from core.rate_limit import admite
+    # A contagem não consome tokens, mas conta como requisição nos limites globais
+    admite(None, 0)
+    resultado = get_client().messages.count_tokens(model=MODEL, system=system, messages=messages)
+    return resultado.input_tokens
+
+def limite_entrada():
+    """Número máximo de tokens de entrada, reservando espaço para a resposta e uma margem."""
+    return CONTEXT_WINDOW - MAX_TOKENS - CONTEXT_SAFETY_MARGIN
+
+def ajusta_historico(messages, orcamento=HISTORY_TOKEN_BUDGET):
+    """
+    Mantém as mensagens mais recentes que cabem no orçamento do histórico.
+
+    A última mensagem (a pergunta atual) é sempre mantida, e o histórico resultante
+    sempre começa com uma mensagem do usuário, como exige a API.
+
+    Args:
+        messages: Lista de mensagens no formato da API, da mais antiga para a mais recente
+        orcamento: Número máximo de tokens do histórico
+
+    Returns:
+        Tupla (mensagens mantidas, tokens estimados das mensagens mantidas)
+    """
+    mantidas = []
+    usados = 0
+    for mensagem in reversed(messages):
+        custo = contar_tokens_mensagens([mensagem])
+        if mantidas and usados + custo > orcamento:
+            break
+        mantidas.append(mensagem)
+        usados += custo
+    mantidas.reverse()
+
+    while len(mantidas) > 1 and mantidas[0]['role'] != 'user':
+        usados -= contar_tokens_mensagens([mantidas.pop(0)])
+    return mantidas, usados
+
+def orcamento_documento(tokens_sistema, tokens_historico):
+    """
+    Calcula quantos tokens o documento pode ocupar, dado o restante do prompt.
+
+    Args:
+        tokens_sistema: Tokens do prompt do sistema sem o documento
+        tokens_historico: Tokens das mensagens do histórico
+
+    Returns:
+        Número de tokens disponíveis para o documento (limitado a CONTEXT_TOKEN_BUDGET)
+    """
+    disponivel = limite_entrada() - tokens_sistema - tokens_historico
+    return max(0, min(CONTEXT_TOKEN_BUDGET, disponivel))
+
+def relatorio_uso(tokens_sistema, tokens_documento, tokens_historico, tokens_api=None):
+    """
+    Monta o relatório de uso de tokens por componente do prompt.
+
+    Args:
+        tokens_sistema: Tokens das instruções do prompt do sistema
+        tokens_documento: Tokens do documento incluído no prompt
+        tokens_historico: Tokens das mensagens
+        tokens_api: Contagem exata da API, se disponível
+
+    Returns:
+        Dicionário com os tokens de cada componente, o total e o limite de entrada
+    """
+    return {
+        'sistema': tokens_sistema,
+        'documento': tokens_documento,
+        'historico': tokens_historico,
+        'total_estimado': tokens_sistema + tokens_documento + tokens_historico,
+        'total_api': tokens_api,
+        'limite_entrada': limite_entrada(),
+        'resposta_max': MAX_TOKENS
+    }
+
+def contagem_api_habilitada():
+    """Indica se a contagem exata de tokens pela API está habilitada."""
+    return USE_API_TOKEN_COUNT
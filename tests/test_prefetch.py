@@ -0,0 +1,44 @@
+"""
+Teste de fumaça do carregamento de fontes por URL (core.prefetch.obtem_fonte).
+O carregador de sites é substituído por uma função local, sem acesso à rede.
+"""
+
+import os
+import tempfile
+
+os.environ.setdefault('TARS_DATA_DIR', tempfile.mkdtemp(prefix='tars_testes_'))
+os.environ.setdefault('TARS_CACHE_BACKEND', 'memoria')
+
+from core import prefetch
+from utils.loaders import registry
+
+chamadas = []
+
+def carrega_site_falso(url):
+    chamadas.append(url)
+    return {'tipo': 'Site', 'url': url, 'titulo': 'Exemplo', 'conteudo': 'Conteúdo de exemplo.'}
+
+def test_obtem_fonte_carrega_url(monkeypatch):
+    monkeypatch.setitem(registry.CARREGADORES, 'site', {
+        'modulo': __name__, 'funcao': 'carrega_site_falso', 'extensoes': ()
+    })
+    monkeypatch.setattr(prefetch, '_aquece_indice', lambda documento_info: None)
+
+    documento_info = prefetch.obtem_fonte('site', ' https://exemplo.com.br/pagina ')
+
+    assert chamadas == ['https://exemplo.com.br/pagina']
+    assert documento_info['conteudo'] == 'Conteúdo de exemplo.'
+    assert 'erro' not in documento_info
+
+def test_obtem_fonte_revalidar_ignora_cache(monkeypatch):
+    monkeypatch.setitem(registry.CARREGADORES, 'site', {
+        'modulo': __name__, 'funcao': 'carrega_site_falso', 'extensoes': ()
+    })
+    monkeypatch.setattr(prefetch, '_aquece_indice', lambda documento_info: None)
+    chamadas.clear()
+
+    prefetch.obtem_fonte('site', 'https://exemplo.com.br/outra')
+    prefetch.obtem_fonte('site', 'https://exemplo.com.br/outra')
+    prefetch.obtem_fonte('site', 'https://exemplo.com.br/outra', revalidar=True)
+
+    assert chamadas == ['https://exemplo.com.br/outra'] * 2
@@ -189,6 +189,43 @@ def timestamp_display():
         unsafe_allow_html=True
     )
 
+def token_usage_panel(uso):
+    """
+    Exibe na barra lateral o uso de tokens da última pergunta, por componente do prompt.
+    
+    Args:
+        uso: Relatório de uso gerado por core.tokens.relatorio_uso
+    """
+    total = uso.get('entrada_real') or uso.get('total_api') or uso['total_estimado']
+    linhas = [
+        f"Sistema: {uso['sistema']:,}",
+        f"Documento: {uso['documento']:,}",
+        f"Histórico: {uso['historico']:,}",
+        f"Entrada: {total:,} de {uso['limite_entrada']:,}"
+    ]
+    if uso.get('resposta') is not None:
+        linhas.append(f"Resposta: {uso['resposta']:,}")
+    
+    with st.sidebar.expander("Uso de tokens da última pergunta"):
+        st.markdown("<br>".join(linhas).replace(",", "."), unsafe_allow_html=True)
+
+def queue_notice(container):
+    """
+    Cria o callback que informa ao usuário que a pergunta aguarda na fila.
+    
+    Args:
+        container: Espaço do Streamlit (st.empty) onde o aviso é exibido
+        
+    Returns:
+        Função que recebe (posição na fila, segundos estimados)
+    """
+    def exibe(posicao, segundos):
+        container.info(
+            f"⏳ Muitas perguntas sendo processadas agora. A sua está na fila "
+            f"(posição {posicao}, cerca de {max(segundos, 1)} s)."
+        )
+    return exibe
+
 def footer():
     """Renderiza o rodapé da aplicação."""
     st.markdown(
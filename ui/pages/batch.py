@@ -0,0 +1,111 @@
+"""
+Módulo que implementa a interface de perguntas em lote.
+Permite enviar uma lista de perguntas sobre a fonte carregada e exportar as respostas em CSV.
+"""
+
+import streamlit as st
+
+def _exibe_download(resultados):
+    """Exibe o resumo e o botão de download dos resultados de um lote."""
+    from core.batch import exporta_csv
+
+    respondidas = sum(1 for resultado in resultados if resultado['status'] == 'ok')
+    st.sidebar.markdown(
+        f"""
+        <div class="success-message">
+            <span>✅ {respondidas} de {len(resultados)} pergunta(s) respondida(s).</span>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+    st.sidebar.download_button(
+        "Baixar respostas (CSV)",
+        data=exporta_csv(resultados),
+        file_name="respostas_tars.csv",
+        mime="text/csv",
+        use_container_width=True
+    )
+
+def render_batch_panel():
+    """
+    Renderiza o painel de perguntas em lote sobre a fonte carregada.
+    """
+    if not st.session_state.documento:
+        return
+
+    with st.sidebar.expander("Perguntas em lote"):
+        texto = st.text_area(
+            "Perguntas (uma por linha):",
+            help="Cada linha é respondida separadamente com base na fonte carregada."
+        )
+        arquivo_csv = st.file_uploader(
+            "Ou envie um CSV:",
+            type=["csv"],
+            help="Usa a coluna 'pergunta' ou, se não existir, a primeira coluna."
+        )
+        usar_batches = st.checkbox(
+            "Usar Message Batches API",
+            value=True,
+            help="Processamento assíncrono e mais barato. Desmarque para respostas imediatas em paralelo."
+        )
+        enviar = st.button("Responder perguntas", use_container_width=True)
+
+    lote = st.session_state.get('lote')
+
+    if enviar:
+        from core.batch import le_perguntas, envia_lote, executa_paralelo
+
+        perguntas = le_perguntas(texto, arquivo_csv)
+        if not perguntas:
+            st.sidebar.error("Informe pelo menos uma pergunta.")
+            return
+
+        if usar_batches:
+            try:
+                lote = {
+                    'id': envia_lote(perguntas, st.session_state.documento, sessao=st.session_state.session_id),
+                    'perguntas': perguntas
+                }
+                st.session_state.lote = lote
+            except Exception as e:
+                st.sidebar.error(f"Não foi possível enviar o lote: {str(e)}")
+                return
+        else:
+            progresso = st.sidebar.progress(0.0, text="Respondendo perguntas...")
+            resultados = executa_paralelo(
+                perguntas,
+                st.session_state.documento,
+                on_progress=lambda feitas, total: progresso.progress(
+                    feitas / total, text=f"{feitas} de {total} pergunta(s) respondida(s)..."
+                ),
+                sessao=st.session_state.session_id
+            )
+            st.session_state.lote = {'id': None, 'perguntas': perguntas, 'resultados': resultados}
+            lote = st.session_state.lote
+
+    if not lote:
+        return
+
+    if lote.get('resultados'):
+        _exibe_download(lote['resultados'])
+        return
+
+    # Lote assíncrono em processamento: consulta o andamento a cada execução do script
+    from core.batch import consulta_lote, resultados_lote
+    try:
+        andamento = consulta_lote(lote['id'], sessao=st.session_state.session_id)
+    except Exception as e:
+        st.sidebar.error(f"Não foi possível consultar o lote: {str(e)}")
+        return
+
+    if andamento['concluido']:
+        lote['resultados'] = resultados_lote(lote['id'], lote['perguntas'], sessao=st.session_state.session_id)
+        _exibe_download(lote['resultados'])
+    else:
+        total = andamento['total'] or len(lote['perguntas'])
+        st.sidebar.progress(
+            andamento['processadas'] / total,
+            text=f"Lote em processamento: {andamento['processadas']} de {total} pergunta(s)."
+        )
+        if st.sidebar.button("Atualizar andamento", use_container_width=True):
+            st.rerun()
@@ -4,11 +4,81 @@ Contém componentes para upload de PDFs, carregamento de sites, etc.
 """
 
 import streamlit as st
-import os
-from utils.loaders.web_loader import carrega_site
-from utils.loaders.youtube_loader import carrega_youtube
-from utils.loaders.pdf_loader import carrega_pdf
-from utils.loaders.image_loader import carrega_imagem
+from config.settings import CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES, WARM_SOURCES
+from core.blob_store import guarda_uploads
+from core.dedup import mensagem_deduplicacao
+from core.prefetch import agenda_prefetch, obtem_fonte, aquece_fontes
+from core.session import set_document
+from utils.loaders.document import tem_erro
+from utils.loaders.registry import carrega
+
+# O registro importa o módulo de cada carregador apenas no primeiro uso, para que
+# as dependências de um tipo de fonte não atrasem a inicialização da aplicação.
+
+def indexa_documento(documento_info):
+    """
+    Atualiza o índice de chunks da sessão com o documento carregado.
+    
+    Se a fonte já estiver indexada (recarregamento), apenas os chunks que mudaram
+    são reindexados. Caso contrário, o índice é substituído pela nova fonte.
+    
+    Args:
+        documento_info: Dicionário retornado por um dos carregadores
+        
+    Returns:
+        Dicionário com a quantidade de chunks mantidos, adicionados e removidos
+    """
+    indice = st.session_state.indice
+    if tem_erro(documento_info):
+        indice.limpar()
+        return {'mantidos': 0, 'adicionados': 0, 'removidos': 0, 'duplicados': 0}
+    
+    fonte = documento_info.get('url') or documento_info.get('titulo', '')
+    indice.manter_fontes([fonte])
+    return indice.atualizar_fonte(fonte, documento_info.get('conteudo', ''))
+
+@st.cache_resource(show_spinner=False)
+def aquece_fontes_iniciais():
+    """
+    Carrega em segundo plano, uma única vez por processo, as fontes da lista WARM_SOURCES.
+    """
+    aquece_fontes(WARM_SOURCES)
+    return True
+
+def prefetch_fonte(painel, tipo, url, **opcoes):
+    """
+    Inicia o carregamento antecipado da fonte quando a URL (ou as opções) do painel muda.
+    
+    Args:
+        painel: Nome do painel, usado para cancelar o prefetch anterior do mesmo campo
+        tipo: Tipo de fonte (ver core.prefetch.CARREGADORES)
+        url: URL informada
+        opcoes: Argumentos adicionais do carregador
+    """
+    chave = f"prefetch_{painel}"
+    assinatura = (tipo, url, tuple(sorted(opcoes.items())))
+    if url and st.session_state.get(chave) != assinatura:
+        st.session_state[chave] = assinatura
+        agenda_prefetch(f"{st.session_state.session_id}:{painel}", tipo, url, **opcoes)
+
+def mensagem_atualizacao(estatisticas):
+    """
+    Formata o resumo de uma atualização incremental do índice.
+    
+    Args:
+        estatisticas: Dicionário retornado por ChunkIndex.atualizar_fonte
+        
+    Returns:
+        String descrevendo o que mudou ou None se for o primeiro carregamento
+    """
+    if not estatisticas['mantidos'] and not estatisticas['removidos']:
+        return None
+    if not estatisticas['adicionados'] and not estatisticas['removidos']:
+        return "Conteúdo não modificado desde o último carregamento."
+    return (
+        f"{estatisticas['adicionados']} trecho(s) novo(s), "
+        f"{estatisticas['removidos']} removido(s), {estatisticas['mantidos']} reaproveitado(s)."
+    )
 
 def render_site_panel():
     """
@@ -29,6 +99,25 @@ def render_site_panel():
         help="Digite o endereço do site que você deseja analisar."
     )
     
+    modo_rastreamento = st.sidebar.checkbox(
+        "Rastrear páginas vinculadas",
+        help="Carrega também as páginas do mesmo domínio ligadas a partir da URL informada."
+    )
+    
+    if modo_rastreamento:
+        max_profundidade = st.sidebar.number_input(
+            "Profundidade máxima:", min_value=1, max_value=5, value=CRAWL_MAX_DEPTH,
+            help="Quantos níveis de links seguir a partir da página inicial."
+        )
+        max_paginas = st.sidebar.number_input(
+            "Máximo de páginas:", min_value=1, max_value=200, value=CRAWL_MAX_PAGES,
+            help="Número máximo de páginas carregadas no rastreamento."
+        )
+        opcoes_rastreamento = {'max_profundidade': int(max_profundidade), 'max_paginas': int(max_paginas)}
+        prefetch_fonte("site", "site_completo", url_site, **opcoes_rastreamento)
+    else:
+        prefetch_fonte("site", "site", url_site)
+    
     if st.sidebar.button("Carregar Site", type="primary", use_container_width=True):
         if not url_site or url_site.isspace():
             st.sidebar.error("Por favor, informe uma URL válida.")
@@ -46,24 +135,65 @@ def render_site_panel():
         )
         
         # Carrega o site
-        st.session_state.documento = carrega_site(url_site)
+        estatisticas = {'mantidos': 0, 'adicionados': 0, 'removidos': 0, 'duplicados': 0}
+        if modo_rastreamento:
+            paginas_carregadas = []
+            
+            def on_page(pagina, total):
+                # Indexa cada página assim que ela chega (só os trechos alterados) e atualiza o progresso
+                paginas_carregadas.append(pagina['url'])
+                resultado = st.session_state.indice.atualizar_fonte(
+                    pagina['url'], pagina['texto'], {'titulo': pagina['titulo']}
+                )
+                for chave in estatisticas:
+                    estatisticas[chave] += resultado[chave]
+                status_placeholder.markdown(
+                    f"""
+                    <div class="info-message">
+                        <span>⏳ {total} página(s) carregada(s)...</span>
+                    </div>
+                    """, 
+                    unsafe_allow_html=True
+                )
+            
+            # Clique explícito: as páginas são sempre revalidadas (GET condicional), sem o cache de fontes
+            documento_info = obtem_fonte(
+                "site_completo", url_site, revalidar=True, on_page=on_page, **opcoes_rastreamento
+            )
+            if tem_erro(documento_info):
+                st.session_state.indice.limpar()
+            elif paginas_carregadas:
+                # Remove do índice páginas de rastreamentos anteriores que não existem mais
+                st.session_state.indice.manter_fontes(paginas_carregadas)
+            else:
+                # Rastreamento antecipado ainda em andamento reaproveitado: indexa o conteúdo reunido
+                estatisticas = indexa_documento(documento_info)
+        else:
+            # Clique explícito: a página é sempre revalidada (GET condicional), sem o cache de fontes
+            documento_info = obtem_fonte("site", url_site, revalidar=True)
+            estatisticas = indexa_documento(documento_info)
+        set_document(documento_info)
         st.session_state.fonte_dados = "Site"
         
         # Verifica se houve erro e atualiza o status
-        if st.session_state.documento.get('tipo', '').endswith('(erro)'):
+        if tem_erro(documento_info):
             status_placeholder.markdown(
                 f"""
                 <div class="error-message">
-                    <span>❌ {st.session_state.documento.get('conteudo', 'Erro ao carregar o site.')}</span>
+                    <span>❌ {documento_info.get('conteudo', 'Erro ao carregar o site.')}</span>
                 </div>
                 """, 
                 unsafe_allow_html=True
             )
         else:
+            detalhes = " ".join(filter(None, [
+                mensagem_atualizacao(estatisticas),
+                mensagem_deduplicacao(documento_info.get('deduplicacao'))
+            ]))
             status_placeholder.markdown(
-                """
+                f"""
                 <div class="success-message">
-                    <span>✅ Site carregado com sucesso!</span>
+                    <span>✅ Site carregado com sucesso! {detalhes}</span>
                 </div>
                 """, 
                 unsafe_allow_html=True
@@ -71,7 +201,7 @@ def render_site_panel():
 
 def render_youtube_panel():
     """
-    Renderiza o painel para entrada e carregamento de vídeos do YouTube.
+    Renderiza o painel para entrada e carregamento de vídeos, playlists e canais do YouTube.
     """
     st.sidebar.markdown(
         """
@@ -83,11 +213,15 @@ def render_youtube_panel():
     )
     
     url_youtube = st.sidebar.text_input(
-        "URL do vídeo:",
+        "URL do vídeo ou playlist:",
         placeholder="https://www.youtube.com/watch?v=...",
-        help="Cole aqui o link completo do vídeo do YouTube."
+        help="Cole aqui o link de um vídeo, de uma playlist (/playlist?list=...) ou de um canal do YouTube."
     )
     
+    from utils.loaders.youtube_playlist import eh_playlist
+    playlist = eh_playlist(url_youtube or "")
+    prefetch_fonte("youtube", "playlist" if playlist else "youtube", url_youtube)
+    
     if st.sidebar.button("Carregar Vídeo", type="primary", use_container_width=True):
         if not url_youtube or url_youtube.isspace():
             st.sidebar.error("Por favor, informe uma URL válida.")
@@ -96,33 +230,63 @@ def render_youtube_panel():
         # Mostra mensagem de carregamento na sidebar
         status_placeholder = st.sidebar.empty()
         status_placeholder.markdown(
-            """
+            f"""
             <div class="info-message">
-                <span>⏳ Carregando transcrição do vídeo...</span>
+                <span>⏳ Carregando {"transcrições da playlist" if playlist else "transcrição do vídeo"}...</span>
             </div>
             """, 
             unsafe_allow_html=True
         )
         
-        # Carrega o vídeo
-        st.session_state.documento = carrega_youtube(url_youtube)
+        # Carrega o vídeo ou a playlist
+        if playlist:
+            videos_carregados = []
+            
+            def on_chunk(chunk):
+                # Indexa cada vídeo como uma fonte própria, assim que sua transcrição chega
+                video = chunk.metadados
+                videos_carregados.append(video['url'])
+                st.session_state.indice.atualizar_fonte(
+                    video['url'], chunk.texto, {'titulo': video['titulo'], 'video': video['posicao']}
+                )
+                status_placeholder.markdown(
+                    f"""
+                    <div class="info-message">
+                        <span>⏳ {len(videos_carregados)} vídeo(s) carregado(s)...</span>
+                    </div>
+                    """, 
+                    unsafe_allow_html=True
+                )
+            
+            documento_info = obtem_fonte("playlist", url_youtube, on_chunk=on_chunk)
+            if tem_erro(documento_info):
+                st.session_state.indice.limpar()
+            elif videos_carregados:
+                st.session_state.indice.manter_fontes(videos_carregados)
+            else:
+                # Playlist já carregada antecipadamente: indexa o conteúdo reunido
+                indexa_documento(documento_info)
+        else:
+            documento_info = obtem_fonte("youtube", url_youtube)
+            indexa_documento(documento_info)
+        set_document(documento_info)
         st.session_state.fonte_dados = "YouTube"
         
         # Verifica se houve erro e atualiza o status
-        if st.session_state.documento.get('tipo', '').endswith('(erro)'):
+        if tem_erro(documento_info):
             status_placeholder.markdown(
                 f"""
                 <div class="error-message">
-                    <span>❌ {st.session_state.documento.get('conteudo', 'Erro ao carregar o vídeo.')}</span>
+                    <span>❌ {documento_info.get('conteudo', 'Erro ao carregar o vídeo.')}</span>
                 </div>
                 """, 
                 unsafe_allow_html=True
             )
         else:
             status_placeholder.markdown(
-                """
+                f"""
                 <div class="success-message">
-                    <span>✅ Vídeo carregado com sucesso!</span>
+                    <span>✅ {"Playlist carregada" if playlist else "Vídeo carregado"} com sucesso!</span>
                 </div>
                 """, 
                 unsafe_allow_html=True
@@ -164,21 +328,29 @@ def render_pdf_panel():
             unsafe_allow_html=True
         )
         
-        # Salva os arquivos enviados no diretório temporário
-        pdf_paths = []
-        for uploaded_file in uploaded_files:
-            file_path = os.path.join(st.session_state.temp_dir, uploaded_file.name)
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            pdf_paths.append(file_path)
+        paginas_extraidas = []
         
-        # Processa os PDFs
-        documento_info = carrega_pdf(pdf_paths)
-        st.session_state.documento = documento_info
+        def on_chunk(chunk):
+            paginas_extraidas.append(chunk.metadados)
+            status_placeholder.markdown(
+                f"""
+                <div class="info-message">
+                    <span>⏳ {len(paginas_extraidas)} página(s) extraída(s) de {chunk.metadados['arquivo']}...</span>
+                </div>
+                """, 
+                unsafe_allow_html=True
+            )
+        
+        # Guarda os PDFs uma única vez pelo hash (o texto de arquivos já processados,
+        # inclusive por outras sessões, é reaproveitado)
+        arquivos = guarda_uploads(uploaded_files, st.session_state.session_id)
+        documento_info = carrega(arquivos, 'pdf', on_chunk=on_chunk)
+        estatisticas = indexa_documento(documento_info)
+        set_document(documento_info)
         st.session_state.fonte_dados = "PDF"
         
         # Verifica se houve erro e atualiza o status
-        if documento_info.get('tipo', '').endswith('(erro)'):
+        if tem_erro(documento_info):
             status_placeholder.markdown(
                 f"""
                 <div class="error-message">
@@ -188,10 +360,14 @@ def render_pdf_panel():
                 unsafe_allow_html=True
             )
         else:
+            detalhes = " ".join(filter(None, [
+                mensagem_atualizacao(estatisticas),
+                mensagem_deduplicacao(documento_info.get('deduplicacao'))
+            ]))
             status_placeholder.markdown(
-                """
+                f"""
                 <div class="success-message">
-                    <span>✅ PDFs processados com sucesso!</span>
+                    <span>✅ PDFs processados com sucesso! {detalhes}</span>
                 </div>
                 """, 
                 unsafe_allow_html=True
@@ -212,7 +388,7 @@ def render_image_panel():
     
     uploaded_image = st.sidebar.file_uploader(
         "Selecione uma imagem:",
-        type=["jpg", "jpeg", "png", "webp"],
+        type=["jpg", "jpeg", "png", "webp", "gif", "tif", "tiff"],
         help="Arraste e solte uma imagem ou clique para selecioná-la."
     )
     
@@ -232,16 +408,19 @@ def render_image_panel():
             unsafe_allow_html=True
         )
         
-        # Processa a imagem
-        st.session_state.documento = carrega_imagem(uploaded_image)
+        # Guarda e processa a imagem (a análise de uma imagem já enviada é reaproveitada)
+        imagem, = guarda_uploads([uploaded_image], st.session_state.session_id)
+        documento_info = carrega(imagem, 'imagem', sessao=st.session_state.session_id)
+        indexa_documento(documento_info)
+        set_document(documento_info)
         st.session_state.fonte_dados = "Imagem"
         
         # Verifica se houve erro e atualiza o status
-        if st.session_state.documento.get('tipo', '').endswith('(erro)'):
+        if tem_erro(documento_info):
             status_placeholder.markdown(
                 f"""
                 <div class="error-message">
-                    <span>❌ {st.session_state.documento.get('conteudo', 'Erro ao analisar a imagem.')}</span>
+                    <span>❌ {documento_info.get('conteudo', 'Erro ao analisar a imagem.')}</span>
                 </div>
                 """, 
                 unsafe_allow_html=True
@@ -273,12 +452,13 @@ def render_chat_panel():
     )
     
     if st.sidebar.button("Iniciar Chat Livre", type="primary", use_container_width=True):
-        st.session_state.documento = {
+        set_document({
             'tipo': 'Chat Livre',
             'url': '',
             'titulo': 'Conversa sem contexto adicional',
             'conteudo': ''
-        }
+        })
+        st.session_state.indice.limpar()
         st.session_state.fonte_dados = "Chat"
         st.sidebar.markdown(
             """
@@ -0,0 +1,42 @@
+"""
+Módulo que implementa o painel de material de estudo da fonte carregada.
+Exibe o resumo, o roteiro, o glossário e o questionário gerados para o documento.
+"""
+
+import streamlit as st
+from core.artifacts import ARTEFATOS, agenda_artefatos, artefatos_documento, em_processamento
+
+def render_study_panel():
+    """
+    Renderiza o painel com o material de estudo do documento atual.
+    """
+    documento = st.session_state.documento
+    if not isinstance(documento, dict) or not documento.get('documento_hash'):
+        return
+
+    artefatos = artefatos_documento(documento)
+    with st.sidebar.expander("Material de estudo"):
+        if artefatos:
+            tipo = st.selectbox(
+                "Material:",
+                list(artefatos),
+                format_func=lambda chave: ARTEFATOS[chave]['titulo']
+            )
+            st.markdown(artefatos[tipo])
+            st.download_button(
+                "Baixar (Markdown)",
+                data=artefatos[tipo].encode('utf-8'),
+                file_name=f"{tipo}_tars.md",
+                mime="text/markdown",
+                use_container_width=True
+            )
+
+        if em_processamento(documento):
+            st.caption("⏳ Gerando o material de estudo em segundo plano...")
+            if st.button("Atualizar", use_container_width=True):
+                st.rerun()
+        elif len(artefatos) < len(ARTEFATOS):
+            st.caption("Resumo, roteiro, glossário e questionário do conteúdo, prontos para consulta.")
+            if st.button("Gerar material de estudo", use_container_width=True):
+                agenda_artefatos(documento, forcar=True)
+                st.rerun()
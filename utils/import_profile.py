@@ -0,0 +1,83 @@
+"""
+Relatório de tempo de importação dos módulos da aplicação.
+
+Executa um interpretador separado com 'python -X importtime', importando os módulos
+carregados na inicialização do app.py, e lista os pacotes mais lentos.
+
+Uso:
+    python -m utils.import_profile [módulo ...] [--top N]
+"""
+
+import os
+import subprocess
+import sys
+
+# Módulos importados pelo app.py na inicialização
+MODULOS_INICIALIZACAO = [
+    'streamlit',
+    'config.settings',
+    'core.session',
+    'core.llm',
+    'ui.components',
+    'ui.pages.sources',
+]
+
+def mede_importacoes(modulos):
+    """
+    Mede o tempo de importação dos módulos em um processo novo.
+
+    Args:
+        modulos: Lista de nomes de módulos a importar
+
+    Returns:
+        Lista de tuplas (pacote, tempo próprio em ms, tempo acumulado em ms)
+    """
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    codigo = '; '.join(f'import {modulo}' for modulo in modulos)
+    resultado = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', codigo],
+        cwd=raiz, capture_output=True, text=True
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr.strip().splitlines()[-1])
+
+    medidas = []
+    for linha in resultado.stderr.splitlines():
+        # Formato: "import time:  self [us] | cumulative | imported package"
+        if not linha.startswith('import time:') or 'imported package' in linha:
+            continue
+        proprio, acumulado, pacote = linha[len('import time:'):].split('|', 2)
+        medidas.append((pacote.rstrip(), int(proprio) / 1000, int(acumulado) / 1000))
+    return medidas
+
+def relatorio(modulos=MODULOS_INICIALIZACAO, top=25):
+    """
+    Monta o relatório de importação com o tempo total e os pacotes mais lentos.
+
+    Args:
+        modulos: Lista de nomes de módulos a importar
+        top: Quantidade de pacotes listados
+
+    Returns:
+        String com o relatório formatado
+    """
+    medidas = mede_importacoes(modulos)
+    total = sum(proprio for _, proprio, _ in medidas)
+
+    linhas = [
+        f"Tempo total de importação: {total:.1f} ms ({len(medidas)} módulos)",
+        "",
+        f"{'acumulado (ms)':>15} {'próprio (ms)':>13}  pacote",
+    ]
+    for pacote, proprio, acumulado in sorted(medidas, key=lambda m: m[2], reverse=True)[:top]:
+        linhas.append(f"{acumulado:>15.1f} {proprio:>13.1f}  {pacote}")
+    return '\n'.join(linhas)
+
+if __name__ == '__main__':
+    argumentos = sys.argv[1:]
+    top = 25
+    if '--top' in argumentos:
+        posicao = argumentos.index('--top')
+        top = int(argumentos[posicao + 1])
+        del argumentos[posicao:posicao + 2]
+    print(relatorio(argumentos or MODULOS_INICIALIZACAO, top))
@@ -0,0 +1,143 @@
+"""
+Módulo com utilitários para leitura de arquivos enviados sem cópias desnecessárias.
+Permite que os carregadores leiam buffers em memória diretamente, calculando o hash
+durante a leitura e gravando em disco apenas arquivos grandes.
+"""
+
+import io
+import os
+import hashlib
+import tempfile
+from config.settings import UPLOAD_SPILL_THRESHOLD
+
+TAMANHO_BLOCO = 1024 * 1024
+
+class LeitorMemoria(io.RawIOBase):
+    """
+    Stream somente leitura sobre um buffer em memória (bytes, memoryview, etc).
+
+    Diferente de io.BytesIO(bytes(buffer)), não copia os dados: as leituras são
+    feitas diretamente a partir de um memoryview do buffer original.
+    """
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._buffer = memoryview(buffer).cast('B')
+        self._posicao = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._posicao
+
+    def seek(self, deslocamento, origem=io.SEEK_SET):
+        if origem == io.SEEK_SET:
+            base = 0
+        elif origem == io.SEEK_CUR:
+            base = self._posicao
+        else:
+            base = len(self._buffer)
+        self._posicao = max(0, base + deslocamento)
+        return self._posicao
+
+    def readinto(self, destino):
+        dados = self._buffer[self._posicao:self._posicao + len(destino)]
+        quantidade = len(dados)
+        destino[:quantidade] = dados
+        self._posicao += quantidade
+        return quantidade
+
+    def close(self):
+        # Libera o memoryview para que o buffer original possa ser modificado/liberado
+        if not self.closed:
+            self._buffer.release()
+        super().close()
+
+def obtem_buffer(arquivo):
+    """
+    Obtém um memoryview do conteúdo de um arquivo em memória, sem copiar os dados.
+
+    Args:
+        arquivo: bytes, bytearray, memoryview ou objeto com getbuffer() (io.BytesIO,
+                 UploadedFile do Streamlit)
+
+    Returns:
+        memoryview do conteúdo ou None se o arquivo não estiver em memória
+    """
+    if isinstance(arquivo, (bytes, bytearray, memoryview)):
+        return memoryview(arquivo)
+    if hasattr(arquivo, 'getbuffer'):
+        return arquivo.getbuffer()
+    return None
+
+def hash_buffer(buffer):
+    """
+    Calcula o hash SHA-256 de um buffer em memória sem copiá-lo.
+
+    Args:
+        buffer: Objeto que suporta o protocolo de buffer
+
+    Returns:
+        String hexadecimal com o hash
+    """
+    return hashlib.sha256(buffer).hexdigest()
+
+def copia_stream_com_hash(stream, limite=UPLOAD_SPILL_THRESHOLD, diretorio=None):
+    """
+    Copia um stream para um arquivo temporário, calculando o hash durante a leitura.
+
+    O conteúdo fica em memória enquanto for menor que o limite e só é gravado em
+    disco quando ultrapassa esse tamanho.
+
+    Args:
+        stream: Objeto de arquivo com método read()
+        limite: Tamanho em bytes a partir do qual o conteúdo é gravado em disco
+        diretorio: Diretório para o arquivo temporário (padrão do sistema se None)
+
+    Returns:
+        Tupla (arquivo temporário posicionado no início, hash SHA-256 em hexadecimal)
+    """
+    sha256 = hashlib.sha256()
+    destino = tempfile.SpooledTemporaryFile(max_size=limite, dir=diretorio)
+    for bloco in iter(lambda: stream.read(TAMANHO_BLOCO), b''):
+        sha256.update(bloco)
+        destino.write(bloco)
+    destino.seek(0)
+    return destino, sha256.hexdigest()
+
+def hash_arquivo(caminho):
+    """
+    Calcula o hash SHA-256 de um arquivo em disco lendo-o em blocos.
+
+    Args:
+        caminho: Caminho do arquivo
+
+    Returns:
+        String hexadecimal com o hash do arquivo
+    """
+    sha256 = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+def nome_arquivo(arquivo, padrao='arquivo'):
+    """
+    Retorna o nome de um arquivo, seja ele um caminho ou um objeto em memória.
+
+    Args:
+        arquivo: Caminho ou objeto de arquivo
+        padrao: Nome usado quando o objeto não possui nome
+
+    Returns:
+        String com o nome do arquivo (sem diretório)
+    """
+    if isinstance(arquivo, (str, os.PathLike)):
+        return os.path.basename(arquivo)
+    # 'filename' é usado pelos uploads de frameworks web (ex.: UploadFile do Starlette)
+    nome = getattr(arquivo, 'filename', None) or getattr(arquivo, 'name', None)
+    return os.path.basename(nome) if isinstance(nome, str) and nome else padrao
@@ -0,0 +1,140 @@
+"""
+Modelo dos documentos produzidos pelos carregadores de fontes.
+
+Os carregadores em fluxo (por exemplo, PDFs e playlists) produzem um Chunk para cada
+parte lida (uma página, um vídeo), à medida que ficam prontas, e por último o Document
+com as informações da fonte. Falhas de carregamento são descritas por
+ErroCarregamento em vez de um sufixo '(erro)' no tipo. No restante da aplicação
+(sessão, cache compartilhado, banco), o documento continua circulando como
+dicionário; como_dict() e de_dict() fazem a conversão.
+"""
+
+from dataclasses import dataclass, field
+
+# Campos do dicionário do documento representados diretamente no Document
+_CAMPOS = ('tipo', 'url', 'titulo', 'conteudo')
+
+@dataclass(slots=True)
+class ErroCarregamento:
+    """
+    Falha ao carregar uma fonte.
+
+    Attributes:
+        codigo: 'entrada' (URL ou arquivo ausente), 'dependencia' (biblioteca não
+                instalada), 'sem_conteudo' (nada a extrair), 'formato' (tipo não
+                suportado) ou 'falha' (erro durante o carregamento)
+        mensagem: Descrição exibida ao usuário
+    """
+    codigo: str
+    mensagem: str
+
+@dataclass(slots=True)
+class Chunk:
+    """
+    Parte de uma fonte produzida durante o carregamento.
+
+    Attributes:
+        texto: Texto da parte
+        metadados: Origem da parte (por exemplo, 'arquivo' e 'pagina' ou 'url' e 'titulo')
+    """
+    texto: str
+    metadados: dict = field(default_factory=dict)
+
+@dataclass(slots=True)
+class Document:
+    """
+    Fonte carregada (ou a falha ao carregá-la).
+
+    Attributes:
+        tipo: Tipo de fonte exibido (por exemplo, 'Documentos PDF')
+        url: URL ou nomes dos arquivos da fonte
+        titulo: Título da fonte
+        conteudo: Texto completo da fonte (vazio em caso de erro)
+        erro: ErroCarregamento, ou None se a fonte foi carregada
+        extras: Demais informações do carregador (por exemplo, 'deduplicacao')
+    """
+    tipo: str
+    url: str = ''
+    titulo: str = ''
+    conteudo: str = ''
+    erro: ErroCarregamento = None
+    extras: dict = field(default_factory=dict)
+
+    @property
+    def ok(self):
+        """Indica se a fonte foi carregada sem erro."""
+        return self.erro is None
+
+    @classmethod
+    def falha(cls, tipo, codigo, mensagem, url='', titulo='Erro ao carregar'):
+        """
+        Cria o documento que representa uma falha de carregamento.
+
+        Args:
+            tipo: Tipo de fonte (sem sufixo de erro)
+            codigo: Código do erro (ver ErroCarregamento)
+            mensagem: Descrição exibida ao usuário
+            url: URL ou arquivo da fonte, se conhecido
+            titulo: Título curto do erro
+
+        Returns:
+            Document com o erro
+        """
+        return cls(tipo, url, titulo, '', ErroCarregamento(codigo, mensagem))
+
+    def como_dict(self):
+        """
+        Converte o documento no dicionário usado pela sessão, pelo cache e pelo banco.
+
+        Em caso de erro, 'conteudo' traz a mensagem (exibida pela interface) e 'erro'
+        traz o código e a mensagem.
+        """
+        documento_info = dict(self.extras, tipo=self.tipo, url=self.url, titulo=self.titulo, conteudo=self.conteudo)
+        if self.erro is not None:
+            documento_info['conteudo'] = self.erro.mensagem
+            documento_info['erro'] = {'codigo': self.erro.codigo, 'mensagem': self.erro.mensagem}
+        return documento_info
+
+    @classmethod
+    def de_dict(cls, documento_info):
+        """Cria o documento a partir do dicionário retornado por um carregador."""
+        erro = documento_info.get('erro')
+        return cls(
+            *(documento_info.get(campo, '') for campo in _CAMPOS),
+            erro=ErroCarregamento(**erro) if erro else None,
+            extras={chave: valor for chave, valor in documento_info.items() if chave not in _CAMPOS + ('erro',)}
+        )
+
+def tem_erro(documento):
+    """
+    Indica se um documento (Document ou dicionário) representa uma falha de carregamento.
+
+    Args:
+        documento: Document ou dicionário retornado por um carregador
+
+    Returns:
+        True se o carregamento falhou
+    """
+    if isinstance(documento, Document):
+        return not documento.ok
+    return isinstance(documento, dict) and bool(documento.get('erro'))
+
+def coleta(fluxo, on_chunk=None):
+    """
+    Consome o fluxo de um carregador e retorna o documento final.
+
+    Args:
+        fluxo: Iterável de Chunks terminado pelo Document da fonte
+        on_chunk: Função opcional chamada com cada Chunk, assim que é produzido
+
+    Returns:
+        Document da fonte
+    """
+    documento = None
+    for item in fluxo:
+        if isinstance(item, Chunk):
+            if on_chunk:
+                on_chunk(item)
+        else:
+            documento = item
+    return documento
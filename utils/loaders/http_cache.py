@@ -0,0 +1,82 @@
+"""
+Módulo para armazenamento de validadores HTTP (ETag/Last-Modified).
+Permite requisições condicionais ao recarregar páginas já conhecidas.
+Os registros ficam no cache compartilhado, valendo para todas as réplicas do servidor.
+Cada carregador usa o próprio escopo na chave ('site', 'crawl'), já que guarda os dados
+processados em um formato diferente.
+"""
+
+from config.settings import HTTP_CACHE_TTL
+from core.shared_cache import get_cache
+
+def _chave(url, escopo):
+    """Chave do registro da URL no cache compartilhado."""
+    return f"http:{escopo}:{url}"
+
+def _registro(url, escopo):
+    """Registro da URL: validadores da última resposta e dados já processados."""
+    return get_cache().obter(_chave(url, escopo))
+
+def cabecalhos_condicionais(url, escopo):
+    """
+    Monta os cabeçalhos condicionais para uma URL já carregada anteriormente.
+
+    Args:
+        url: URL da requisição
+        escopo: Carregador que fez a requisição ('site' ou 'crawl')
+
+    Returns:
+        Dicionário com os cabeçalhos If-None-Match/If-Modified-Since (pode ser vazio)
+    """
+    registro = _registro(url, escopo)
+    if not registro:
+        return {}
+
+    cabecalhos = {}
+    if registro.get('etag'):
+        cabecalhos['If-None-Match'] = registro['etag']
+    if registro.get('last_modified'):
+        cabecalhos['If-Modified-Since'] = registro['last_modified']
+    return cabecalhos
+
+def obter_registro(url, escopo, campos=()):
+    """
+    Retorna os dados processados da última resposta válida de uma URL.
+
+    Args:
+        url: URL da requisição
+        escopo: Carregador que fez a requisição ('site' ou 'crawl')
+        campos: Campos obrigatórios nos dados; sem algum deles o registro é ignorado
+
+    Returns:
+        Dicionário com os dados armazenados ou None se a URL não for conhecida
+    """
+    registro = _registro(url, escopo)
+    dados = registro.get('dados') if registro else None
+    if not isinstance(dados, dict) or any(campo not in dados for campo in campos):
+        return None
+    return dados
+
+def registrar_resposta(url, escopo, cabecalhos, dados):
+    """
+    Armazena os validadores de uma resposta e os dados processados a partir dela.
+
+    Args:
+        url: URL da requisição
+        escopo: Carregador que fez a requisição ('site' ou 'crawl')
+        cabecalhos: Cabeçalhos da resposta HTTP
+        dados: Dados processados da página (texto, título, links, etc)
+    """
+    etag = cabecalhos.get('ETag') or cabecalhos.get('etag')
+    last_modified = cabecalhos.get('Last-Modified') or cabecalhos.get('last-modified')
+
+    # Sem validadores não há como fazer requisições condicionais
+    if not etag and not last_modified:
+        get_cache().remover(_chave(url, escopo))
+        return
+
+    get_cache().definir(_chave(url, escopo), {
+        'etag': etag,
+        'last_modified': last_modified,
+        'dados': dados
+    }, ttl=HTTP_CACHE_TTL)
@@ -1,113 +1,324 @@
 """
 Módulo para carregamento e processamento de imagens.
 Utiliza Vision API do Claude para extrair descrições e textos das imagens.
+Imagens grandes (diagramas, pôsteres, capturas de documentos longos) são divididas
+em regiões sobrepostas, analisadas em paralelo e reunidas com as coordenadas de cada
+região; em imagens com vários quadros (TIFF, GIF), cada quadro distinto é analisado.
 """
 
-import os
 import io
+import os
+import math
 import base64
-from anthropic import Anthropic # type: ignore
-from PIL import Image
-from config.settings import ANTHROPIC_API_KEY, MODEL
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from config.settings import (
+    MODEL, PARSED_CACHE_TTL, RATE_LIMIT_MAX_QUEUE, IMAGE_TILING_ENABLED, IMAGE_TILING_MIN_PIXELS,
+    IMAGE_TILE_MAX_SIDE, IMAGE_TILE_MAX_PIXELS, IMAGE_TILE_OVERLAP, IMAGE_MAX_TILES, IMAGE_MAX_FRAMES,
+    IMAGE_WORKERS
+)
+from core.rate_limit import admite
+from core.retry import cria_mensagem
+from core.shared_cache import obtem_ou_calcula
+from utils.loaders.document import Document
+from utils.loaders.buffers import LeitorMemoria, obtem_buffer, hash_buffer
+
+# Formatos enviados sem conversão; os demais (TIFF, BMP...) são convertidos para PNG
+FORMATOS_API = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'GIF': 'image/gif', 'WEBP': 'image/webp'}
+MAX_BYTES_IMAGEM = 3_750_000  # Tamanho máximo de uma imagem enviada (5 MB após o base64)
+
+PROMPT_IMAGEM = (
+    "Descreva detalhadamente esta imagem. Se houver texto visível na imagem, transcreva-o também. "
+    "Forneça uma descrição completa do conteúdo visual."
+)
+PROMPT_VISAO_GERAL = (
+    "Descreva em poucas linhas o tipo e a organização geral desta imagem (seções, colunas, "
+    "diagramas, legendas). O texto será transcrito separadamente, região por região."
+)
+PROMPT_REGIAO = (
+    "Esta é a região x={x0}-{x1}, y={y0}-{y1} (em pixels) de uma imagem de {largura}x{altura} pixels. "
+    "Transcreva fielmente todo o texto visível nesta região e descreva brevemente os elementos "
+    "visuais. Elementos cortados na borda aparecem também na região vizinha."
+)
 
-# Inicializa o cliente Anthropic
-client = Anthropic(api_key=ANTHROPIC_API_KEY)
+@dataclass(slots=True)
+class _Parte:
+    """
+    Parte da imagem descrita em uma chamada à API.
+
+    Attributes:
+        quadro: Índice do quadro na imagem
+        cabecalho: Título da parte na análise ('' para a descrição do quadro)
+        prompt: Instrução enviada com a imagem
+        imagem: Quadro ou região (PIL.Image), ou os bytes originais da imagem
+        pixels: Pixels enviados, usados na estimativa de tokens
+        tipo: Media type, quando `imagem` são os bytes originais
+        max_tokens: Tamanho máximo da descrição
+    """
+    quadro: int
+    cabecalho: str
+    prompt: str
+    imagem: object
+    pixels: int
+    tipo: str = ''
+    max_tokens: int = 1000
 
 def encode_image_to_base64(image_bytes):
     """
     Converte bytes da imagem para string base64.
     
     Args:
-        image_bytes: Bytes da imagem
-        
+        image_bytes: Bytes da imagem (ou qualquer buffer, como um memoryview)
+    
     Returns:
         String codificada em base64
     """
     return base64.b64encode(image_bytes).decode('utf-8')
 
-def carrega_imagem(uploaded_image=None):
+def _codifica(imagem):
+    """Codifica um quadro ou região em PNG (ou JPEG, se o PNG passar do tamanho aceito)."""
+    saida = io.BytesIO()
+    imagem.save(saida, format='PNG')
+    if saida.tell() <= MAX_BYTES_IMAGEM:
+        return encode_image_to_base64(saida.getbuffer()), 'image/png'
+    saida = io.BytesIO()
+    imagem.save(saida, format='JPEG', quality=90)
+    return encode_image_to_base64(saida.getbuffer()), 'image/jpeg'
+
+def _descreve(parte, sessao):
+    """Descreve uma parte da imagem com o modelo Claude."""
+    if isinstance(parte.imagem, (bytes, bytearray, memoryview)):
+        dados, tipo = encode_image_to_base64(parte.imagem), parte.tipo
+    else:
+        dados, tipo = _codifica(parte.imagem)
+
+    # Tokens da imagem (aproximadamente largura x altura / 750) e da resposta
+    reserva = admite(sessao, parte.pixels // 750 + parte.max_tokens)
+    response = cria_mensagem(dict(
+        model="claude-3-5-sonnet-20240620",
+        max_tokens=parte.max_tokens,
+        temperature=0.3,
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": parte.prompt},
+                    {"type": "image", "source": {"type": "base64", "media_type": tipo, "data": dados}}
+                ]
+            }
+        ]
+    ))
+    reserva.ajusta(response.usage.input_tokens + response.usage.output_tokens)
+    return response.content[0].text
+
+def _rgb(imagem):
+    """Converte um quadro para RGB (ou tons de cinza), com as áreas transparentes em branco."""
+    from PIL import Image
+    if imagem.mode in ('RGB', 'L'):
+        return imagem.copy()
+    rgba = imagem.convert('RGBA')
+    fundo = Image.new('RGB', rgba.size, 'white')
+    fundo.paste(rgba, mask=rgba.getchannel('A'))
+    return fundo
+
+def _quadros(img):
+    """Retorna os quadros distintos da imagem (até IMAGE_MAX_FRAMES) como pares (índice, quadro)."""
+    quadros = []
+    vistos = set()
+    for indice in range(getattr(img, 'n_frames', 1)):
+        if len(quadros) >= IMAGE_MAX_FRAMES:
+            break
+        img.seek(indice)
+        quadro = _rgb(img)
+        # Animações costumam repetir quadros; os idênticos são analisados uma vez
+        chave = hash_buffer(quadro.tobytes())
+        if chave not in vistos:
+            vistos.add(chave)
+            quadros.append((indice, quadro))
+    return quadros
+
+def _intervalos(tamanho, lado, sobreposicao):
+    """Divide [0, tamanho) em intervalos iguais de até `lado` pixels, sobrepostos em `sobreposicao`."""
+    if tamanho <= lado:
+        return [(0, tamanho)]
+    quantidade = math.ceil((tamanho - sobreposicao) / (lado - sobreposicao))
+    lado = math.ceil((tamanho + (quantidade - 1) * sobreposicao) / quantidade)
+    inicios = [min(posicao * (lado - sobreposicao), tamanho - lado) for posicao in range(quantidade)]
+    return [(inicio, inicio + lado) for inicio in inicios]
+
+def divide_regioes(largura, altura):
+    """
+    Divide um quadro em regiões sobrepostas que a API analisa sem reduzir.
+
+    Cada região tem no máximo IMAGE_TILE_MAX_SIDE de lado e IMAGE_TILE_MAX_PIXELS
+    pixels. Se forem necessárias mais de IMAGE_MAX_TILES regiões, o quadro é reduzido
+    até que caibam.
+
+    Args:
+        largura: Largura do quadro em pixels
+        altura: Altura do quadro em pixels
+
+    Returns:
+        Tupla (escala aplicada ao quadro, lista de regiões (x0, y0, x1, y1) no quadro escalado)
+    """
+    escala = 1.0
+    while True:
+        largura_escalada = max(1, round(largura * escala))
+        altura_escalada = max(1, round(altura * escala))
+        colunas = _intervalos(largura_escalada, IMAGE_TILE_MAX_SIDE, IMAGE_TILE_OVERLAP)
+        largura_regiao = colunas[0][1] - colunas[0][0]
+        altura_regiao = min(IMAGE_TILE_MAX_SIDE, IMAGE_TILE_MAX_PIXELS // largura_regiao)
+        linhas = _intervalos(altura_escalada, altura_regiao, IMAGE_TILE_OVERLAP)
+        if len(colunas) * len(linhas) <= IMAGE_MAX_TILES:
+            return escala, [(x0, y0, x1, y1) for y0, y1 in linhas for x0, x1 in colunas]
+        escala *= 0.9
+
+def _partes_quadro(indice, quadro):
+    """Divide um quadro grande na visão geral (reduzida) e nas regiões com as coordenadas originais."""
+    from PIL import Image
+    largura, altura = quadro.size
+
+    reducao = min(IMAGE_TILE_MAX_SIDE / max(largura, altura), math.sqrt(IMAGE_TILE_MAX_PIXELS / (largura * altura)))
+    visao_geral = quadro.resize((max(1, round(largura * reducao)), max(1, round(altura * reducao))), Image.LANCZOS)
+    partes = [_Parte(indice, '', PROMPT_VISAO_GERAL, visao_geral, visao_geral.width * visao_geral.height, max_tokens=500)]
+
+    escala, regioes = divide_regioes(largura, altura)
+    if escala < 1:
+        quadro = quadro.resize((round(largura * escala), round(altura * escala)), Image.LANCZOS)
+    for numero, regiao in enumerate(regioes, start=1):
+        x0, y0, x1, y1 = (round(coordenada / escala) for coordenada in regiao)
+        partes.append(_Parte(
+            indice,
+            f"Região {numero} de {len(regioes)} (x {x0}-{x1}, y {y0}-{y1})",
+            PROMPT_REGIAO.format(x0=x0, x1=x1, y0=y0, y1=y1, largura=largura, altura=altura),
+            quadro.crop(regiao),
+            (regiao[2] - regiao[0]) * (regiao[3] - regiao[1])
+        ))
+    return partes
+
+def analisa_imagem(image_bytes, sessao=None):
+    """
+    Analisa uma imagem por quadros e regiões, com as chamadas à API em paralelo.
+
+    Imagens pequenas são descritas em uma única chamada, como antes. Quadros com mais
+    de IMAGE_TILING_MIN_PIXELS pixels recebem uma visão geral e a transcrição de cada
+    região, com as coordenadas no quadro original. As chamadas passam pelo controle
+    de admissão da sessão, por isso no máximo RATE_LIMIT_MAX_QUEUE são simultâneas.
+
+    Args:
+        image_bytes: Conteúdo da imagem (bytes ou memoryview)
+        sessao: ID da sessão, usado nos limites de uso por sessão
+
+    Returns:
+        Tupla (texto da análise, True se todas as partes foram analisadas)
+
+    Raises:
+        Exception: A falha da primeira parte, se nenhuma parte pôde ser analisada
+    """
+    from PIL import Image
+
+    with Image.open(LeitorMemoria(image_bytes)) as img:
+        total = getattr(img, 'n_frames', 1)
+        quadros = _quadros(img)
+        formato = img.format
+
+    partes = []
+    for indice, quadro in quadros:
+        largura, altura = quadro.size
+        if IMAGE_TILING_ENABLED and largura * altura > IMAGE_TILING_MIN_PIXELS:
+            partes.extend(_partes_quadro(indice, quadro))
+        elif total == 1 and formato in FORMATOS_API and len(image_bytes) <= MAX_BYTES_IMAGEM:
+            # Imagem simples em formato aceito: enviada como foi recebida
+            partes.append(_Parte(indice, '', PROMPT_IMAGEM, image_bytes, largura * altura, FORMATOS_API[formato]))
+        else:
+            partes.append(_Parte(indice, '', PROMPT_IMAGEM, quadro, largura * altura))
+
+    def descreve(parte):
+        try:
+            return _descreve(parte, sessao), None
+        except Exception as e:
+            print(f"Erro ao analisar parte da imagem ({parte.cabecalho or 'quadro'}): {str(e)}")
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(IMAGE_WORKERS, RATE_LIMIT_MAX_QUEUE))) as executor:
+        resultados = list(executor.map(descreve, partes))
+
+    erros = [erro for _, erro in resultados if erro is not None]
+    if len(erros) == len(resultados):
+        raise erros[0]
+
+    # Reúne as descrições na ordem dos quadros e regiões
+    secoes = []
+    quadro_atual = None
+    for parte, (texto, erro) in zip(partes, resultados):
+        if len(quadros) > 1 and parte.quadro != quadro_atual:
+            secoes.append(f"## Quadro {parte.quadro + 1} de {total}")
+            quadro_atual = parte.quadro
+        if parte.cabecalho:
+            secoes.append(f"### {parte.cabecalho}")
+        secoes.append(texto if erro is None else f"[Não foi possível analisar esta parte: {str(erro)}]")
+    return '\n\n'.join(secoes), not erros
+
+def carrega_imagem(uploaded_image=None, sessao=None):
     """
     Carrega e processa uma imagem.
     
     Args:
         uploaded_image: Objeto de arquivo da imagem carregada
-        
+        sessao: ID da sessão, usado nos limites de uso por sessão
+    
     Returns:
         Dicionário com informações e descrição da imagem processada
     """
     # Valida se a imagem foi fornecida
     if uploaded_image is None:
-        return {
-            'tipo': 'Imagem (erro)',
-            'url': '',
-            'titulo': 'Imagem não fornecida',
-            'conteudo': 'É necessário fornecer uma imagem válida para processamento.'
-        }
+        return Document.falha(
+            'Imagem', 'entrada', 'É necessário fornecer uma imagem válida para processamento.',
+            titulo='Imagem não fornecida'
+        ).como_dict()
     
     try:
-        # Lê a imagem
-        image_bytes = uploaded_image.getvalue()
+        # Importação tardia: o Pillow só é carregado quando uma imagem é analisada
+        from PIL import Image
+        
+        # Acessa o conteúdo da imagem em memória sem copiá-lo
+        image_bytes = obtem_buffer(uploaded_image)
+        if image_bytes is None:
+            image_bytes = uploaded_image.read()
         
         # Tenta abrir a imagem para validar
         try:
-            with Image.open(io.BytesIO(image_bytes)) as img:
+            with Image.open(LeitorMemoria(image_bytes)) as img:
                 width, height = img.size
                 format_type = img.format
                 modo = img.mode
+                total_quadros = getattr(img, 'n_frames', 1)
         except Exception as e:
-            return {
-                'tipo': 'Imagem (erro)',
-                'url': '',
-                'titulo': 'Formato inválido',
-                'conteudo': f'Erro ao processar a imagem: {str(e)}'
-            }
-        
-        # Codifica a imagem em base64
-        base64_image = encode_image_to_base64(image_bytes)
+            return Document.falha(
+                'Imagem', 'formato', f'Erro ao processar a imagem: {str(e)}',
+                titulo='Formato inválido'
+            ).como_dict()
         
-        # Utiliza o modelo Claude para descrever a imagem
+        # Utiliza o modelo Claude para descrever a imagem; a mesma imagem enviada por
+        # outras sessões reaproveita a análise pelo hash do conteúdo (análises com
+        # partes que falharam não são guardadas)
         try:
-            response = client.messages.create(
-                model="claude-3-5-sonnet-20240620",
-                max_tokens=1000,
-                temperature=0.3,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text", 
-                                "text": "Descreva detalhadamente esta imagem. Se houver texto visível na imagem, transcreva-o também. Forneça uma descrição completa do conteúdo visual."
-                            },
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": f"image/{format_type.lower() if format_type else 'jpeg'}",
-                                    "data": base64_image
-                                }
-                            }
-                        ]
-                    }
-                ]
+            descricao, _ = obtem_ou_calcula(
+                f"analise_imagem:{hash_buffer(image_bytes)}", lambda: analisa_imagem(image_bytes, sessao),
+                ttl=PARSED_CACHE_TTL, guardar=lambda analise: analise[1]
             )
-            
-            # Extrai a descrição da imagem
-            descricao = response.content[0].text
-            
         except Exception as e:
-            return {
-                'tipo': 'Imagem (erro)',
-                'url': '',
-                'titulo': 'Erro na análise',
-                'conteudo': f'Erro ao analisar a imagem com Claude: {str(e)}'
-            }
+            return Document.falha(
+                'Imagem', 'falha', f'Erro ao analisar a imagem com Claude: {str(e)}',
+                titulo='Erro na análise'
+            ).como_dict()
         
         # Retorna as informações da imagem
+        quadros = f', {total_quadros} quadros' if total_quadros > 1 else ''
         return {
             'tipo': 'Imagem',
             'url': '',
-            'titulo': f'Imagem ({format_type}, {width}x{height}, {modo})',
+            'titulo': f'Imagem ({format_type}, {width}x{height}, {modo}{quadros})',
             'conteudo': f"Análise da imagem:\n\n{descricao}"
         }
         
@@ -115,9 +326,7 @@ def carrega_imagem(uploaded_image=None):
         # Captura erros genéricos
         error_msg = str(e)
         print(f"Erro ao processar imagem: {error_msg}")
-        return {
-            'tipo': 'Imagem (erro)',
-            'url': '',
-            'titulo': 'Erro no processamento',
-            'conteudo': f'Não foi possível processar a imagem: {error_msg}'
-        }
+        return Document.falha(
+            'Imagem', 'falha', f'Não foi possível processar a imagem: {error_msg}',
+            titulo='Erro no processamento'
+        ).como_dict()
@@ -1,25 +1,222 @@
 """
 Módulo para carregamento e processamento de arquivos PDF.
-Utiliza PyPDFLoader da LangChain para extrair texto dos PDFs.
+Utiliza pypdf para extrair texto dos PDFs, lendo arquivos enviados diretamente da memória.
+O texto é extraído preservando o layout, para que tabelas sejam reconhecidas e
+convertidas em markdown, e cada página é marcada com '[Página N]' para citações.
 """
 
 import os
-from langchain_community.document_loaders import PyPDFLoader
-from config.settings import DOCUMENTS_DIR
+import re
+import threading
+from collections import OrderedDict
+from config.settings import DOCUMENTS_DIR, PARSED_CACHE_TTL
+from core.blob_store import Blob
+from core.dedup import IndiceLSH, deduplica_texto, relatorio_vazio
+from core.shared_cache import exclusivo, get_cache
+from utils.loaders.document import Chunk, Document, coleta
+from utils.loaders.buffers import (
+    LeitorMemoria, obtem_buffer, hash_buffer, hash_arquivo, copia_stream_com_hash, nome_arquivo
+)
 
-def carrega_pdf(pdf_paths=None):
+# Cache das páginas extraídas por hash do conteúdo do arquivo (mais recentes no final),
+# na frente do cache compartilhado entre processos
+_paginas_por_hash = OrderedDict()
+_trava_paginas = threading.Lock()
+MAX_PDFS_EM_CACHE = 32
+
+# Marcador inserido antes do texto de cada página (reconhecido por core.index)
+MARCADOR_PAGINA = "[Página {numero}]"
+
+# Detecção de tabelas no texto com layout: colunas separadas por 2 ou mais espaços
+_SEPARADOR_COLUNAS = re.compile(r'\s{2,}')
+MIN_LINHAS_TABELA = 3  # Linhas (incluindo o cabeçalho) para um bloco ser tratado como tabela
+MAX_MEDIA_CELULA = 30  # Tamanho médio máximo das células; acima disso, são colunas de texto corrido
+
+def _eh_tabela(linhas):
+    """Indica se um bloco de linhas com o mesmo número de colunas parece uma tabela."""
+    if len(linhas) < MIN_LINHAS_TABELA:
+        return False
+    celulas = [celula for linha in linhas for celula in linha]
+    return sum(len(celula) for celula in celulas) / len(celulas) <= MAX_MEDIA_CELULA
+
+def _tabela_markdown(linhas):
+    """Formata as linhas de uma tabela (a primeira é o cabeçalho) em markdown."""
+    formatadas = ['| ' + ' | '.join(celula.replace('|', '\\|') for celula in linha) + ' |' for linha in linhas]
+    formatadas.insert(1, '|' + '---|' * len(linhas[0]))
+    return '\n'.join(formatadas)
+
+def formata_pagina(texto):
     """
-    Carrega e processa arquivos PDF.
+    Compacta o texto de uma página extraído com layout, convertendo tabelas em markdown.
+    
+    Blocos de pelo menos MIN_LINHAS_TABELA linhas consecutivas com o mesmo número de
+    colunas (separadas por 2 ou mais espaços) e células curtas viram tabelas; nas
+    demais linhas, o alinhamento é descartado e espaços repetidos viram um só.
     
     Args:
-        pdf_paths: Lista de caminhos para arquivos PDF a serem processados.
-                  Se None, processa todos os PDFs na pasta 'documentos'.
+        texto: Texto da página extraído com extraction_mode="layout"
         
     Returns:
-        Dicionário com informações e conteúdo dos PDFs processados
+        String com o texto compacto da página
+    """
+    saida = []
+    bloco = []
+    branco_pendente = False
+    
+    def descarrega():
+        if _eh_tabela(bloco):
+            saida.append(_tabela_markdown(bloco))
+        else:
+            saida.extend(' '.join(linha) for linha in bloco)
+        bloco.clear()
+    
+    for linha in texto.splitlines():
+        celulas = _SEPARADOR_COLUNAS.split(linha.strip())
+        if not linha.strip():
+            branco_pendente = True
+            continue
+        
+        # Linhas em branco entre linhas de uma mesma tabela são ignoradas
+        if bloco and len(celulas) == len(bloco[0]):
+            bloco.append(celulas)
+        else:
+            if bloco:
+                descarrega()
+            if branco_pendente and saida and saida[-1]:
+                saida.append('')
+            if len(celulas) >= 2:
+                bloco.append(celulas)
+            else:
+                saida.append(celulas[0])
+        branco_pendente = False
+    if bloco:
+        descarrega()
+    return '\n'.join(saida)
+
+def _extrai_texto(pagina):
+    """Extrai o texto de uma página preservando o layout (ou no modo simples, em versões antigas do pypdf)."""
+    try:
+        return formata_pagina(pagina.extract_text(extraction_mode="layout") or '')
+    except TypeError:
+        return pagina.extract_text() or ''
+
+def abre_pdf(arquivo, diretorio_temporario=None):
+    """
+    Prepara um PDF para leitura, calculando seu hash sem copiar dados em memória.
+    
+    Args:
+        arquivo: Caminho do arquivo, Blob do armazenamento de uploads, buffer em memória
+                 (bytes, memoryview, UploadedFile) ou stream com método read()
+        diretorio_temporario: Diretório para streams grandes que precisem ir para o disco
+        
+    Returns:
+        Tupla (hash do conteúdo, origem legível pelo pypdf)
+    """
+    if isinstance(arquivo, Blob):
+        # O hash foi calculado quando o arquivo foi guardado
+        if arquivo.dados is not None:
+            return arquivo.hash, LeitorMemoria(arquivo.dados)
+        return arquivo.hash, arquivo.caminho
+    if isinstance(arquivo, (str, os.PathLike)):
+        return hash_arquivo(arquivo), arquivo
+    
+    buffer = obtem_buffer(arquivo)
+    if buffer is not None:
+        return hash_buffer(buffer), LeitorMemoria(buffer)
+    
+    # Stream genérico: copia com hash, indo para o disco apenas acima do limite.
+    # Uploads de frameworks web expõem o stream síncrono no atributo 'file'.
+    stream = getattr(arquivo, 'file', arquivo)
+    destino, chave = copia_stream_com_hash(stream, diretorio=diretorio_temporario)
+    return chave, destino
+
+def _guarda_paginas(chave, paginas):
+    """Guarda as páginas extraídas no cache do processo, descartando as mais antigas."""
+    with _trava_paginas:
+        _paginas_por_hash[chave] = paginas
+        _paginas_por_hash.move_to_end(chave)
+        while len(_paginas_por_hash) > MAX_PDFS_EM_CACHE:
+            _paginas_por_hash.popitem(last=False)
+
+def fluxo_paginas(arquivo, diretorio_temporario=None):
+    """
+    Produz o texto de cada página de um PDF assim que é extraída.
+    
+    O texto extraído fica em cache pelo hash do conteúdo, no processo e no cache
+    compartilhado: o mesmo arquivo enviado por várias sessões (ou réplicas) é
+    processado uma única vez. Durante a extração, as demais réplicas aguardam o
+    lease do arquivo e depois leem as páginas do cache.
+    
+    Args:
+        arquivo: Caminho do arquivo PDF, Blob ou arquivo em memória
+        diretorio_temporario: Diretório para streams grandes que precisem ir para o disco
+        
+    Yields:
+        Texto compacto de cada página (tabelas em markdown), na ordem do arquivo
+    """
+    chave, origem = abre_pdf(arquivo, diretorio_temporario)
+    try:
+        with _trava_paginas:
+            paginas = _paginas_por_hash.get(chave)
+            if paginas is not None:
+                _paginas_por_hash.move_to_end(chave)
+        if paginas is not None:
+            print(f"PDF sem alterações, reutilizando texto extraído: {nome_arquivo(arquivo)}")
+            yield from paginas
+            return
+        
+        with exclusivo(f"pdf:{chave}"):
+            # Outra réplica pode ter extraído o arquivo enquanto o lease era aguardado
+            paginas = get_cache().obter(f"pdf:{chave}")
+            if paginas is not None:
+                yield from paginas
+            else:
+                # Importação tardia: o pypdf só é carregado quando um PDF é processado
+                from pypdf import PdfReader
+                paginas = []
+                for pagina in PdfReader(origem).pages:
+                    texto = _extrai_texto(pagina)
+                    paginas.append(texto)
+                    yield texto
+                get_cache().definir(f"pdf:{chave}", paginas, ttl=PARSED_CACHE_TTL)
+    finally:
+        if hasattr(origem, 'close'):
+            origem.close()
+    
+    _guarda_paginas(chave, paginas)
+
+def extrai_paginas(arquivo, diretorio_temporario=None):
+    """
+    Extrai o texto de todas as páginas de um PDF, reutilizando o resultado se o arquivo não mudou.
+    
+    Args:
+        arquivo: Caminho do arquivo PDF, Blob ou arquivo em memória
+        diretorio_temporario: Diretório para streams grandes que precisem ir para o disco
+        
+    Returns:
+        Lista de strings com o texto compacto de cada página (ver fluxo_paginas)
+    """
+    return list(fluxo_paginas(arquivo, diretorio_temporario))
+
+def fluxo_pdf(pdf_paths=None, diretorio_temporario=None):
+    """
+    Carrega arquivos PDF em fluxo, produzindo cada página assim que é extraída.
+    
+    Args:
+        pdf_paths: Lista de arquivos PDF a serem processados. Cada item pode ser um caminho,
+                  um Blob (ver core.blob_store) ou um arquivo em memória (bytes, memoryview,
+                  UploadedFile do Streamlit).
+                  Se None, processa todos os PDFs na pasta 'documentos'.
+        diretorio_temporario: Diretório para arquivos grandes que precisem ir para o disco
+        
+    Yields:
+        Um Chunk por página (com 'arquivo' e 'pagina', sem os trechos repetidos), assim
+        que ela é extraída, e, por último, o Document com o conteúdo de todos os PDFs
     """
     documento = ''
     arquivos_processados = []
+    indice_dedup = IndiceLSH()
+    deduplicacao = relatorio_vazio()
     
     # Se não foram fornecidos caminhos específicos, usa a pasta documentos
     if pdf_paths is None:
@@ -28,72 +225,94 @@ def carrega_pdf(pdf_paths=None):
         
         # Verifica se a pasta existe
         if not os.path.exists(pasta):
-            return {
-                'tipo': 'PDF (erro)',
-                'url': pasta,
-                'titulo': 'Pasta não encontrada',
-                'conteudo': f'Pasta de documentos não encontrada: {pasta}'
-            }
+            yield Document.falha(
+                'Documentos PDF', 'entrada', f'Pasta de documentos não encontrada: {pasta}',
+                url=pasta, titulo='Pasta não encontrada'
+            )
+            return
         
         # Lista apenas arquivos PDF na pasta
         arquivos_pdf = [f for f in os.listdir(pasta) if f.lower().endswith('.pdf')]
         
         # Verifica se existem PDFs na pasta
         if not arquivos_pdf:
-            return {
-                'tipo': 'PDF (erro)',
-                'url': pasta,
-                'titulo': 'Nenhum PDF encontrado',
-                'conteudo': f'Nenhum arquivo PDF encontrado na pasta: {pasta}'
-            }
+            yield Document.falha(
+                'Documentos PDF', 'entrada', f'Nenhum arquivo PDF encontrado na pasta: {pasta}',
+                url=pasta, titulo='Nenhum PDF encontrado'
+            )
+            return
         
         # Constrói os caminhos completos para os arquivos
         pdf_paths = [os.path.join(pasta, arquivo) for arquivo in arquivos_pdf]
     
     # Valida se a lista de caminhos não está vazia
     if not pdf_paths:
-        return {
-            'tipo': 'PDF (erro)',
-            'url': '',
-            'titulo': 'Nenhum PDF fornecido',
-            'conteudo': 'Nenhum arquivo PDF fornecido para processamento.'
-        }
+        yield Document.falha(
+            'Documentos PDF', 'entrada', 'Nenhum arquivo PDF fornecido para processamento.',
+            titulo='Nenhum PDF fornecido'
+        )
+        return
     
     # Processa cada arquivo PDF
-    for caminho_completo in pdf_paths:
+    for arquivo in pdf_paths:
+        nome = nome_arquivo(arquivo, 'documento.pdf')
+        
+        # Valida se o arquivo existe
+        if isinstance(arquivo, (str, os.PathLike)) and not os.path.exists(arquivo):
+            print(f"Arquivo não encontrado: {arquivo}")
+            continue
+        
+        # Extrai o texto página a página (reaproveitado se o arquivo não mudou). Trechos
+        # repetidos entre páginas e arquivos (slides e apostila, versões de um material)
+        # são removidos antes de inserir os marcadores, que nunca são descartados
+        partes = []
         try:
-            # Valida se o arquivo existe
-            if not os.path.exists(caminho_completo):
-                print(f"Arquivo não encontrado: {caminho_completo}")
-                continue
-                
-            # Carrega e extrai texto do PDF
-            loader = PyPDFLoader(caminho_completo)
-            lista_documentos = loader.load()
-            
-            # Concatena o conteúdo de todas as páginas
-            documento += '\n\n--- ' + os.path.basename(caminho_completo) + ' ---\n\n'
-            documento += '\n'.join([doc.page_content for doc in lista_documentos])
-            
-            # Adiciona à lista de arquivos processados
-            arquivos_processados.append(os.path.basename(caminho_completo))
-            print(f"Arquivo processado com sucesso: {os.path.basename(caminho_completo)}")
+            for numero, texto in enumerate(fluxo_paginas(arquivo, diretorio_temporario), start=1):
+                texto, _ = deduplica_texto(texto, indice=indice_dedup, relatorio=deduplicacao)
+                partes.append(MARCADOR_PAGINA.format(numero=numero) + '\n' + texto)
+                yield Chunk(texto, {'arquivo': nome, 'pagina': numero})
         except Exception as e:
-            print(f"Erro ao processar arquivo {caminho_completo}: {str(e)}")
+            print(f"Erro ao processar arquivo {nome}: {str(e)}")
+            continue
+        
+        # Concatena o conteúdo de todas as páginas, com o marcador de cada uma
+        documento += '\n\n--- ' + nome + ' ---\n\n'
+        documento += '\n\n'.join(partes)
+        
+        # Adiciona à lista de arquivos processados
+        arquivos_processados.append(nome)
+        print(f"Arquivo processado com sucesso: {nome}")
     
     # Verifica se algum arquivo foi processado
     if not arquivos_processados:
-        return {
-            'tipo': 'PDF (erro)',
-            'url': '',
-            'titulo': 'Falha no processamento',
-            'conteudo': 'Não foi possível processar nenhum dos arquivos PDF fornecidos.'
-        }
+        yield Document.falha(
+            'Documentos PDF', 'sem_conteudo', 'Não foi possível processar nenhum dos arquivos PDF fornecidos.',
+            titulo='Falha no processamento'
+        )
+        return
     
     # Retorna as informações dos PDFs processados
-    return {
-        'tipo': 'Documentos PDF',
-        'url': ', '.join(pdf_paths),
-        'titulo': f"Arquivos: {', '.join(arquivos_processados)}",
-        'conteudo': documento
-    }
\ No newline at end of file
+    yield Document(
+        'Documentos PDF',
+        ', '.join(
+            str(arquivo) if isinstance(arquivo, (str, os.PathLike)) else nome_arquivo(arquivo, 'documento.pdf')
+            for arquivo in pdf_paths
+        ),
+        f"Arquivos: {', '.join(arquivos_processados)}",
+        documento,
+        extras={'deduplicacao': deduplicacao}
+    )
+
+def carrega_pdf(pdf_paths=None, diretorio_temporario=None, on_chunk=None):
+    """
+    Carrega e processa arquivos PDF.
+    
+    Args:
+        pdf_paths: Lista de arquivos PDF (ver fluxo_pdf)
+        diretorio_temporario: Diretório para arquivos grandes que precisem ir para o disco
+        on_chunk: Função opcional chamada com o Chunk de cada página extraída
+        
+    Returns:
+        Dicionário com informações e conteúdo dos PDFs processados
+    """
+    return coleta(fluxo_pdf(pdf_paths, diretorio_temporario), on_chunk).como_dict()
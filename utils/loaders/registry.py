@@ -0,0 +1,160 @@
+"""
+Registro dos carregadores de fontes.
+
+Cada tipo de fonte (site, site completo, vídeo, playlist, PDF, imagem) é registrado
+com o módulo e a função que o carregam. load(fonte) identifica o tipo da fonte e
+produz as partes (Chunks) e o Document carregados, de modo que todos os pontos de
+entrada (interface, API, prefetch e o chat.py legado) usem os mesmos carregadores.
+Novos tipos de fonte são adicionados com registra(), sem alterar quem os consome.
+"""
+
+import importlib
+import os
+from utils.loaders.document import Chunk, Document, coleta
+
+# Carregador de cada tipo de fonte: módulo, função e extensões de arquivo reconhecidas
+CARREGADORES = {
+    'site': {'modulo': 'utils.loaders.web_loader', 'funcao': 'carrega_site', 'extensoes': ()},
+    'site_completo': {'modulo': 'utils.loaders.site_crawler', 'funcao': 'carrega_site_completo', 'extensoes': ()},
+    'youtube': {'modulo': 'utils.loaders.youtube_loader', 'funcao': 'carrega_youtube', 'extensoes': ()},
+    'playlist': {'modulo': 'utils.loaders.youtube_playlist', 'funcao': 'fluxo_playlist', 'extensoes': ()},
+    'pdf': {'modulo': 'utils.loaders.pdf_loader', 'funcao': 'fluxo_pdf', 'extensoes': ('.pdf',)},
+    'imagem': {
+        'modulo': 'utils.loaders.image_loader',
+        'funcao': 'carrega_imagem',
+        'extensoes': ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.tif', '.tiff')
+    },
+}
+
+def registra(tipo, modulo, funcao, extensoes=()):
+    """
+    Registra (ou substitui) o carregador de um tipo de fonte.
+
+    O carregador recebe a fonte como primeiro argumento, mais as opções do tipo, e
+    retorna um dicionário com 'tipo', 'url', 'titulo' e 'conteudo' ou, em fluxo,
+    produz Chunks e por último o Document (ver utils.loaders.document).
+
+    Args:
+        tipo: Nome do tipo de fonte
+        modulo: Caminho do módulo do carregador (importado apenas no primeiro uso)
+        funcao: Nome da função carregadora no módulo
+        extensoes: Extensões de arquivo (minúsculas, com ponto) reconhecidas pelo tipo
+    """
+    CARREGADORES[tipo] = {'modulo': modulo, 'funcao': funcao, 'extensoes': tuple(extensoes)}
+
+def carregador(tipo):
+    """
+    Retorna a função carregadora de um tipo de fonte, importando o seu módulo.
+
+    Args:
+        tipo: Tipo de fonte (chave de CARREGADORES)
+
+    Returns:
+        Função carregadora
+
+    Raises:
+        ValueError: Se o tipo não estiver registrado
+    """
+    if tipo not in CARREGADORES:
+        raise ValueError(f"Tipo de fonte desconhecido: {tipo}")
+    registro = CARREGADORES[tipo]
+    return getattr(importlib.import_module(registro['modulo']), registro['funcao'])
+
+def tipo_fonte(url):
+    """
+    Identifica o tipo de fonte de uma URL.
+
+    Args:
+        url: URL informada pelo usuário
+
+    Returns:
+        'playlist', 'youtube' ou 'site'
+    """
+    from utils.loaders.youtube_playlist import eh_playlist
+    if eh_playlist(url):
+        return 'playlist'
+    if 'youtube.com' in url or 'youtu.be' in url:
+        return 'youtube'
+    return 'site'
+
+def identifica(fonte):
+    """
+    Identifica o tipo de uma fonte: URL, caminho ou arquivo enviado (ou lista deles).
+
+    Args:
+        fonte: URL, caminho de arquivo, arquivo com atributo 'name' ou lista de arquivos
+
+    Returns:
+        Tipo de fonte (chave de CARREGADORES)
+
+    Raises:
+        ValueError: Se o tipo não puder ser identificado
+    """
+    from utils.loaders.buffers import nome_arquivo
+
+    if isinstance(fonte, (list, tuple)):
+        if not fonte:
+            raise ValueError("Nenhum arquivo fornecido.")
+        tipos = {identifica(item) for item in fonte}
+        if len(tipos) > 1:
+            raise ValueError("Os arquivos de uma mesma fonte devem ser do mesmo tipo.")
+        return tipos.pop()
+
+    if isinstance(fonte, str) and not os.path.exists(fonte):
+        return tipo_fonte(fonte)
+
+    extensao = os.path.splitext(nome_arquivo(fonte, ''))[1].lower()
+    for tipo, registro in CARREGADORES.items():
+        if extensao in registro['extensoes']:
+            return tipo
+    raise ValueError(f"Tipo de arquivo não suportado: {extensao or 'sem extensão'}")
+
+def load(fonte, tipo=None, **opcoes):
+    """
+    Carrega uma fonte com o carregador do seu tipo, produzindo as partes à medida que são lidas.
+
+    Carregadores em fluxo produzem um Chunk por parte (página, vídeo) e o Document
+    ao final; os demais têm o resultado convertido em um único Chunk e no Document.
+    Falhas, inclusive de tipo não suportado, vêm no Document (com 'erro').
+
+    Args:
+        fonte: URL, caminho ou arquivo enviado (ou lista de arquivos do mesmo tipo)
+        tipo: Tipo de fonte; se omitido, é identificado a partir da fonte
+        opcoes: Argumentos adicionais do carregador (por exemplo, max_paginas ou on_page)
+
+    Yields:
+        Chunks da fonte e, por último, o Document
+    """
+    try:
+        tipo = tipo or identifica(fonte)
+    except ValueError as e:
+        yield Document.falha('Fonte', 'formato', str(e))
+        return
+
+    # PDFs são carregados em conjunto: o carregador recebe a lista de arquivos
+    if tipo == 'pdf' and fonte is not None and not isinstance(fonte, (list, tuple)):
+        fonte = [fonte]
+    resultado = carregador(tipo)(fonte, **opcoes)
+    if not isinstance(resultado, dict):
+        yield from resultado
+        return
+
+    documento = Document.de_dict(resultado)
+    if documento.ok and documento.conteudo:
+        yield Chunk(documento.conteudo, {'url': documento.url, 'titulo': documento.titulo})
+    yield documento
+
+def carrega(fonte, tipo=None, on_chunk=None, **opcoes):
+    """
+    Carrega uma fonte por completo (ver load).
+
+    Args:
+        fonte: URL, caminho ou arquivo enviado (ou lista de arquivos do mesmo tipo)
+        tipo: Tipo de fonte; se omitido, é identificado a partir da fonte
+        on_chunk: Função opcional chamada com cada Chunk, assim que é lido
+        opcoes: Argumentos adicionais do carregador
+
+    Returns:
+        Dicionário com 'tipo', 'url', 'titulo' e 'conteudo' (e 'erro', se falhou)
+    """
+    return coleta(load(fonte, tipo, **opcoes), on_chunk).como_dict()
@@ -0,0 +1,244 @@
+"""
+Módulo para rastreamento (crawl) de sites com múltiplas páginas.
+Descobre links do mesmo domínio e carrega as páginas de forma concorrente.
+"""
+
+import asyncio
+import hashlib
+from urllib.parse import urljoin, urldefrag, urlparse
+from urllib.robotparser import RobotFileParser
+from config.settings import (
+    USER_AGENT, WEB_HEADERS, HTTP_TIMEOUT,
+    CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES, CRAWL_CONCURRENCY
+)
+from core.dedup import IndiceLSH, deduplica_texto, relatorio_vazio
+from utils.loaders.document import Document
+from utils.loaders.http_cache import cabecalhos_condicionais, obter_registro, registrar_resposta
+
+# Extensões de arquivos que não são páginas HTML e não devem ser seguidas
+EXTENSOES_IGNORADAS = (
+    '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.zip', '.gz',
+    '.mp4', '.mp3', '.css', '.js', '.xml', '.json', '.ico', '.doc', '.docx', '.ppt', '.pptx'
+)
+
+# Campos que uma página armazenada no cache HTTP precisa ter para ser reaproveitada
+CAMPOS_PAGINA = ('titulo', 'texto', 'hash', 'links')
+
+def normaliza_url(url):
+    """
+    Normaliza uma URL removendo fragmentos (#) e a barra final.
+
+    Args:
+        url: URL a ser normalizada
+
+    Returns:
+        String com a URL normalizada
+    """
+    url, _ = urldefrag(url)
+    if url.endswith('/') and urlparse(url).path not in ('', '/'):
+        url = url.rstrip('/')
+    return url
+
+def extrai_pagina(url, html):
+    """
+    Extrai título, texto e links de uma página HTML.
+
+    Args:
+        url: URL da página (usada para resolver links relativos)
+        html: Conteúdo HTML da página
+
+    Returns:
+        Dicionário com 'titulo', 'texto', 'hash' e 'links' da página
+    """
+    # Importação tardia: o BeautifulSoup só é carregado quando uma página é processada
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+
+    titulo = url
+    if soup.title and soup.title.string:
+        titulo = soup.title.string.strip()
+
+    links = []
+    for tag in soup.find_all('a', href=True):
+        link = normaliza_url(urljoin(url, tag['href']))
+        if urlparse(link).scheme in ('http', 'https'):
+            links.append(link)
+
+    # Remove elementos que não fazem parte do conteúdo textual
+    for tag in soup(['script', 'style', 'noscript', 'nav', 'footer']):
+        tag.decompose()
+
+    texto = soup.get_text('\n', strip=True)
+
+    return {
+        'titulo': titulo,
+        'texto': texto,
+        'hash': hashlib.sha256(texto.encode('utf-8')).hexdigest(),
+        'links': list(dict.fromkeys(links))
+    }
+
+async def _carrega_robots(client, url_inicial):
+    """Carrega e interpreta o robots.txt do domínio. Em caso de falha, permite tudo."""
+    partes = urlparse(url_inicial)
+    robots = RobotFileParser()
+    try:
+        response = await client.get(f"{partes.scheme}://{partes.netloc}/robots.txt")
+        if response.status_code == 200:
+            robots.parse(response.text.splitlines())
+        else:
+            robots.parse([])
+    except Exception as e:
+        print(f"Aviso: Não foi possível carregar o robots.txt: {str(e)}")
+        robots.parse([])
+    return robots
+
+async def _busca_pagina(client, url):
+    """
+    Busca uma página usando requisição condicional quando há validadores armazenados.
+
+    Returns:
+        Dicionário com os dados da página ou None se não for uma página HTML
+    """
+    response = await client.get(url, headers=cabecalhos_condicionais(url, 'crawl'))
+
+    # Página não modificada desde o último carregamento: reutiliza os dados armazenados
+    if response.status_code == 304:
+        dados = obter_registro(url, 'crawl', CAMPOS_PAGINA)
+        if dados:
+            return dict(dados, nao_modificado=True)
+        response = await client.get(url)
+
+    response.raise_for_status()
+    if 'html' not in response.headers.get('content-type', 'text/html'):
+        return None
+
+    dados = await asyncio.to_thread(extrai_pagina, str(response.url), response.text)
+    registrar_resposta(url, 'crawl', response.headers, dados)
+    return dict(dados, nao_modificado=False)
+
+async def _rastreia(url_inicial, max_profundidade, max_paginas, concorrencia, on_page):
+    """Executa o rastreamento em largura com um pool de workers assíncronos."""
+    # Importação tardia: o httpx só é carregado quando um rastreamento é iniciado
+    import httpx
+    dominio = urlparse(url_inicial).netloc
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+    paginas = []
+
+    async with httpx.AsyncClient(
+        headers=WEB_HEADERS,
+        timeout=HTTP_TIMEOUT,
+        limits=limites,
+        verify=False,  # Ignora erros de SSL para maior compatibilidade
+        follow_redirects=True
+    ) as client:
+        robots = await _carrega_robots(client, url_inicial)
+        if not robots.can_fetch(USER_AGENT, url_inicial):
+            raise PermissionError("O robots.txt do site não permite o acesso a esta página.")
+
+        fila = asyncio.Queue()
+        visitadas = {url_inicial}
+        hashes = set()
+        fila.put_nowait((url_inicial, 0))
+
+        async def worker():
+            while True:
+                url, profundidade = await fila.get()
+                try:
+                    pagina = await _busca_pagina(client, url)
+
+                    # Ignora conteúdo não-HTML e páginas duplicadas (mesmo texto em URLs diferentes)
+                    if pagina and pagina['texto'] and pagina['hash'] not in hashes:
+                        hashes.add(pagina['hash'])
+                        pagina.update(url=url, profundidade=profundidade)
+                        paginas.append(pagina)
+                        if on_page:
+                            on_page(pagina, len(paginas))
+
+                        if profundidade < max_profundidade:
+                            for link in pagina['links']:
+                                if len(visitadas) >= max_paginas:
+                                    break
+                                if link in visitadas or urlparse(link).netloc != dominio:
+                                    continue
+                                if link.lower().endswith(EXTENSOES_IGNORADAS):
+                                    continue
+                                if not robots.can_fetch(USER_AGENT, link):
+                                    continue
+                                visitadas.add(link)
+                                fila.put_nowait((link, profundidade + 1))
+                except Exception as e:
+                    print(f"Aviso: Não foi possível carregar a página {url}: {str(e)}")
+                finally:
+                    fila.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(concorrencia)]
+        await fila.join()
+        for tarefa in workers:
+            tarefa.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    # Ordena por profundidade mantendo a ordem de chegada dentro de cada nível
+    paginas.sort(key=lambda pagina: pagina['profundidade'])
+    return paginas
+
+def carrega_site_completo(url_site, max_profundidade=CRAWL_MAX_DEPTH, max_paginas=CRAWL_MAX_PAGES,
+                          concorrencia=CRAWL_CONCURRENCY, on_page=None):
+    """
+    Rastreia um site a partir de uma URL, carregando as páginas do mesmo domínio.
+
+    Args:
+        url_site: URL inicial do rastreamento
+        max_profundidade: Profundidade máxima de links a seguir
+        max_paginas: Número máximo de páginas a carregar
+        concorrencia: Número de requisições simultâneas
+        on_page: Função opcional chamada a cada página carregada, com (pagina, total)
+
+    Returns:
+        Dicionário com informações e conteúdo das páginas do site
+    """
+    if not url_site or not url_site.strip():
+        return Document.falha(
+            'Site Web', 'entrada', 'É necessário fornecer uma URL válida para rastrear o site.',
+            titulo='URL não fornecida'
+        ).como_dict()
+
+    url_site = url_site.strip()
+    if not url_site.startswith(('http://', 'https://')):
+        url_site = 'https://' + url_site
+    url_site = normaliza_url(url_site)
+
+    try:
+        paginas = asyncio.run(_rastreia(url_site, max_profundidade, max_paginas, concorrencia, on_page))
+
+        if not paginas:
+            return Document.falha(
+                'Site Web', 'sem_conteudo', 'Não foi possível carregar nenhuma página do site.',
+                url=url_site, titulo='Nenhuma página carregada'
+            ).como_dict()
+
+        # Remove trechos repetidos entre páginas (conteúdo replicado em várias URLs),
+        # deduplicando o texto de cada página antes de inserir o seu cabeçalho
+        documento = ''
+        indice_dedup = IndiceLSH()
+        deduplicacao = relatorio_vazio()
+        for pagina in paginas:
+            texto, _ = deduplica_texto(pagina['texto'], indice=indice_dedup, relatorio=deduplicacao)
+            documento += f"\n\n--- PÁGINA: {pagina['titulo']} ({pagina['url']}) ---\n\n"
+            documento += texto
+
+        print(f"Rastreamento concluído: {len(paginas)} páginas carregadas de {url_site}")
+
+        return {
+            'tipo': 'Site Web',
+            'url': url_site,
+            'titulo': f"{paginas[0]['titulo']} ({len(paginas)} páginas)",
+            'conteudo': documento,
+            'deduplicacao': deduplicacao
+        }
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Erro ao rastrear o site {url_site}: {error_msg}")
+        return Document.falha(
+            'Site Web', 'falha', f'Não foi possível rastrear o site: {error_msg}',
+            url=url_site, titulo='Erro ao rastrear'
+        ).como_dict()
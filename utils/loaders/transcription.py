@@ -0,0 +1,143 @@
+"""
+Módulo de transcrição local de vídeos do YouTube sem legendas.
+
+Baixa apenas o áudio do vídeo (yt-dlp) e o transcreve na CPU com o faster-whisper,
+dividido em trechos transcritos em paralelo. O resultado fica no cache compartilhado
+pelo ID do vídeo, então cada vídeo é transcrito uma única vez (também entre réplicas).
+Os pacotes são opcionais: sem eles, ou com LOCAL_TRANSCRIPTION_ENABLED desativado,
+os vídeos sem legendas continuam sem transcrição.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from config.settings import (
+    LOCAL_TRANSCRIPTION_ENABLED, WHISPER_MODEL, WHISPER_COMPUTE_TYPE, TRANSCRIPTION_SEGMENT_SECONDS,
+    TRANSCRIPTION_OVERLAP_SECONDS, TRANSCRIPTION_WORKERS, TRANSCRIPTION_MAX_DURATION,
+    TRANSCRIPTION_CACHE_TTL, TRANSCRIPTION_LEASE_TTL
+)
+from core.shared_cache import obtem_ou_calcula
+
+# Taxa de amostragem esperada pelo Whisper
+TAXA_AMOSTRAGEM = 16000
+
+# Um vídeo transcrito por vez no processo: os trechos de cada vídeo já ocupam as CPUs
+# (playlists buscam várias transcrições em paralelo)
+_trava_transcricao = threading.Lock()
+
+def transcricao_local_disponivel():
+    """Indica se a transcrição local está habilitada e os pacotes necessários estão instalados."""
+    if not LOCAL_TRANSCRIPTION_ENABLED:
+        return False
+    try:
+        import faster_whisper
+        import yt_dlp
+    except ImportError:
+        return False
+    return True
+
+@lru_cache(maxsize=None)
+def get_modelo():
+    """
+    Retorna o modelo do faster-whisper, carregando-o no primeiro uso.
+
+    Returns:
+        Instância compartilhada de faster_whisper.WhisperModel
+    """
+    from faster_whisper import WhisperModel
+    # Cada trecho em paralelo usa um worker do CTranslate2, com as CPUs divididas entre eles
+    threads = max(1, (os.cpu_count() or 2) // TRANSCRIPTION_WORKERS)
+    return WhisperModel(
+        WHISPER_MODEL, device='cpu', compute_type=WHISPER_COMPUTE_TYPE,
+        cpu_threads=threads, num_workers=TRANSCRIPTION_WORKERS
+    )
+
+def _baixa_audio(video_id, diretorio):
+    """Baixa apenas o áudio do vídeo e retorna o caminho do arquivo."""
+    import yt_dlp
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    opcoes = {
+        'format': 'bestaudio/best',
+        'outtmpl': os.path.join(diretorio, '%(id)s.%(ext)s'),
+        'noplaylist': True,
+        'quiet': True,
+        'no_warnings': True,
+    }
+    with yt_dlp.YoutubeDL(opcoes) as ydl:
+        info = ydl.extract_info(url, download=False)
+        if (info.get('duration') or 0) > TRANSCRIPTION_MAX_DURATION:
+            raise ValueError(
+                f"Vídeo longo demais para transcrição local ({info['duration'] // 60} minutos)."
+            )
+        info = ydl.process_ie_result(info, download=True)
+        return ydl.prepare_filename(info)
+
+def _transcreve_trecho(audio, inicio, fim, idioma):
+    """
+    Transcreve o trecho [inicio, fim) do áudio (em segundos).
+
+    O trecho começa um pouco antes (TRANSCRIPTION_OVERLAP_SECONDS) para não perder a
+    palavra cortada na emenda; as falas que começam antes de `inicio` pertencem ao
+    trecho anterior e são descartadas.
+    """
+    deslocamento = max(0, inicio - TRANSCRIPTION_OVERLAP_SECONDS)
+    amostras = audio[int(deslocamento * TAXA_AMOSTRAGEM):int(fim * TAXA_AMOSTRAGEM)]
+    segmentos, info = get_modelo().transcribe(amostras, language=idioma, beam_size=1, vad_filter=True)
+    entradas = [
+        (deslocamento + segmento.start, segmento.text.strip())
+        for segmento in segmentos
+        if deslocamento + segmento.start >= inicio
+    ]
+    return [(inicio_fala, texto) for inicio_fala, texto in entradas if texto], info.language
+
+def _transcreve(video_id):
+    """Baixa o áudio e o transcreve em trechos paralelos, no formato de busca_transcricao."""
+    from faster_whisper import decode_audio
+
+    diretorio = tempfile.mkdtemp(prefix='tars_audio_')
+    try:
+        with _trava_transcricao:
+            print(f"Transcrevendo localmente o vídeo {video_id}...")
+            audio = decode_audio(_baixa_audio(video_id, diretorio), sampling_rate=TAXA_AMOSTRAGEM)
+            duracao = len(audio) / TAXA_AMOSTRAGEM
+            limites = [
+                (inicio, min(inicio + TRANSCRIPTION_SEGMENT_SECONDS, duracao))
+                for inicio in range(0, int(duracao) + 1, TRANSCRIPTION_SEGMENT_SECONDS)
+                if inicio < duracao
+            ]
+            if not limites:
+                raise ValueError("O áudio do vídeo está vazio.")
+
+            # O primeiro trecho detecta o idioma, usado nos demais (transcritos em paralelo)
+            entradas, idioma = _transcreve_trecho(audio, *limites[0], None)
+            with ThreadPoolExecutor(max_workers=TRANSCRIPTION_WORKERS) as executor:
+                for parte, _ in executor.map(lambda limite: _transcreve_trecho(audio, *limite, idioma), limites[1:]):
+                    entradas.extend(parte)
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    if not entradas:
+        raise ValueError("Nenhuma fala reconhecida no áudio do vídeo.")
+    print(f"Transcrição local concluída: {video_id} ({len(limites)} trechos, idioma '{idioma}')")
+    return entradas
+
+def transcreve_video(video_id):
+    """
+    Transcreve localmente o áudio de um vídeo, usando o cache compartilhado por ID.
+
+    Args:
+        video_id: ID do vídeo do YouTube
+
+    Returns:
+        Lista de pares (início em segundos, texto)
+
+    Raises:
+        ValueError: Se o vídeo for longo demais ou nenhuma fala for reconhecida
+    """
+    return obtem_ou_calcula(
+        f"transcricao_local:{video_id}", lambda: _transcreve(video_id),
+        ttl=TRANSCRIPTION_CACHE_TTL, espera=TRANSCRIPTION_LEASE_TTL, ttl_lease=TRANSCRIPTION_LEASE_TTL
+    )
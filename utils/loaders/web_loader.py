@@ -1,17 +1,17 @@
 """
 Módulo para carregamento e processamento de conteúdo de sites web.
-Utiliza WebBaseLoader da LangChain e BeautifulSoup para extrair conteúdo.
+Utiliza requests e BeautifulSoup para extrair conteúdo, com requisições condicionais
+(ETag/Last-Modified) para evitar reprocessar páginas não modificadas.
 """
 
 import os
-import requests
-import urllib3
-from bs4 import BeautifulSoup
-from langchain_community.document_loaders import WebBaseLoader
-from config.settings import USER_AGENT, WEB_HEADERS
+from config.settings import WEB_HEADERS, HTTP_TIMEOUT
+from utils.loaders.document import Document
+from utils.loaders.http_cache import cabecalhos_condicionais, obter_registro, registrar_resposta
+from utils.loaders.site_crawler import extrai_pagina
 
-# Desativa avisos de SSL para evitar warnings no console
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# Campos que um site armazenado no cache HTTP precisa ter para ser reaproveitado
+CAMPOS_SITE = ('tipo', 'url', 'titulo', 'conteudo')
 
 def carrega_site(url_site=None):
     """
@@ -27,12 +27,10 @@ def carrega_site(url_site=None):
     if url_site is None or not url_site.strip():
         url_site = os.getenv('SITE_URL')
         if not url_site:
-            return {
-                'tipo': 'Site Web (erro)',
-                'url': '',
-                'titulo': 'URL não fornecida',
-                'conteudo': 'É necessário fornecer uma URL válida para carregar o site.'
-            }
+            return Document.falha(
+                'Site Web', 'entrada', 'É necessário fornecer uma URL válida para carregar o site.',
+                titulo='URL não fornecida'
+            ).como_dict()
     
     # Adiciona protocolo se necessário
     if not url_site.startswith(('http://', 'https://')):
@@ -43,51 +41,51 @@ def carrega_site(url_site=None):
         try:
             import bs4
         except ImportError:
-            return {
-                'tipo': 'Erro de Dependência',
-                'url': url_site,
-                'titulo': 'Biblioteca não instalada',
-                'conteudo': 'A biblioteca Beautiful Soup (bs4) não está instalada. Execute o comando: pip install beautifulsoup4'
-            }
+            return Document.falha(
+                'Site Web', 'dependencia',
+                'A biblioteca Beautiful Soup (bs4) não está instalada. Execute o comando: pip install beautifulsoup4',
+                url=url_site, titulo='Biblioteca não instalada'
+            ).como_dict()
         
-        # Configuração e carregamento do conteúdo do site
-        loader = WebBaseLoader(
+        # Importação tardia do requests e desativação dos avisos de SSL no console
+        import requests
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        
+        # Requisição condicional: se a página não mudou, o servidor responde 304
+        response = requests.get(
             url_site,
-            verify_ssl=False,  # Ignora erros de SSL para maior compatibilidade
-            header_template=WEB_HEADERS  # User agent para evitar bloqueios
+            headers={**WEB_HEADERS, **cabecalhos_condicionais(url_site, 'site')},
+            verify=False,  # Ignora erros de SSL para maior compatibilidade
+            timeout=HTTP_TIMEOUT
         )
         
-        # Carrega documentos e concatena o conteúdo
-        lista_documentos = loader.load()
-        documento = '\n'.join([doc.page_content for doc in lista_documentos])
+        dados = obter_registro(url_site, 'site', CAMPOS_SITE) if response.status_code == 304 else None
+        if dados:
+            print(f"Site não modificado desde o último carregamento: {url_site}")
+            return dict(dados, nao_modificado=True)
+        if response.status_code == 304:
+            response = requests.get(url_site, headers=WEB_HEADERS, verify=False, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
         
-        # Extrai o título do site
-        titulo = "Site Web"
-        try:
-            # Usa BeautifulSoup para extrair o título
-            response = requests.get(url_site, headers=WEB_HEADERS, verify=False)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            title_tag = soup.find('title')
-            
-            if title_tag and title_tag.string:
-                titulo = title_tag.string.strip()
-        except Exception as e:
-            print(f"Aviso: Não foi possível extrair o título do site: {str(e)}")
+        # Extrai o título e o texto da página em uma única leitura do HTML
+        pagina = extrai_pagina(url_site, response.content)
+        titulo = pagina['titulo'] if pagina['titulo'] != url_site else "Site Web"
         
         # Retorna as informações do site
-        return {
+        documento_info = {
             'tipo': 'Site Web',
             'url': url_site,
             'titulo': titulo,
-            'conteudo': documento
+            'conteudo': pagina['texto']
         }
+        registrar_resposta(url_site, 'site', response.headers, documento_info)
+        return documento_info
     except Exception as e:
         # Captura e retorna erros detalhados
         error_msg = str(e)
         print(f"Erro ao carregar o site {url_site}: {error_msg}")
-        return {
-            'tipo': 'Site Web (erro)',
-            'url': url_site,
-            'titulo': 'Erro ao carregar',
-            'conteudo': f'Não foi possível carregar o conteúdo do site: {error_msg}'
-        }
\ No newline at end of file
+        return Document.falha(
+            'Site Web', 'falha', f'Não foi possível carregar o conteúdo do site: {error_msg}',
+            url=url_site
+        ).como_dict()
\ No newline at end of file
@@ -1,23 +1,169 @@
 """
 Módulo para carregamento e processamento de transcrições de vídeos do YouTube.
-Utiliza a API youtube_transcript_api para extrair transcrições.
+Utiliza a API youtube_transcript_api para extrair transcrições e, em vídeos sem
+legendas, a transcrição local do áudio (utils.loaders.transcription), se habilitada.
 """
 
 import os
 import re
-import requests
-import urllib3
 import tempfile
-from bs4 import BeautifulSoup
-from langchain_community.document_loaders import YoutubeLoader
+import threading
+from collections import OrderedDict
 from config.settings import WEB_HEADERS, USER_AGENT
-
-# Desativa avisos de SSL para evitar warnings no console
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from core.shared_cache import obtem_ou_calcula
+from utils.loaders.document import Document
 
 # Configura a variável de ambiente USER_AGENT para o pytube (usado pelo YoutubeLoader)
 os.environ["USER_AGENT"] = USER_AGENT
 
+# Cache das transcrições por ID do vídeo (LRU), compartilhado entre vídeos avulsos e
+# playlists: recarregar um vídeo ou uma playlist não busca de novo o que já foi obtido.
+# Na falta de uma transcrição aqui, o cache compartilhado entre réplicas é consultado.
+MAX_TRANSCRICOES_EM_CACHE = 256
+_transcricoes = OrderedDict()
+_trava_transcricoes = threading.Lock()
+
+def extrai_video_id(url_youtube):
+    """
+    Extrai o ID do vídeo de uma URL do YouTube.
+    
+    Args:
+        url_youtube: URL do vídeo (watch, youtu.be, mobile ou shorts)
+        
+    Returns:
+        String com o ID do vídeo ou None se não for possível identificá-lo
+    """
+    if 'youtube.com/watch?v=' in url_youtube:
+        return url_youtube.split('youtube.com/watch?v=')[1].split('&')[0]
+    if 'youtu.be/' in url_youtube:
+        return url_youtube.split('youtu.be/')[1].split('?')[0]
+    if 'm.youtube.com' in url_youtube:
+        # Suporte para YouTube mobile
+        match = re.search(r'v=([^&]+)', url_youtube)
+        return match.group(1) if match else None
+    if 'youtube.com/shorts/' in url_youtube:
+        # Suporte para YouTube shorts
+        return url_youtube.split('youtube.com/shorts/')[1].split('?')[0]
+    return None
+
+def formata_timestamp(segundos):
+    """Formata uma posição do vídeo em segundos como mm:ss."""
+    return f"{int(segundos // 60):02d}:{int(segundos % 60):02d}"
+
+def _baixa_transcricao(video_id):
+    """Busca a transcrição na YouTubeTranscriptApi, no formato de busca_transcricao."""
+    from youtube_transcript_api import YouTubeTranscriptApi
+    transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+    
+    # Tenta português primeiro, depois inglês ou qualquer idioma disponível
+    transcript = None
+    try:
+        transcript = transcript_list.find_transcript(['pt', 'pt-BR'])
+    except:
+        try:
+            transcript = transcript_list.find_transcript(['en'])
+        except:
+            # Tenta obter transcrição gerada automaticamente
+            for t in transcript_list:
+                transcript = t
+                break
+    
+    if not transcript:
+        raise ValueError("Nenhuma transcrição disponível para este vídeo.")
+    
+    # Versões 1.x produzem objetos FetchedTranscriptSnippet; as anteriores, dicionários
+    entradas = []
+    for entry in transcript.fetch():
+        if isinstance(entry, dict):
+            entradas.append((entry.get('start', 0), entry['text']))
+        else:
+            entradas.append((entry.start, entry.text))
+    return entradas
+
+def _obtem_transcricao(video_id):
+    """
+    Busca as legendas do vídeo; sem legendas, transcreve o áudio localmente (se habilitado).
+
+    Apenas a falta de legendas leva à transcrição local: falhas de rede, bloqueios e
+    limites do YouTube são transitórios e são repassadas, em vez de custarem o
+    download e minutos de transcrição (guardada em cache por muito tempo).
+    """
+    from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled
+    try:
+        return _baixa_transcricao(video_id)
+    except (TranscriptsDisabled, NoTranscriptFound, ValueError) as e:
+        from utils.loaders.transcription import transcricao_local_disponivel, transcreve_video
+        if not transcricao_local_disponivel():
+            raise
+        print(f"Legendas indisponíveis para {video_id} ({str(e)}); usando a transcrição local")
+        return transcreve_video(video_id)
+
+def busca_transcricao(video_id):
+    """
+    Obtém a transcrição de um vídeo pela YouTubeTranscriptApi, usando o cache por vídeo.
+    
+    Prefere legendas em português, depois em inglês e, por fim, qualquer idioma disponível.
+    Se o vídeo não tiver legendas e a transcrição local estiver habilitada, o áudio é
+    transcrito com o faster-whisper.
+    
+    Args:
+        video_id: ID do vídeo do YouTube
+        
+    Returns:
+        Lista de pares (início em segundos, texto)
+        
+    Raises:
+        ValueError: Se o vídeo não tiver transcrição disponível
+    """
+    with _trava_transcricoes:
+        if video_id in _transcricoes:
+            _transcricoes.move_to_end(video_id)
+            return _transcricoes[video_id]
+    
+    entradas = obtem_ou_calcula(f"transcricao:{video_id}", lambda: _obtem_transcricao(video_id))
+    
+    with _trava_transcricoes:
+        _transcricoes[video_id] = entradas
+        _transcricoes.move_to_end(video_id)
+        while len(_transcricoes) > MAX_TRANSCRICOES_EM_CACHE:
+            _transcricoes.popitem(last=False)
+    return entradas
+
+def formata_transcricao(entradas, prefixo=""):
+    """
+    Formata a transcrição com um timestamp por linha.
+    
+    Args:
+        entradas: Lista de tuplas (início em segundos, texto)
+        prefixo: Texto opcional antes do timestamp (por exemplo, 'V3 ' em playlists)
+        
+    Returns:
+        String com as linhas no formato '[mm:ss] texto'
+    """
+    return "".join(f"[{prefixo}{formata_timestamp(inicio)}] {texto}\n" for inicio, texto in entradas)
+
+def busca_titulo(video_id):
+    """
+    Obtém o título de um vídeo pela API pública do noembed.
+    
+    Args:
+        video_id: ID do vídeo do YouTube
+        
+    Returns:
+        String com o título ou None se não for possível obtê-lo
+    """
+    import requests
+    import urllib.parse
+    try:
+        video_url = f"https://www.youtube.com/watch?v={video_id}"
+        api_url = f"https://noembed.com/embed?url={urllib.parse.quote(video_url)}"
+        response = requests.get(api_url, timeout=10)
+        if response.status_code == 200:
+            return response.json().get('title')
+    except Exception as api_error:
+        print(f"Não foi possível obter título via API: {str(api_error)}")
+    return None
+
 def carrega_youtube(url_youtube=None):
     """
     Carrega a transcrição de um vídeo do YouTube.
@@ -32,43 +178,34 @@ def carrega_youtube(url_youtube=None):
     if url_youtube is None or not url_youtube.strip():
         url_youtube = os.getenv('YOUTUBE_URL')
         if not url_youtube:
-            return {
-                'tipo': 'Vídeo do YouTube (erro)',
-                'url': '',
-                'titulo': 'URL não fornecida',
-                'conteudo': 'É necessário fornecer uma URL válida para carregar o vídeo do YouTube.'
-            }
+            return Document.falha(
+                'Vídeo do YouTube', 'entrada', 'É necessário fornecer uma URL válida para carregar o vídeo do YouTube.',
+                titulo='URL não fornecida'
+            ).como_dict()
     
     # Formatação da URL para garantir compatibilidade
     if 'youtube.com' in url_youtube and '&' in url_youtube:
         url_youtube = url_youtube.split('&')[0]  # Mantém apenas a parte principal da URL
     
     try:
+        # Importação tardia das dependências e desativação dos avisos de SSL no console
+        import requests
+        import urllib3
+        from bs4 import BeautifulSoup
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        
         # Verifica se a API do YouTube está instalada
         try:
-            from youtube_transcript_api import YouTubeTranscriptApi
+            import youtube_transcript_api
         except ImportError:
-            return {
-                'tipo': 'Erro de Dependência',
-                'url': url_youtube,
-                'titulo': 'Biblioteca não instalada',
-                'conteudo': 'A biblioteca youtube-transcript-api não está instalada. Execute o comando: pip install youtube-transcript-api'
-            }
+            return Document.falha(
+                'Vídeo do YouTube', 'dependencia',
+                'A biblioteca youtube-transcript-api não está instalada. Execute o comando: pip install youtube-transcript-api',
+                url=url_youtube, titulo='Biblioteca não instalada'
+            ).como_dict()
             
         # Extrai o ID do vídeo da URL
-        video_id = None
-        if 'youtube.com/watch?v=' in url_youtube:
-            video_id = url_youtube.split('youtube.com/watch?v=')[1].split('&')[0]
-        elif 'youtu.be/' in url_youtube:
-            video_id = url_youtube.split('youtu.be/')[1].split('?')[0]
-        elif 'm.youtube.com' in url_youtube:
-            # Suporte para YouTube mobile
-            match = re.search(r'v=([^&]+)', url_youtube)
-            if match:
-                video_id = match.group(1)
-        elif 'youtube.com/shorts/' in url_youtube:
-            # Suporte para YouTube shorts
-            video_id = url_youtube.split('youtube.com/shorts/')[1].split('?')[0]
+        video_id = extrai_video_id(url_youtube)
             
         if not video_id:
             raise ValueError("Não foi possível extrair o ID do vídeo a partir da URL fornecida.")
@@ -77,37 +214,9 @@ def carrega_youtube(url_youtube=None):
         documento = ""
         transcript_error = None
         
-        # Método 1: Usar YouTubeTranscriptApi
+        # Método 1: Usar YouTubeTranscriptApi (com cache por vídeo)
         try:
-            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-            
-            # Tenta português primeiro, depois inglês ou qualquer idioma disponível
-            transcript = None
-            try:
-                transcript = transcript_list.find_transcript(['pt', 'pt-BR'])
-            except:
-                try:
-                    transcript = transcript_list.find_transcript(['en'])
-                except:
-                    # Tenta obter transcrição gerada automaticamente
-                    for t in transcript_list:
-                        transcript = t
-                        break
-                    
-            if not transcript:
-                raise ValueError("Nenhuma transcrição disponível para este vídeo.")
-                
-            # Obter o conteúdo da transcrição e formata com timestamps
-            transcript_data = transcript.fetch()
-            
-            for entry in transcript_data:
-                texto = entry['text'] if isinstance(entry, dict) else str(entry)
-                start = entry.get('start', 0) if isinstance(entry, dict) else 0
-                minutos = int(start // 60)
-                segundos = int(start % 60)
-                timestamp = f"{minutos:02d}:{segundos:02d}"
-                documento += f"[{timestamp}] {texto}\n"
-                
+            documento = formata_transcricao(busca_transcricao(video_id))
             print(f"Transcrição obtida com sucesso usando YouTubeTranscriptApi")
             
         except Exception as e:
@@ -150,6 +259,7 @@ def carrega_youtube(url_youtube=None):
                     # Tenta com YoutubeLoader como último recurso
                     print("Tentando YoutubeLoader como último recurso...")
                     try:
+                        from langchain_community.document_loaders import YoutubeLoader
                         loader = YoutubeLoader.from_youtube_url(
                             url_youtube,
                             add_video_info=True,
@@ -211,20 +321,8 @@ Você ainda pode conversar sobre outros tópicos ou tentar com outro vídeo que
         titulo = "Vídeo do YouTube"
         try:
             # Método 1: Tenta obter título através do API
-            try:
-                import urllib.parse
-                video_url = f"https://www.youtube.com/watch?v={video_id}"
-                api_url = f"https://noembed.com/embed?url={urllib.parse.quote(video_url)}"
-                response = requests.get(api_url, timeout=10)
-                if response.status_code == 200:
-                    data = response.json()
-                    if 'title' in data:
-                        titulo = data['title']
-                        print(f"Título obtido via noembed API: {titulo}")
-            except Exception as api_error:
-                print(f"Não foi possível obter título via API: {str(api_error)}")
-                pass
-                
+            titulo = busca_titulo(video_id) or titulo
+            
             # Método 2: Obtém o título da página do vídeo (fallback)
             if titulo == "Vídeo do YouTube":
                 response = requests.get(url_youtube, headers=WEB_HEADERS, verify=False, timeout=10)
@@ -248,9 +346,7 @@ Você ainda pode conversar sobre outros tópicos ou tentar com outro vídeo que
         # Captura e retorna erros detalhados
         error_msg = str(e)
         print(f"Erro ao carregar o vídeo do YouTube {url_youtube}: {error_msg}")
-        return {
-            'tipo': 'Vídeo do YouTube (erro)',
-            'url': url_youtube,
-            'titulo': 'Erro ao carregar',
-            'conteudo': f'Não foi possível carregar a transcrição do vídeo: {error_msg}'
-        }
\ No newline at end of file
+        return Document.falha(
+            'Vídeo do YouTube', 'falha', f'Não foi possível carregar a transcrição do vídeo: {error_msg}',
+            url=url_youtube
+        ).como_dict()
\ No newline at end of file
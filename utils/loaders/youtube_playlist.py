@@ -0,0 +1,199 @@
+"""
+Módulo para carregamento de playlists e canais do YouTube.
+Lista os vídeos e busca as transcrições em paralelo, com número limitado de
+requisições simultâneas, reunindo-as em uma única fonte com citações por vídeo.
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse, parse_qs
+from config.settings import WEB_HEADERS, HTTP_TIMEOUT, YOUTUBE_PLAYLIST_MAX_VIDEOS, YOUTUBE_CONCURRENCY
+from utils.loaders.document import Chunk, Document, coleta
+from utils.loaders.youtube_loader import busca_transcricao, busca_titulo, formata_transcricao
+
+_PADRAO_VIDEO_PLAYLIST = re.compile(r'"playlistVideoRenderer":\{"videoId":"([\w-]{11})"')
+_PADRAO_VIDEO_CANAL = re.compile(r'"videoRenderer":\{"videoId":"([\w-]{11})"')
+_PADRAO_VIDEO = re.compile(r'"videoId":"([\w-]{11})"')
+_PADRAO_TITULO = re.compile(r'<meta property="og:title" content="([^"]*)"')
+_PREFIXOS_CANAL = ('/@', '/channel/', '/c/', '/user/')
+
+def eh_playlist(url):
+    """
+    Indica se a URL é de uma playlist ou de um canal do YouTube (e não de um vídeo avulso).
+
+    Args:
+        url: URL informada pelo usuário
+
+    Returns:
+        True para URLs de playlist (/playlist?list=...) ou de canal (/@nome, /channel/...)
+    """
+    partes = urlparse(url if '://' in url else 'https://' + url)
+    if 'youtube.com' not in partes.netloc:
+        return False
+    if partes.path == '/playlist' and 'list' in parse_qs(partes.query):
+        return True
+    return partes.path.startswith(_PREFIXOS_CANAL)
+
+def _url_listagem(url):
+    """Normaliza a URL da playlist ou a aba de vídeos do canal a ser listada."""
+    partes = urlparse(url if '://' in url else 'https://' + url)
+    if partes.path == '/playlist':
+        lista = parse_qs(partes.query)['list'][0]
+        return f"https://www.youtube.com/playlist?list={lista}", _PADRAO_VIDEO_PLAYLIST
+    caminho = partes.path.rstrip('/')
+    if not caminho.endswith('/videos'):
+        caminho += '/videos'
+    return f"https://www.youtube.com{caminho}", _PADRAO_VIDEO_CANAL
+
+def _lista_com_ytdlp(url, max_videos):
+    """Lista os vídeos com o yt-dlp (que percorre todas as páginas da playlist)."""
+    import yt_dlp
+    opcoes = {'extract_flat': True, 'quiet': True, 'playlistend': max_videos, 'skip_download': True}
+    with yt_dlp.YoutubeDL(opcoes) as ydl:
+        info = ydl.extract_info(url, download=False)
+    videos = [
+        {'video_id': item['id'], 'titulo': item.get('title')}
+        for item in info.get('entries') or [] if item and item.get('id')
+    ]
+    return info.get('title') or 'Playlist do YouTube', videos[:max_videos]
+
+def _lista_com_html(url, max_videos):
+    """Lista os vídeos a partir dos dados embutidos na página da playlist ou do canal."""
+    import requests
+    url_listagem, padrao = _url_listagem(url)
+    response = requests.get(url_listagem, headers=WEB_HEADERS, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+
+    ids = padrao.findall(response.text) or _PADRAO_VIDEO.findall(response.text)
+    titulo = _PADRAO_TITULO.search(response.text)
+    videos = [{'video_id': video_id, 'titulo': None} for video_id in dict.fromkeys(ids)]
+    return (titulo.group(1) if titulo else 'Playlist do YouTube'), videos[:max_videos]
+
+def lista_videos(url, max_videos=YOUTUBE_PLAYLIST_MAX_VIDEOS):
+    """
+    Lista os vídeos de uma playlist ou canal, na ordem em que aparecem.
+
+    Usa o yt-dlp se estiver instalado; caso contrário, ou se a listagem pelo yt-dlp
+    falhar, lê a página da playlist (que traz apenas os primeiros ~100 vídeos).
+
+    Args:
+        url: URL da playlist ou do canal
+        max_videos: Número máximo de vídeos listados
+
+    Returns:
+        Tupla (título da playlist, lista de dicionários com 'video_id' e 'titulo')
+    """
+    try:
+        return _lista_com_ytdlp(url, max_videos)
+    except ImportError:
+        return _lista_com_html(url, max_videos)
+    except Exception as e:
+        print(f"Aviso: Não foi possível listar os vídeos com o yt-dlp, usando a página da playlist: {str(e)}")
+        return _lista_com_html(url, max_videos)
+
+def _carrega_video(video):
+    """Busca a transcrição (e o título, se necessário) de um vídeo da playlist."""
+    entradas = busca_transcricao(video['video_id'])
+    titulo = video['titulo'] or busca_titulo(video['video_id']) or f"Vídeo {video['video_id']}"
+    return dict(video, titulo=titulo, entradas=entradas)
+
+def fluxo_playlist(url_playlist, max_videos=YOUTUBE_PLAYLIST_MAX_VIDEOS, concorrencia=YOUTUBE_CONCURRENCY):
+    """
+    Carrega em fluxo as transcrições dos vídeos de uma playlist ou canal do YouTube.
+
+    As transcrições são buscadas em paralelo (no máximo `concorrencia` ao mesmo tempo)
+    e reutilizam o cache por vídeo, então o carregamento leva aproximadamente o tempo
+    do vídeo mais lento. Cada linha da transcrição traz o número do vídeo e o minuto
+    (por exemplo, '[V3 12:34]'), permitindo citações precisas. Vídeos sem transcrição
+    disponível são ignorados.
+
+    Args:
+        url_playlist: URL da playlist ou do canal
+        max_videos: Número máximo de vídeos carregados
+        concorrencia: Número de transcrições buscadas simultaneamente
+
+    Yields:
+        Um Chunk por vídeo, na ordem em que terminam (com 'video_id', 'posicao', 'url'
+        e 'titulo'), e por último o Document com as transcrições de todos os vídeos
+    """
+    if not url_playlist or not url_playlist.strip():
+        yield Document.falha(
+            'Playlist do YouTube', 'entrada', 'É necessário fornecer uma URL válida para carregar a playlist.',
+            titulo='URL não fornecida'
+        )
+        return
+
+    url_playlist = url_playlist.strip()
+
+    try:
+        import youtube_transcript_api
+    except ImportError:
+        yield Document.falha(
+            'Playlist do YouTube', 'dependencia',
+            'A biblioteca youtube-transcript-api não está instalada. Execute o comando: pip install youtube-transcript-api',
+            url=url_playlist, titulo='Biblioteca não instalada'
+        )
+        return
+
+    carregados = []
+    try:
+        titulo_playlist, videos = lista_videos(url_playlist, max_videos)
+        if not videos:
+            raise ValueError("Nenhum vídeo encontrado na playlist.")
+
+        with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+            futuros = {
+                executor.submit(_carrega_video, video): posicao
+                for posicao, video in enumerate(videos, start=1)
+            }
+            # Cada vídeo é entregue a quem consome o fluxo assim que sua transcrição chega
+            for futuro in as_completed(futuros):
+                posicao = futuros[futuro]
+                try:
+                    video = futuro.result()
+                except Exception as e:
+                    print(f"Aviso: Transcrição indisponível para o vídeo {videos[posicao - 1]['video_id']}: {str(e)}")
+                    continue
+                video.update(
+                    posicao=posicao,
+                    url=f"https://www.youtube.com/watch?v={video['video_id']}",
+                    texto=formata_transcricao(video.pop('entradas'), prefixo=f"V{posicao} ")
+                )
+                carregados.append(video)
+                yield Chunk(video['texto'], {chave: video[chave] for chave in ('video_id', 'posicao', 'url', 'titulo')})
+
+        if not carregados:
+            raise ValueError("Nenhum vídeo da playlist possui transcrição disponível.")
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Erro ao carregar a playlist {url_playlist}: {error_msg}")
+        yield Document.falha(
+            'Playlist do YouTube', 'falha', f'Não foi possível carregar a playlist: {error_msg}', url=url_playlist
+        )
+        return
+
+    carregados.sort(key=lambda video: video['posicao'])
+    documento = ''
+    for video in carregados:
+        documento += f"\n\n--- VÍDEO V{video['posicao']}: {video['titulo']} ({video['url']}) ---\n\n"
+        documento += video['texto']
+
+    print(f"Playlist carregada: {len(carregados)} de {len(videos)} vídeos com transcrição")
+
+    yield Document('Playlist do YouTube', url_playlist, f"{titulo_playlist} ({len(carregados)} vídeos)", documento)
+
+def carrega_playlist(url_playlist, max_videos=YOUTUBE_PLAYLIST_MAX_VIDEOS,
+                     concorrencia=YOUTUBE_CONCURRENCY, on_chunk=None):
+    """
+    Carrega as transcrições dos vídeos de uma playlist ou canal do YouTube (ver fluxo_playlist).
+
+    Args:
+        url_playlist: URL da playlist ou do canal
+        max_videos: Número máximo de vídeos carregados
+        concorrencia: Número de transcrições buscadas simultaneamente
+        on_chunk: Função opcional chamada com o Chunk de cada vídeo carregado
+
+    Returns:
+        Dicionário com informações e transcrições dos vídeos
+    """
+    return coleta(fluxo_playlist(url_playlist, max_videos, concorrencia), on_chunk).como_dict()